@@ -0,0 +1,6 @@
+#!/bin/bash
+
+REPODIRECTORY="$(dirname $(dirname $(realpath -s $0)))"
+SOURCEDIRECTORY=${REPODIRECTORY}/source
+
+cd ${SOURCEDIRECTORY} && python3 crypto_tax_report_benchmark.py "$@"
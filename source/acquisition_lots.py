@@ -0,0 +1,821 @@
+#!/usr/bin/python3
+
+"""
+The module provides the acquisitions of crypto currencies, on which the ProfitCalculator
+of the module profit_calculator is built: the CryptoAquisitionData holds a queue of
+CryptoAcquisitionRecords for each crypto currency and removes the sold amounts from it
+in FIFO order, keeping the part held for more than one year separately. The parsing of
+the data rows of a crypto.com csv file, which this requires, is also provided here. The
+module does not import any other module of the package, so every engine can build on it.
+"""
+
+import bisect
+import collections
+import datetime
+import functools
+import logging
+import math
+import re
+import threading
+import types
+from collections.abc import MutableMapping
+from enum import Enum
+from dataclasses import dataclass
+
+# Define a currency enum class
+
+logger = logging.getLogger(__name__)
+
+class Currency(Enum):
+    """ Identifiers for all handled crypto currencies."""
+    CRO = 1
+    SOL = 2
+    ADA = 3
+    DOT = 4
+    USDT = 5
+    ETH = 6
+    ATOM = 7
+    XRP = 8
+    LINK = 9
+    VVS = 10
+    MANA = 11
+    ELON = 12
+    EUR = 13
+
+
+class Heading(Enum):
+    """ Identifiers for the columns of the read-in crypto.com csv file."""
+    TIMESTAMP = 0
+    IDENTIFIER = 1
+    SOURCE_CURRENCY = 2
+    SOURCE_AMOUNT = 3
+    TARGET_CURRENCY = 4
+    TARGET_AMOUNT = 5
+    NATIVE_CURRENCY = 6
+    NATIVE_CURRENCY_AMOUNT = 7
+    DOLLAR_AMOUNT = 8
+    INTERNAL_IDENTIFIER = 9
+    HASH_KEY = 10
+
+
+class TaxPolicy(Enum):
+    """ The TaxPolixy states how a profit has to be considered with regards to
+    taxation.
+    """
+    EXEMPT = 0
+    CAPITAL_GAINS = 1
+
+
+class CurrencyRegistry:
+    """
+    Registry, which interns the names of currencies as small integer codes,
+    so the lots of a crypto currency can be looked up in a list and
+    currencies are compared as integers. The code 0 stands for a missing
+    currency and the elements of Currency keep their value as code. Any
+    other currency is registered the first time it occurs.
+    """
+
+    def __init__(self):
+        self.codes = {"": 0}
+        self.names = [""]
+        self.lock = threading.Lock()
+        for currency in Currency:
+            self.codes[currency.name] = currency.value
+            self.names.append(currency.name)
+
+    def get_code(self, currency_name):
+        """Return the code of the currency name, which is registered if unknown."""
+        code = self.codes.get(currency_name)
+        if code is None:
+            with self.lock:
+                code = self.codes.get(currency_name)
+                if code is None:
+                    code = len(self.names)
+                    self.names.append(currency_name)
+                    self.codes[currency_name] = code
+        return code
+
+    def get_name(self, code):
+        """Return the name of the currency with the given code."""
+        return self.names[code]
+
+    def __len__(self):
+        return len(self.names)
+
+
+CURRENCY_REGISTRY = CurrencyRegistry()
+
+
+DATE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+DATE_TIME_CACHE_SIZE = 4096
+EXEMPTION_CUTOFF_CACHE_SIZE = 1024
+# layout of the time stamps of the crypto.com csv file, e.g. '2021-05-20 12:57:28'
+FIXED_WIDTH_DATE_TIME_PATTERN = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2}")
+
+
+def get_date_time_object(datetime_as_string):
+    """
+    Function for converting a string to a datetime.datetime object.
+    If the conversion is not possible a ValueError is thrown. Otherwise 
+    the datetime.datetime object is returned.
+    Strings with the fixed width layout 'YYYY-MM-DD HH:MM:SS' of the crypto.com
+    csv file are converted without the overhead of strptime. All other strings
+    are passed on to strptime, so the same strings are accepted as before.
+    """
+    if FIXED_WIDTH_DATE_TIME_PATTERN.fullmatch(datetime_as_string):
+        try:
+            return datetime.datetime.fromisoformat(datetime_as_string)
+        except ValueError:
+            pass
+    return datetime.datetime.strptime(datetime_as_string, DATE_TIME_FORMAT)
+
+
+@functools.lru_cache(maxsize=DATE_TIME_CACHE_SIZE)
+def get_cached_date_time_object(datetime_as_string):
+    """
+    Variant of get_date_time_object, which keeps the most recently parsed
+    strings and their datetime.datetime objects in a cache. This pays off if
+    the same time stamps are parsed repeatedly.
+    """
+    return get_date_time_object(datetime_as_string)
+
+
+def get_exemption_cutoff(sale_date_time):
+    """
+    Function returning the point in time, before which a crypto currency has to
+    be acquired in order to sell it tax-free at the given sale_date_time. Under
+    German law a private sale is exempt, if the holding period exceeds one year.
+    The period starts on the day after the acquisition and ends at the end of
+    the same calendar day one year later, so all acquisitions before the start
+    of the same calendar day one year before the sale are exempt. For a sale on
+    February 29 this is March 1 of the previous year.
+    """
+    return get_exemption_cutoff_of_date(sale_date_time.date())
+
+
+@functools.lru_cache(maxsize=EXEMPTION_CUTOFF_CACHE_SIZE)
+def get_exemption_cutoff_of_date(sale_date):
+    """
+    Variant of get_exemption_cutoff for the date of a sale, which keeps the
+    results of the most recent dates in a cache, since there are usually many
+    sales on the same day.
+    """
+    try:
+        cutoff_date = sale_date.replace(year=sale_date.year - 1)
+    except ValueError:
+        cutoff_date = datetime.date(sale_date.year - 1, 3, 1)
+    return datetime.datetime.combine(cutoff_date, datetime.time())
+
+
+@dataclass(slots=True)
+class CryptoAcquisitionRecord:
+    """
+    Class representing a data entry of a single acquisition transaction of a
+    crypto currency. It contains all relevant data in order to compute the capital
+    gains tax, if the crypto currency is sold again. The class uses slots instead
+    of a __dict__ per instance, since there may be millions of open acquisitions.
+    """
+    date_time: datetime
+    amount: float
+    bought_at: float
+    tax_policy: Enum = TaxPolicy.CAPITAL_GAINS
+
+    def __str__(self):
+        return (
+            f"Date and Time: {self.date_time}, "
+            f"Amount: {self.amount}, "
+            f"Bought At: {self.bought_at}, "
+            f"Tax Policy: {self.tax_policy.name}"
+        )
+
+
+class CryptoAcquisitionRecordQueue:
+    """
+    Container holding the acquisition records of a single crypto currency in
+    chronological order, i.e. the oldest record comes first. Records which are
+    not older than the newest record are simply appended, older records are
+    inserted at their position found by binary search. Records with the same
+    time stamp keep the order in which they have been added.
+    """
+
+    def __init__(self, acquisition_records=()):
+        self.records = collections.deque()
+        for acquisition_record in acquisition_records:
+            self.add(acquisition_record)
+
+    def add(self, acquisition_record):
+        """Add an acquisition record at its chronological position."""
+        records = self.records
+        if not records or records[-1].date_time <= acquisition_record.date_time:
+            records.append(acquisition_record)
+            return
+        index = bisect.bisect_right(records, acquisition_record.date_time,
+                                    key=lambda record: record.date_time)
+        records.insert(index, acquisition_record)
+
+    def popleft(self):
+        """Remove and return the oldest acquisition record."""
+        return self.records.popleft()
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def __eq__(self, other):
+        if isinstance(other, CryptoAcquisitionRecordQueue):
+            other = other.records
+        try:
+            return len(self.records) == len(other) and all(
+                record == other_record for record, other_record in zip(self.records, other))
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return f"{type(self).__name__}({list(self.records)!r})"
+
+
+class CurrencyLotMap(MutableMapping):
+    """
+    Mapping of the names of crypto currencies to the queues of their
+    acquisition records. The queues are kept in a list indexed by the code of
+    the currency in the registry, so get_lots finds the queue of an interned
+    currency without hashing its name. A CurrencyLotMap is pickled and
+    copied with the names of its currencies, which are interned again by the
+    CURRENCY_REGISTRY, since the codes of a registry are only valid within
+    one process.
+    """
+
+    def __init__(self, registry=CURRENCY_REGISTRY):
+        self.registry = registry
+        self.lots = []
+        self.number_of_currencies = 0
+
+    def get_lots(self, code):
+        """Return the queue of the currency with the given code or None."""
+        lots = self.lots
+        return lots[code] if code < len(lots) else None
+
+    def set_lots(self, code, acquisition_records):
+        """Set the queue of the currency with the given code and return it."""
+        lots = self.lots
+        if code >= len(lots):
+            lots.extend([None] * (code + 1 - len(lots)))
+        if lots[code] is None:
+            self.number_of_currencies += 1
+        lots[code] = acquisition_records
+        return acquisition_records
+
+    def __getitem__(self, crypto_currency):
+        code = self.registry.codes.get(crypto_currency)
+        if code is not None:
+            acquisition_records = self.get_lots(code)
+            if acquisition_records is not None:
+                return acquisition_records
+        raise KeyError(crypto_currency)
+
+    def __setitem__(self, crypto_currency, acquisition_records):
+        self.set_lots(self.registry.get_code(crypto_currency), acquisition_records)
+
+    def __delitem__(self, crypto_currency):
+        code = self.registry.codes.get(crypto_currency)
+        if code is None or self.get_lots(code) is None:
+            raise KeyError(crypto_currency)
+        self.lots[code] = None
+        self.number_of_currencies -= 1
+
+    def __contains__(self, crypto_currency):
+        code = self.registry.codes.get(crypto_currency)
+        return code is not None and self.get_lots(code) is not None
+
+    def __iter__(self):
+        get_name = self.registry.get_name
+        return (get_name(code) for code, acquisition_records in enumerate(self.lots)
+                if acquisition_records is not None)
+
+    def __len__(self):
+        return self.number_of_currencies
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def __reduce__(self):
+        return (type(self), (), None, None, iter(dict(self).items()))
+
+
+@dataclass(slots=True)
+class Disposal:
+    """
+    Class representing the acquisitions removed by a single sale or swap: the
+    removed amount of crypto currency and the Euro amount at which it has been
+    bought, together with the exempt part of both, i.e. the part from
+    acquisitions held for more than one year at the date_time of the sale.
+    The consumed_lots of a CryptoAcquisitionRecordRemover are only kept for
+    an audit trail.
+    """
+    date_time: datetime
+    amount: float = 0.0
+    bought_at: float = 0.0
+    exempt_amount: float = 0.0
+    exempt_bought_at: float = 0.0
+    crypto_currency: str = ""
+    consumed_lots: list = None
+
+    def get_exempt_proceeds(self, proceeds):
+        """Return the share of the given proceeds of the exempt amount."""
+        if self.exempt_amount == 0.0:
+            return 0.0
+        return proceeds * (self.exempt_amount / self.amount)
+
+
+def get_crypto_acquisition_record_from_raw_data_entry(raw_data_entry, date_time=None):
+    """
+    Functon to convert a list, obtained from reading in a data row in crypto.com's
+    csv file, to an object of type CryptoAquisitionRecord. The time stamp of the
+    row is only parsed, if it is not passed on as date_time.
+    """
+    if date_time is None:
+        date_time = get_date_time_object(raw_data_entry[Heading.TIMESTAMP.value])
+    crypto_amount = float(raw_data_entry[Heading.TARGET_AMOUNT.value])
+    euro_amount = float(raw_data_entry[Heading.NATIVE_CURRENCY_AMOUNT.value])
+    return CryptoAcquisitionRecord(date_time, crypto_amount, euro_amount)
+
+
+@dataclass(frozen=True, slots=True)
+class RewardTreatment:
+    """
+    The treatment of a reward, e.g. staking rewards, Earn interest or a card
+    cashback, which is acquired without giving away any currency. The cost
+    basis of the acquisition is zero or, at_market_value, the Euro value at
+    the time of the receipt. Its tax_policy is the one of the acquisition
+    record.
+    """
+    at_market_value: bool = False
+    tax_policy: Enum = TaxPolicy.CAPITAL_GAINS
+
+
+ZERO_COST_REWARD = RewardTreatment()
+# dispatch table of the rewards by their transaction description, whose rows
+# give the received crypto currency and amount as source currency and amount
+REWARD_TREATMENTS = {
+    "Card Cashback": ZERO_COST_REWARD,
+    "Crypto Earn": ZERO_COST_REWARD,
+    "CRO Stake Rewards": ZERO_COST_REWARD,
+    "Staking Rewards": ZERO_COST_REWARD,
+    "Referral Bonus": ZERO_COST_REWARD,
+    "Referral Card Cashback": ZERO_COST_REWARD,
+    "Sign-up Bonus Unlocked": ZERO_COST_REWARD,
+}
+
+
+def get_reward_record_from_raw_data_entry(raw_data_entry, reward_treatment, date_time=None):
+    """
+    Function to convert a data row of a reward in crypto.com's csv file to an
+    object of type CryptoAquisitionRecord with the cost basis and the tax
+    policy of the given RewardTreatment. Raises a ValueError for an amount,
+    which is not positive, e.g. of a reverted reward.
+    """
+    if date_time is None:
+        date_time = get_date_time_object(raw_data_entry[Heading.TIMESTAMP.value])
+    crypto_amount = float(raw_data_entry[Heading.SOURCE_AMOUNT.value])
+    if crypto_amount <= 0.0 or math.isnan(crypto_amount):
+        raise ValueError(f"The amount {crypto_amount} of a reward is not positive.")
+    euro_amount = 0.0
+    if reward_treatment.at_market_value:
+        euro_amount = abs(float(raw_data_entry[Heading.NATIVE_CURRENCY_AMOUNT.value]))
+    return CryptoAcquisitionRecord(date_time, crypto_amount, euro_amount,
+                                   reward_treatment.tax_policy)
+
+
+def dispatch_reward(raw_data_entry, reward_treatments):
+    """
+    Look up the RewardTreatment of a data row by its transaction description
+    in the dispatch table reward_treatments and convert the row of a reward
+    to a CryptoAquisitionRecord. Returns None for a row, which is not a
+    reward.
+    """
+    reward_treatment = reward_treatments.get(raw_data_entry[Heading.IDENTIFIER.value])
+    if reward_treatment is None:
+        return None
+    return get_reward_record_from_raw_data_entry(raw_data_entry, reward_treatment)
+
+
+class NullInstrumentation:
+    """
+    Hooks of the instrumentation of a run, which do nothing. The functions to
+    be timed are wrapped once when the hooks are set, so no time is spent for
+    the instrumentation in the processing of a row, if it is disabled. The
+    class Instrumentation of the module instrumentation collects the data.
+    """
+
+    def wrap(self, stage, function):  # pylint: disable=unused-argument
+        """Return the given function, whose calls are attributed to the stage."""
+        return function
+
+    def wrap_iterable(self, stage, iterable):  # pylint: disable=unused-argument
+        """Return the given iterable, whose iteration is attributed to the stage."""
+        return iterable
+
+    def record_removal(self, crypto_currency, acquisition_record_remover):
+        """Hook called with a CryptoAcquisitionRecordRemover after it has been called."""
+
+    def record_run(self, profit_calculator, processed_rows, elapsed_time):
+        """Hook called by a ProfitCalculator at the end of process_data."""
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
+
+
+class Diagnostics:
+    """
+    Aggregated diagnostics of a run. Instead of logging an unusual event, e.g.
+    an acquisition dated after a sale, every time it occurs, the occurrences
+    are counted per event and crypto currency and logged once by report at
+    the level, at which each occurrence would have been logged.
+    """
+
+    def __init__(self):
+        self.events = collections.Counter()
+        self.levels = {}
+
+    def count(self, event, crypto_currency, level=logging.WARNING):
+        """Count an occurrence of the event for the crypto currency."""
+        self.events[(event, crypto_currency)] += 1
+        self.levels[event] = level
+
+    def update(self, diagnostics):
+        """Add the events counted by other Diagnostics, e.g. of a worker process."""
+        self.events.update(diagnostics.events)
+        self.levels.update(diagnostics.levels)
+
+    def report(self):
+        """Log each counted event once together with its number of occurrences."""
+        for (event, crypto_currency), count in sorted(self.events.items()):
+            logger.log(self.levels.get(event, logging.WARNING),
+                       "%s: %d times for the crypto currency %s.",
+                       event, count, crypto_currency)
+
+
+# part of the amount of a removal, which may remain open due to the rounding of floats
+RELATIVE_AMOUNT_TOLERANCE = 1e-9
+
+
+class CryptoAcquisitionRecordRemover: # pylint: disable=too-few-public-methods
+    """
+    Functor, whose constructor is called with the queue of actual aquisition
+    records of a certain crypto currency and the amount of how much of it should
+    be removed. Upon being called it pops the fully consumed oldest aquisition
+    records from the front of the queue and reduces a partially consumed record
+    in place, so the costs only depend on the number of consumed records. It
+    returns the Euro amount at which the removed amount of crypto currency has
+    been bought. The removal is accumulated in the Disposal disposal, which
+    keeps the part removed from records acquired more than one year before
+    the removal date or with the TaxPolicy EXEMPT separately. Whether a
+    consumed record has been held long enough is decided by its date_time,
+    which is read anyway, so the queue is never searched. Afterwards
+    consumed_records holds the number of records removed from or reduced.
+    The removal stops at a record acquired after the removal date, whose date
+    is kept as later_acquisition_date_time for the caller to report, so
+    nothing is logged while the records are consumed. If the consumed_lots of
+    the disposal are set to a list before the call, a tuple of the
+    acquisition date_time, the removed amount, the Euro amount at which it
+    has been bought and the TaxPolicy of the removal is appended for every
+    consumed record.
+    An open amount of less than the relative_amount_tolerance of the amount
+    to remove is the residue of the float arithmetic and counts as removed. A
+    larger open amount raises a ValueError, so the row of the sale is
+    skipped, while the consumed records stay removed.
+    """
+
+    relative_amount_tolerance = RELATIVE_AMOUNT_TOLERANCE
+
+    def __init__(self, aquisition_records, amount_to_remove, removal_date_time):
+        self.amount_to_be_removed = abs(float(amount_to_remove))
+        self.disposal = Disposal(removal_date_time, self.amount_to_be_removed)
+        self.consumed_records = 0
+        self.later_acquisition_date_time = None
+        self.acquisition_records = aquisition_records
+
+    def __call__(self):
+        acquisition_records = self.acquisition_records
+        removal_date_time = self.disposal.date_time
+        exemption_cutoff = get_exemption_cutoff(removal_date_time)
+        exempt_tax_policy = TaxPolicy.EXEMPT
+        consumed_records = 0
+        # the consumed lots are only kept, if requested, without a check per record
+        handle_acquisition_record = self._handle_acquisition_record \
+            if self.disposal.consumed_lots is None else self._handle_and_keep_acquisition_record
+        # the residue of the float arithmetic, e.g. of 0.1 + 0.2 - 0.3, is no open amount
+        open_amount_tolerance = self.amount_to_be_removed * self.relative_amount_tolerance
+        while self.amount_to_be_removed > open_amount_tolerance and acquisition_records:
+            acquisition_record = acquisition_records[0]
+            date_time = acquisition_record.date_time
+            if date_time > removal_date_time:
+                self.later_acquisition_date_time = date_time
+                break
+            handle_acquisition_record(
+                acquisition_record, date_time < exemption_cutoff
+                or acquisition_record.tax_policy is exempt_tax_policy)
+            consumed_records += 1
+        self.consumed_records = consumed_records
+        if self.amount_to_be_removed > open_amount_tolerance:
+            raise ValueError("There were not enough assets for the crypto sale. "
+                             f"Open amount: {self.amount_to_be_removed:7.5f}")
+        return self.disposal.bought_at
+
+    def _handle_and_keep_acquisition_record(self, acquisition_record, is_exempt):
+        # the record may be a view, which is invalid after it has been popped
+        date_time = acquisition_record.date_time
+        removed_amount, removed_bought_at = self._handle_acquisition_record(
+            acquisition_record, is_exempt)
+        self.disposal.consumed_lots.append(
+            (date_time, removed_amount, removed_bought_at,
+             TaxPolicy.EXEMPT if is_exempt else TaxPolicy.CAPITAL_GAINS))
+
+    def _handle_acquisition_record(self, acquisition_record, is_exempt):
+        if self._is_consumed_completely(acquisition_record):
+            removed_amount = acquisition_record.amount
+            removed_bought_at = acquisition_record.bought_at
+            self.acquisition_records.popleft()
+        else:
+            removed_amount = self.amount_to_be_removed
+            removed_bought_at = self._get_removed_bought_at(acquisition_record, removed_amount)
+            acquisition_record.amount -= removed_amount
+            acquisition_record.bought_at -= removed_bought_at
+        self.amount_to_be_removed -= removed_amount
+        disposal = self.disposal
+        disposal.bought_at += removed_bought_at
+        if is_exempt:
+            disposal.exempt_amount += removed_amount
+            disposal.exempt_bought_at += removed_bought_at
+        return removed_amount, removed_bought_at
+
+    def _is_consumed_completely(self, acquisition_record):
+        """Check whether the removal consumes the acquisition record completely."""
+        # do not leave amounts of 1 / 100000 of the original sum
+        return self.amount_to_be_removed > (acquisition_record.amount * 0.99999)
+
+    @staticmethod
+    def _get_removed_bought_at(acquisition_record, removed_amount):
+        """Return the Euro amount at which the removed part of a partially
+        consumed acquisition record has been bought."""
+        return acquisition_record.bought_at * (removed_amount / acquisition_record.amount)
+
+
+@dataclass(slots=True)
+class LotPolicy:
+    """
+    How a CryptoAquisitionData keeps the lots of its acquisitions. With
+    keep_consumed_lots the Disposal of a removal holds the consumed lots, e.g.
+    for an audit trail. With compact_lots an acquisition is merged into the
+    newest lot of its currency, if both have been acquired on the same
+    calendar day, with the same TaxPolicy and at the same price per unit. The
+    lots are not compacted, while the consumed lots are kept.
+    """
+    keep_consumed_lots: bool = False
+    compact_lots: bool = False
+
+    def merges_lots(self):
+        """Check whether an acquisition may be merged into the newest lot."""
+        return self.compact_lots and not self.keep_consumed_lots
+
+
+class CryptoAquisitionData:
+    """
+    Data class, which holds the aquisitions of each crypto currency. The data
+    can be manipulated by the member function add, remove and swap, which
+    correspond to buying, selling and exchanging crypto currencies. The
+    aquisitions of each crypto currency are stored in an object of the given
+    record_queue_type, e.g. a CompactAcquisitionRecordQueue from the module
+    compact_lot_store for a smaller memory footprint. The queues are found in
+    the CurrencyLotMap data_set by the interned code of the currency.
+    Unusual events are logged as they occur or counted by the Diagnostics set
+    with set_diagnostics. Whether debug messages are logged is looked up once
+    by update_log_level instead of for every transaction. The LotPolicy
+    lot_policy decides, whether the Disposal of a removal holds the consumed
+    lots and whether an acquisition is merged into the newest lot of its
+    currency as it arrives, e.g. the zero-cost rewards of daily staking.
+    """
+
+    def __init__(self, record_queue_type=CryptoAcquisitionRecordQueue):
+        self.data_set = CurrencyLotMap()
+        self.record_queue_type = record_queue_type
+        self.instrumentation = NULL_INSTRUMENTATION
+        self.parse_date_time = get_date_time_object
+        self.diagnostics = None
+        self.is_debug_enabled = False
+        self.lot_policy = LotPolicy()
+        self.update_log_level()
+
+    def set_diagnostics(self, diagnostics):
+        """Count unusual events with the given Diagnostics instead of logging
+        each of them, or log each of them again for None."""
+        self.diagnostics = diagnostics
+
+    def update_log_level(self):
+        """Look up whether debug messages are logged, e.g. at the start of a run."""
+        self.is_debug_enabled = logger.isEnabledFor(logging.DEBUG)
+
+    def set_instrumentation(self, instrumentation):
+        """
+        Set the hooks of the instrumentation, e.g. an Instrumentation of the
+        module instrumentation. The member functions add, add_reward,
+        remove_disposal and swap_disposal and the parsing of the time stamps
+        are timed by the instrumentation.
+        """
+        self.instrumentation = instrumentation
+        self.parse_date_time = instrumentation.wrap("get_date_time_object",
+                                                    get_date_time_object)
+        for stage in ("add", "add_reward", "remove_disposal", "swap_disposal"):
+            # the member function of the class is bound, so that a repeated call
+            # does not wrap the already wrapped function again
+            setattr(self, stage, instrumentation.wrap(
+                stage, types.MethodType(getattr(type(self), stage), self)))
+
+    def add(self, raw_data_entry):
+        """Add an one-time aquisition of a crypto currency to the data class.
+        The aquistion is given in terms of a crypto.com csv-datafile entry,
+        which has been converted from a string to a list."""
+        crypto_currency = raw_data_entry[Heading.TARGET_CURRENCY.value]
+        try:
+            currency_entry = self._get_acquisition_record(
+                raw_data_entry, self.parse_date_time(raw_data_entry[Heading.TIMESTAMP.value]))
+        except ValueError as e:
+            self._log_event(
+                "Ignored acquisition with an invalid value", crypto_currency, logging.ERROR,
+                "A value error was raised: %s. While trying to parse the string: %s. "
+                "The data entry is ignored.", e, raw_data_entry)
+            return
+        self.add_record(crypto_currency, currency_entry)
+
+    def add_reward(self, raw_data_entry, reward_treatment):
+        """Add a reward, e.g. staking rewards or a card cashback, as an
+        aquisition of the received crypto currency with the cost basis and
+        the tax policy of the given RewardTreatment."""
+        crypto_currency = raw_data_entry[Heading.SOURCE_CURRENCY.value]
+        try:
+            currency_entry = self._get_reward_record(
+                raw_data_entry, reward_treatment,
+                self.parse_date_time(raw_data_entry[Heading.TIMESTAMP.value]))
+        except ValueError as e:
+            self._log_event(
+                "Ignored reward with an invalid value", crypto_currency, logging.ERROR,
+                "A value error was raised: %s. While trying to parse the string: %s. "
+                "The data entry is ignored.", e, raw_data_entry)
+            return
+        self.add_record(crypto_currency, currency_entry)
+
+    def add_record(self, crypto_currency, currency_entry):
+        """Add an aquisition record of the given crypto currency to the data class."""
+        acquisition_records = self._get_lots(crypto_currency)
+        if acquisition_records is None:
+            acquisition_records = self.data_set.set_lots(
+                self.data_set.registry.get_code(crypto_currency), self.record_queue_type())
+        if self.is_debug_enabled:
+            logger.debug("Adding entry for crypto currency %s.", crypto_currency)
+        # the consumed lots of an audit trail keep the time stamp of each acquisition
+        if (acquisition_records and self.lot_policy.merges_lots()
+                and self._merge_into_newest_lot(acquisition_records[-1], currency_entry)):
+            return
+        acquisition_records.add(currency_entry)
+
+    def _merge_into_newest_lot(self, newest_record, currency_entry):
+        """
+        Merge the acquisition record currency_entry into the newest record
+        of its currency and return True, if both have been acquired on the
+        same calendar day, have the same TaxPolicy and the same price per
+        unit. The merged record keeps the time stamp of the earlier
+        acquisition. As the exemption cutoff is the start of a day, the
+        exempt part of a sale does not change and, at the same price, neither
+        does the cost basis of any removed amount. Acquisitions of different
+        days are never merged, since a sale one year after the earlier one
+        would only find the earlier one exempt.
+        """
+        date_time = currency_entry.date_time
+        newest_date_time = newest_record.date_time
+        if (newest_date_time > date_time
+                or newest_record.tax_policy is not currency_entry.tax_policy
+                or newest_date_time.date() != date_time.date()
+                or newest_record.bought_at * currency_entry.amount
+                != currency_entry.bought_at * newest_record.amount):
+            return False
+        newest_record.amount += currency_entry.amount
+        newest_record.bought_at += currency_entry.bought_at
+        return True
+
+    def _get_lots(self, crypto_currency):
+        """Return the queue of the acquisition records of the crypto currency or None."""
+        # the codes and the list of the queues are looked up directly, since a
+        # call of CurrencyLotMap.get_lots costs more than the lookup itself; the
+        # data_set is looked up every time, as a snapshot may replace it
+        data_set = self.data_set
+        code = data_set.registry.codes.get(crypto_currency)
+        lots = data_set.lots
+        return lots[code] if code is not None and code < len(lots) else None
+
+    def remove(self, raw_data_entry):
+        """Remove an amount of a crypto currency from the data class. This
+        corresponds to a one-time sale of the crypto currency. The sale is
+        given in terms of a crypto.com csv-datafile entry, which has been
+        converted from a string to a list. Returns the Euro amount at which
+        the sold amount has been bought.
+        """
+        return self.remove_disposal(raw_data_entry).bought_at
+
+    def remove_disposal(self, raw_data_entry):
+        """Like remove, but returns the Disposal of the sale, which splits
+        the sold amount into its exempt and its taxable part."""
+        date_time = self.parse_date_time(raw_data_entry[Heading.TIMESTAMP.value])
+        return self._remove(raw_data_entry, date_time)
+
+    def _log_event(self, event, crypto_currency, level, message, *args):
+        """Log an unusual event with the given message or only count it, if
+        the diagnostics are aggregated."""
+        if self.diagnostics is not None:
+            self.diagnostics.count(event, crypto_currency, level)
+        else:
+            logger.log(level, message, *args)
+
+    def _log_unknown_currency(self, crypto_currency):
+        """Report the removal of a crypto currency, which has never been acquired."""
+        self._log_event("Removal without an acquisition", crypto_currency, logging.ERROR,
+                        "Logical error: there should be an entry for the "
+                        "crypto currency %s.", crypto_currency)
+
+    def _finish_removal(self, crypto_currency, transaction_remover):
+        """Report the outcome of a called CryptoAcquisitionRecordRemover."""
+        if transaction_remover.later_acquisition_date_time is not None:
+            self._log_event(
+                "Acquisition after the removal date", crypto_currency, logging.WARNING,
+                "Skipping the record at %s because it is after the transaction date %s.",
+                transaction_remover.later_acquisition_date_time,
+                transaction_remover.disposal.date_time)
+        self.instrumentation.record_removal(crypto_currency, transaction_remover)
+
+    def _get_acquisition_record(self, raw_data_entry, date_time=None):
+        """Convert a data row to the acquisition record of the acquired crypto currency."""
+        return get_crypto_acquisition_record_from_raw_data_entry(raw_data_entry, date_time)
+
+    def _get_reward_record(self, raw_data_entry, reward_treatment, date_time=None):
+        """Convert a data row of a reward to the acquisition record of the
+        received crypto currency."""
+        return get_reward_record_from_raw_data_entry(raw_data_entry, reward_treatment, date_time)
+
+    def _remove(self, raw_data_entry, date_time):
+        """Remove the amount of the source crypto currency of a data row."""
+        return self.remove_amount(raw_data_entry[Heading.SOURCE_CURRENCY.value],
+                                  raw_data_entry[Heading.SOURCE_AMOUNT.value], date_time)
+
+    def remove_amount(self, crypto_currency, amount, date_time):
+        """Remove the given amount of a crypto currency, a number or a decimal
+        string, which has been sold or swapped at date_time, and return the
+        Disposal. This allows already parsed transactions to be processed."""
+        acquisition_records = self._get_lots(crypto_currency)
+        if acquisition_records is None:
+            self._log_unknown_currency(crypto_currency)
+            return Disposal(date_time, crypto_currency=crypto_currency)
+        if self.is_debug_enabled:
+            logger.debug(
+                "Crypto transaction: removing the amount %s "
+                "of the crypto curreny %s.", amount, crypto_currency
+            )
+        transaction_remover = CryptoAcquisitionRecordRemover(
+            acquisition_records, amount, date_time)
+        return self._call_remover(crypto_currency, transaction_remover)
+
+    def _call_remover(self, crypto_currency, transaction_remover):
+        """Call a CryptoAcquisitionRecordRemover of the crypto currency and
+        return its Disposal."""
+        disposal = transaction_remover.disposal
+        disposal.crypto_currency = crypto_currency
+        if self.lot_policy.keep_consumed_lots:
+            disposal.consumed_lots = []
+        try:
+            transaction_remover()
+        finally:
+            self._finish_removal(crypto_currency, transaction_remover)
+        return disposal
+
+    def swap(self, raw_data_entry):
+        """Convert an amount of one crypto currency into another crypto 
+        currency within the data class. This corresponds to buying one crypto
+        currency with another crypto currency. This crypto exchange is given in 
+        terms of a crypto.com csv-datafile entry, which has been converted from
+        a string to a list. Returns the Euro amount at which the swapped
+        amount of the source crypto currency has been bought.
+        """
+        return self.swap_disposal(raw_data_entry).bought_at
+
+    def swap_disposal(self, raw_data_entry):
+        """Like swap, but returns the Disposal of the swapped amount of the
+        source crypto currency."""
+        date_time = self.parse_date_time(raw_data_entry[Heading.TIMESTAMP.value])
+        disposal = self._remove(raw_data_entry, date_time)
+        crypto_currency = raw_data_entry[Heading.TARGET_CURRENCY.value]
+        currency_entry = self._get_acquisition_record(raw_data_entry, date_time)
+        self.add_record(crypto_currency, currency_entry)
+        return disposal
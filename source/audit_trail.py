@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+
+"""
+The module provides the streaming output of an audit trail, which states for every sale
+or swap the acquisition records consumed by the FIFO matching: the time stamp of the
+acquisition, the removed amount, the pro-rated Euro amount at which it has been bought,
+the holding period in days and the TaxPolicy of the removal. The rows are written as
+csv or JSON Lines while the data is processed. They are collected and written in blocks,
+so the audit trail of a run of millions of rows costs few calls of the file object.
+A ProfitCalculator writes to an AuditTrailWriter after its set_audit_trail.
+"""
+
+import csv
+import json
+
+AUDIT_TRAIL_FORMATS = ("csv", "jsonl")
+AUDIT_TRAIL_COLUMNS = ("sale", "sale_timestamp", "crypto_currency", "acquisition_timestamp",
+                       "amount", "cost_basis", "holding_days", "tax_policy")
+# number of rows collected before they are written in a single call
+ROWS_PER_WRITE = 4096
+FILE_BUFFER_SIZE = 1 << 20
+
+
+class AuditTrailWriter:
+    """
+    Writer of the audit trail to a csv or a JSON Lines file, which is used as
+    a context manager. The rows passed to write_rows are tuples of the values
+    of AUDIT_TRAIL_COLUMNS. The csv file starts with a header.
+    """
+
+    def __init__(self, file_name, output_format="csv", rows_per_write=ROWS_PER_WRITE):
+        if output_format not in AUDIT_TRAIL_FORMATS:
+            raise ValueError(f"Unknown format of the audit trail: '{output_format}'")
+        self.output_format = output_format
+        self.rows_per_write = rows_per_write
+        self.rows = []
+        self.written_rows = 0
+        self.output_file = open(  # pylint: disable=consider-using-with
+            file_name, encoding="utf-8", mode='w', newline='', buffering=FILE_BUFFER_SIZE)
+        self.csv_writer = None
+        if output_format == "csv":
+            self.csv_writer = csv.writer(self.output_file)
+            self.csv_writer.writerow(AUDIT_TRAIL_COLUMNS)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_rows(self, rows):
+        """Add the rows of a sale, which are written once enough rows are collected."""
+        self.rows.extend(rows)
+        if len(self.rows) >= self.rows_per_write:
+            self.flush()
+
+    def flush(self):
+        """Write the collected rows."""
+        if self.csv_writer is not None:
+            self.csv_writer.writerows(self.rows)
+        else:
+            encode = json.JSONEncoder(separators=(",", ":")).encode
+            self.output_file.write("".join(
+                encode(dict(zip(AUDIT_TRAIL_COLUMNS, row))) + "\n" for row in self.rows))
+        self.written_rows += len(self.rows)
+        self.rows.clear()
+
+    def close(self):
+        """Write the remaining rows and close the file."""
+        if self.output_file.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self.output_file.close()
@@ -0,0 +1,140 @@
+#!/usr/bin/python3
+
+"""
+This file provides unit tests for the functionality within the module audit_trail.
+"""
+
+# pylint: disable=C0115,C0116
+
+import csv
+import json
+import os
+import tempfile
+import unittest
+import audit_trail
+import crypto_tax_report
+import crypto_tax_report_test
+import fixed_point
+import parallel_processing
+from crypto_tax_report import logger
+from crypto_tax_report_test import SimplePurchaseData
+from parallel_processing_test import get_test_corpus
+
+
+class AuditTrailTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+        self.temporary_directory = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.file_name = os.path.join(self.temporary_directory.name, "audit")
+
+    def tearDown(self) -> None:
+        self.temporary_directory.cleanup()
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    @staticmethod
+    def get_sale_data():
+        return [
+            ["2021-12-06 14:01:56", "CRO -> EUR", "CRO", "-100.0", "EUR",
+                "30.0", "EUR", "30.0", "33.0", "crypto_viban_exchange",],
+            ["2022-06-01 10:24:33", "ADA -> EUR", "ADA", "-250.0", "EUR",
+                "500.0", "EUR", "500.0", "550.0", "crypto_viban_exchange",],
+        ]
+
+    def process_data(self, profit_calculator, raw_data, output_format="csv", **kwargs):
+        with audit_trail.AuditTrailWriter(self.file_name, output_format, **kwargs) as writer:
+            profit_calculator.set_audit_trail(writer)
+            profit_calculator.process_data(raw_data)
+        return writer
+
+    def read_csv_rows(self):
+        with open(self.file_name, encoding="utf-8", newline='') as audit_file:
+            return list(csv.reader(audit_file))
+
+    def test_audit_trail_of_sales(self):
+        profit_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        writer = self.process_data(
+            profit_calculator, SimplePurchaseData.as_raw() + AuditTrailTest.get_sale_data())
+        self.assertEqual(writer.written_rows, 3)
+        self.assertEqual(self.read_csv_rows(), [
+            list(audit_trail.AUDIT_TRAIL_COLUMNS),
+            ["0", "2021-12-06 14:01:56", "CRO", "2021-05-29 19:57:07", "100.0", "10.0",
+             "190", "CAPITAL_GAINS"],
+            # the first acquisition has been held for more than one year
+            ["1", "2022-06-01 10:24:33", "ADA", "2021-05-20 12:57:28", "200.0", "300.0",
+             "376", "EXEMPT"],
+            ["1", "2022-06-01 10:24:33", "ADA", "2021-06-27 12:41:01", "50.0", "50.0",
+             "338", "CAPITAL_GAINS"]])
+
+    def test_audit_trail_as_json_lines(self):
+        profit_calculator = fixed_point.FixedPointProfitCalculator(
+            fixed_point.FixedPointAquisitionData())
+        writer = self.process_data(
+            profit_calculator, SimplePurchaseData.as_raw() + AuditTrailTest.get_sale_data(),
+            "jsonl", rows_per_write=2)
+        self.assertEqual(writer.written_rows, 3)
+        with open(self.file_name, encoding="utf-8") as audit_file:
+            rows = [json.loads(line) for line in audit_file]
+        self.assertEqual(rows[2], {
+            "sale": 1, "sale_timestamp": "2022-06-01 10:24:33", "crypto_currency": "ADA",
+            "acquisition_timestamp": "2021-06-27 12:41:01", "amount": "50.000000",
+            "cost_basis": "50.00", "holding_days": 338, "tax_policy": "CAPITAL_GAINS"})
+
+    def test_audit_trail_adds_up_to_the_rollups(self):
+        raw_data = get_test_corpus(3000, seed=5)
+        profit_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        self.process_data(profit_calculator, raw_data)
+        cost_basis = {}
+        for sale, _, crypto_currency, _, _, cost, holding_days, tax_policy in \
+                self.read_csv_rows()[1:]:
+            self.assertGreaterEqual(int(holding_days), 0)
+            self.assertIn(tax_policy, ("EXEMPT", "CAPITAL_GAINS"))
+            cost_basis[(int(sale), crypto_currency)] = \
+                cost_basis.get((int(sale), crypto_currency), 0.0) + float(cost)
+        rollup_sales = []
+        for (_, crypto_currency), rollup in profit_calculator.ledger.rollups.items():
+            sales = list(rollup.get_sales())
+            self.assertEqual(len(sales), rollup.number_of_sales)
+            self.assertAlmostEqual(
+                sum(cost_basis[(sale, crypto_currency)] for sale in sales),
+                rollup.cost_basis, places=6)
+            rollup_sales.extend((sale, crypto_currency) for sale in sales)
+        # each audited sale belongs to exactly one rollup
+        self.assertEqual(sorted(rollup_sales), sorted(cost_basis))
+
+    def test_lots_are_not_compacted_for_an_audit_trail(self):
+        raw_data = crypto_tax_report_test.LotCompactionTest.get_staking_data(number_of_days=60)
+        self.process_data(crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData()), raw_data)
+        reference_rows = self.read_csv_rows()
+        profit_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        profit_calculator.set_lot_compaction()
+        self.process_data(profit_calculator, raw_data)
+        # the acquisition time stamps and holding days are those of the single lots
+        self.assertEqual(self.read_csv_rows(), reference_rows)
+
+    def test_parallel_audit_trail_equals_the_serial_one(self):
+        raw_data = get_test_corpus(1000, seed=6)
+        self.process_data(crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData()), raw_data)
+        serial_rows = self.read_csv_rows()
+        self.process_data(parallel_processing.ParallelProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData(), max_workers=2), raw_data)
+        self.assertEqual(self.read_csv_rows(), serial_rows)
+
+    def test_batch_engine_has_no_audit_trail(self):
+        with audit_trail.AuditTrailWriter(self.file_name) as writer:
+            with self.assertRaises(ValueError):
+                crypto_tax_report.get_profit_calculator("batch").set_audit_trail(writer)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            audit_trail.AuditTrailWriter(self.file_name, "xml")
+
+
+if __name__ == '__main__':
+    unittest.main()
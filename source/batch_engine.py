@@ -0,0 +1,320 @@
+#!/usr/bin/python3
+
+"""
+The module provides an optional batch engine for the FIFO matching, which requires
+numpy. The acquisitions and sales of a crypto currency are loaded into arrays and the
+Euro amount at which each sold amount has been bought is computed with vectorized
+cumulative sums: the sales consume the interval between their cumulative sold amounts
+on the axis of the cumulative bought amount, whose cost is interpolated linearly within
+the acquisition lot at each boundary. The serial ProfitCalculator remains the reference
+implementation.
+"""
+
+import time
+
+from acquisition_lots import (
+    CryptoAcquisitionRecord, Disposal, Heading, dispatch_reward, get_date_time_object,
+    get_exemption_cutoff)
+from compact_lot_store import get_date_time_from_epoch_seconds, get_epoch_seconds
+from profit_calculator import ProfitCalculator, TransactionKind, classify_transaction, skip_row
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - numpy is optional
+    numpy = None
+
+# tolerance of the check, whether enough has been acquired before a sale
+RELATIVE_TOLERANCE = 1e-9
+# the values of the Heading enum are looked up once instead of for every row
+TIMESTAMP_COLUMN = Heading.TIMESTAMP.value
+IDENTIFIER_COLUMN = Heading.IDENTIFIER.value
+SOURCE_CURRENCY_COLUMN = Heading.SOURCE_CURRENCY.value
+SOURCE_AMOUNT_COLUMN = Heading.SOURCE_AMOUNT.value
+TARGET_CURRENCY_COLUMN = Heading.TARGET_CURRENCY.value
+TARGET_AMOUNT_COLUMN = Heading.TARGET_AMOUNT.value
+NATIVE_AMOUNT_COLUMN = Heading.NATIVE_CURRENCY_AMOUNT.value
+
+
+def require_numpy():
+    """Raise an ImportError, if numpy is not available."""
+    if numpy is None:
+        raise ImportError("The batch engine requires numpy, which is not installed.")
+
+
+class FifoBatch:
+    """
+    The acquisitions of a single crypto currency as arrays sorted by time,
+    together with their cumulative amounts and costs.
+    """
+
+    def __init__(self, buy_epoch_seconds, buy_amounts, buy_costs):
+        require_numpy()
+        buy_epoch_seconds = numpy.asarray(buy_epoch_seconds, dtype=numpy.int64)
+        order = numpy.argsort(buy_epoch_seconds, kind='stable')
+        self.buy_epoch_seconds = buy_epoch_seconds[order]
+        self.buy_amounts = numpy.asarray(buy_amounts, dtype=numpy.float64)[order]
+        self.buy_costs = numpy.asarray(buy_costs, dtype=numpy.float64)[order]
+        self.unit_costs = numpy.divide(self.buy_costs, self.buy_amounts,
+                                       out=numpy.zeros_like(self.buy_costs),
+                                       where=self.buy_amounts > 0.0)
+        self.cumulative_bought = numpy.concatenate(([0.0], numpy.cumsum(self.buy_amounts)))
+        self.cumulative_cost = numpy.concatenate(([0.0], numpy.cumsum(self.buy_costs)))
+
+    def get_cost_of_cumulative_amounts(self, cumulative_amounts):
+        """
+        Return the Euro amounts at which the first cumulative_amounts of the
+        acquisitions have been bought, pro-rating the lot at the boundary.
+        """
+        number_of_lots = len(self.buy_amounts)
+        if number_of_lots == 0:
+            return numpy.zeros_like(cumulative_amounts)
+        lot_index = numpy.searchsorted(self.cumulative_bought[1:], cumulative_amounts,
+                                       side='left')
+        lot_index = numpy.minimum(lot_index, number_of_lots - 1)
+        return self.cumulative_cost[lot_index] + (
+            cumulative_amounts - self.cumulative_bought[lot_index]) * self.unit_costs[lot_index]
+
+    def compute_cost_basis(self, sale_epoch_seconds, sale_amounts):
+        """
+        Return the Euro amount at which the amount of each sale has been bought.
+        The sales have to be in chronological order and may only consume the
+        acquisitions made until their time. Otherwise a ValueError is raised.
+        """
+        sale_epoch_seconds = numpy.asarray(sale_epoch_seconds, dtype=numpy.int64)
+        cumulative_sold = numpy.cumsum(numpy.abs(numpy.asarray(sale_amounts,
+                                                               dtype=numpy.float64)))
+        available_amounts = self.cumulative_bought[
+            numpy.searchsorted(self.buy_epoch_seconds, sale_epoch_seconds, side='right')]
+        missing = cumulative_sold > available_amounts * (1.0 + RELATIVE_TOLERANCE)
+        if numpy.any(missing):
+            sale_index = int(numpy.argmax(missing))
+            raise ValueError(
+                f"There were not enough assets for the sale number {sale_index}. Open amount: "
+                f"{cumulative_sold[sale_index] - available_amounts[sale_index]:.5f}")
+        return numpy.diff(self.get_cost_of_cumulative_amounts(cumulative_sold), prepend=0.0)
+
+    def get_available_sale_amounts(self, sale_epoch_seconds, sale_amounts):
+        """
+        Return the amount of each sale, which can be taken from the acquisitions
+        made until its time, and whether there were not enough assets for the
+        sale. Like in the serial processing, such a sale consumes all available
+        acquisitions, which are then missing for the later sales. The sales
+        have to be in chronological order.
+        """
+        sale_epoch_seconds = numpy.asarray(sale_epoch_seconds, dtype=numpy.int64)
+        cumulative_sold = numpy.cumsum(numpy.abs(numpy.asarray(sale_amounts,
+                                                               dtype=numpy.float64)))
+        available_amounts = self.cumulative_bought[
+            numpy.searchsorted(self.buy_epoch_seconds, sale_epoch_seconds, side='right')]
+        # the shortfall of a sale reduces the cumulative sold amount of all later sales
+        shortfall = numpy.minimum(
+            numpy.minimum.accumulate(available_amounts - cumulative_sold), 0.0)
+        available_cumulative_sold = cumulative_sold + shortfall
+        missing = numpy.diff(shortfall, prepend=0.0) < -RELATIVE_TOLERANCE * available_amounts
+        return numpy.diff(available_cumulative_sold, prepend=0.0), missing
+
+    def compute_exempt_parts(self, sale_amounts, exemption_cutoff_epoch_seconds):
+        """
+        Return the exempt amount of each sale and the Euro amount at which it
+        has been bought, i.e. the part taken from the acquisitions before the
+        exemption cutoff of the sale. The sales have to be in chronological order.
+        """
+        cumulative_sold = numpy.cumsum(numpy.abs(numpy.asarray(sale_amounts,
+                                                               dtype=numpy.float64)))
+        previously_sold = numpy.concatenate(([0.0], cumulative_sold[:-1]))
+        exempt_bought = self.cumulative_bought[numpy.searchsorted(
+            self.buy_epoch_seconds,
+            numpy.asarray(exemption_cutoff_epoch_seconds, dtype=numpy.int64), side='left')]
+        exempt_sold = numpy.minimum(cumulative_sold, exempt_bought)
+        exempt_amounts = numpy.maximum(exempt_sold - previously_sold, 0.0)
+        exempt_cost_basis = numpy.where(
+            exempt_amounts > 0.0,
+            self.get_cost_of_cumulative_amounts(exempt_sold)
+            - self.get_cost_of_cumulative_amounts(previously_sold), 0.0)
+        return exempt_amounts, exempt_cost_basis
+
+    def get_remaining_lots(self, sold_amount):
+        """
+        Return the acquisitions left after selling the given total amount as a
+        list of tuples (epoch seconds, amount, Euro amount at which it has been bought).
+        """
+        first_lot = int(numpy.searchsorted(self.cumulative_bought[1:], sold_amount,
+                                           side='right'))
+        # the residue of the float arithmetic in the last consumed lot is no lot
+        if (first_lot < len(self.buy_amounts) and self.cumulative_bought[first_lot + 1]
+                - sold_amount <= RELATIVE_TOLERANCE * self.buy_amounts[first_lot]):
+            first_lot += 1
+        remaining_lots = []
+        for lot_index in range(first_lot, len(self.buy_amounts)):
+            amount = float(self.buy_amounts[lot_index])
+            cost = float(self.buy_costs[lot_index])
+            if lot_index == first_lot:
+                amount = float(self.cumulative_bought[lot_index + 1]) - sold_amount
+                cost = float(self.cumulative_cost[lot_index + 1]) - float(
+                    self.get_cost_of_cumulative_amounts(numpy.array([sold_amount]))[0])
+            remaining_lots.append((int(self.buy_epoch_seconds[lot_index]), amount, cost))
+        return remaining_lots
+
+
+class BatchProfitCalculator(ProfitCalculator): # pylint: disable=too-few-public-methods
+    """
+    ProfitCalculator, which collects the acquisitions and sales of every crypto
+    currency and computes the FIFO matching of each currency with a FifoBatch.
+    The profits are added up in the order of the rows. Unlike the serial
+    processing the rows with sales are kept in memory, rows with an invalid
+    value are skipped completely, acquisitions are never dropped as dust and
+    only the holding period decides whether an acquisition is exempt. Like in
+    the serial processing, the row of a sale, for which there were not enough
+    assets, is skipped after it has consumed the available acquisitions, while
+    a sale before the first acquisition of a crypto currency consumes nothing
+    and its full proceeds are taxable. The
+    consumed lots of a sale are not known, so there is no audit trail. The
+    lots are not compacted, since they are not consumed one by one.
+    """
+
+    def set_audit_trail(self, audit_trail):
+        """The batch processing only computes sums of lots and cannot write an
+        audit trail."""
+        if audit_trail is not None:
+            raise ValueError("The batch engine does not support an audit trail.")
+
+    def process_data(self, raw_crypto_aquisition_data):
+        """Process the data from a crypto.com csv file as a batch. The rows
+        have to be in chronological order. Returns the taxable profit
+        accumulated so far."""
+        require_numpy()
+        start_time = time.perf_counter()
+        number_of_rows, buys, sales = self.__collect_events(
+            self.hooks.instrumentation.wrap_iterable("read_rows", raw_crypto_aquisition_data),
+            self.reward_treatments, self.hooks.diagnostics)
+        removals = []
+        for crypto_currency in set(buys) | set(sales):
+            removals.extend(self.__match_currency(
+                crypto_currency, buys.get(crypto_currency, []), sales.get(crypto_currency, [])))
+        self.__book_removals(removals)
+        self._finish_run(number_of_rows, start_time, " as a batch")
+        return self.taxable_profit
+
+    def __match_currency(self, crypto_currency, currency_buys, currency_sales):
+        """Match the sales of a crypto currency with its acquisitions, which
+        follow the lots left by a previous run, and keep the remaining lots in
+        the data_set. Returns the removals as tuples (row index, Disposal, row)."""
+        crypto_aquistion_data = self.crypto_aquistion_data
+        data_set = crypto_aquistion_data.data_set
+        removals = []
+        if crypto_currency not in data_set:
+            removals, currency_sales = self.__remove_before_first_acquisition(
+                crypto_currency, currency_buys, currency_sales)
+        currency_buys = [
+            (get_epoch_seconds(record.date_time), record.amount, record.bought_at)
+            for record in data_set.pop(crypto_currency, ())
+        ] + currency_buys
+        fifo_batch = FifoBatch(*zip(*currency_buys)) if currency_buys else FifoBatch(
+            [], [], [])
+        sold_amount = 0.0
+        if currency_sales:
+            sale_removals, sold_amount = self.__match_sales(
+                crypto_currency, fifo_batch, currency_sales)
+            removals.extend(sale_removals)
+        if currency_buys:
+            data_set[crypto_currency] = crypto_aquistion_data.record_queue_type(
+                CryptoAcquisitionRecord(get_date_time_from_epoch_seconds(epoch_seconds),
+                                        amount, cost)
+                for epoch_seconds, amount, cost in fifo_batch.get_remaining_lots(sold_amount))
+        return removals
+
+    def __remove_before_first_acquisition(self, crypto_currency, currency_buys, currency_sales):
+        """Remove the sales of a crypto currency without lots, which precede its
+        first acquisition. Returns their removals and the remaining sales."""
+        first_acquisition = min((epoch_seconds for epoch_seconds, _, _ in currency_buys),
+                                default=None)
+        number_of_unknown_sales = next(
+            (sale_index for sale_index, sale in enumerate(currency_sales)
+             if first_acquisition is not None and sale[2] >= first_acquisition),
+            len(currency_sales))
+        # the currency has no lots yet, so remove_amount reports the removal
+        # without an acquisition and returns an empty Disposal like in the
+        # serial processing, whose full proceeds are taxable
+        return [
+            (row_index, self.crypto_aquistion_data.remove_amount(
+                crypto_currency, amount, date_time), raw_data_entry)
+            for row_index, date_time, _, _, amount, raw_data_entry
+            in currency_sales[:number_of_unknown_sales]
+        ], currency_sales[number_of_unknown_sales:]
+
+    def __match_sales(self, crypto_currency, fifo_batch, currency_sales):
+        """Compute the Disposals of the sales of a crypto currency with the
+        FifoBatch of its acquisitions. The rows of the sales, for which there
+        were not enough assets, are skipped. Returns the removals as tuples
+        (row index, Disposal, row) and the sold amount."""
+        _, _, sale_epoch_seconds, exemption_cutoffs, sale_amounts, _ = zip(*currency_sales)
+        available_sale_amounts, missing = fifo_batch.get_available_sale_amounts(
+            sale_epoch_seconds, sale_amounts)
+        cost_basis = fifo_batch.compute_cost_basis(sale_epoch_seconds, available_sale_amounts)
+        exempt_amounts, exempt_cost_basis = fifo_batch.compute_exempt_parts(
+            available_sale_amounts, exemption_cutoffs)
+        for sale_index in numpy.flatnonzero(missing):
+            skip_row(currency_sales[sale_index][-1], ValueError(
+                "There were not enough assets for the crypto sale. Open amount: "
+                f"{abs(sale_amounts[sale_index]) - available_sale_amounts[sale_index]:7.5f}"),
+                self.hooks.diagnostics)
+        return [
+            (row_index, Disposal(date_time, abs(amount), float(cost), float(exempt_amount),
+                                 float(exempt_cost), crypto_currency), raw_data_entry)
+            for (row_index, date_time, _, _, amount, raw_data_entry), cost, exempt_amount,
+            exempt_cost, is_missing in zip(
+                currency_sales, cost_basis, exempt_amounts, exempt_cost_basis, missing)
+            if not is_missing
+        ], float(numpy.sum(available_sale_amounts))
+
+    def __book_removals(self, removals):
+        """Book the Disposals of the removals of all crypto currencies in the
+        order of the rows."""
+        removals.sort(key=lambda removal: removal[0])
+        for _, disposal, raw_data_entry in removals:
+            self._book_disposal(raw_data_entry, disposal)
+
+    @staticmethod
+    def __collect_events(raw_crypto_aquisition_data, reward_treatments, diagnostics):
+        buys = {}
+        sales = {}
+        number_of_rows = 0
+        for row_index, raw_data_entry in enumerate(raw_crypto_aquisition_data):
+            number_of_rows += 1
+            try:
+                sale, buy = BatchProfitCalculator.__get_events(
+                    row_index, raw_data_entry, reward_treatments)
+            except (ValueError, IndexError) as e:
+                skip_row(raw_data_entry, e, diagnostics)
+                continue
+            if sale is not None:
+                sales.setdefault(sale[0], []).append(sale[1])
+            if buy is not None:
+                buys.setdefault(buy[0], []).append(buy[1])
+        return number_of_rows, buys, sales
+
+    @staticmethod
+    def __get_events(row_index, raw_data_entry, reward_treatments):
+        """Return the sale and the acquisition of a data row, each as a tuple
+        of the crypto currency and the event, or None."""
+        reward_record = dispatch_reward(raw_data_entry, reward_treatments)
+        if reward_record is not None:
+            return None, (raw_data_entry[SOURCE_CURRENCY_COLUMN],
+                          (get_epoch_seconds(reward_record.date_time), reward_record.amount,
+                           reward_record.bought_at))
+        transaction_kind, _, _ = classify_transaction(raw_data_entry[IDENTIFIER_COLUMN])
+        if transaction_kind is TransactionKind.OTHER:
+            return None, None
+        date_time = get_date_time_object(raw_data_entry[TIMESTAMP_COLUMN])
+        epoch_seconds = get_epoch_seconds(date_time)
+        native_amount = float(raw_data_entry[NATIVE_AMOUNT_COLUMN])
+        sale = buy = None
+        if transaction_kind is not TransactionKind.BUY:
+            sale = (raw_data_entry[SOURCE_CURRENCY_COLUMN],
+                    (row_index, date_time, epoch_seconds,
+                     get_epoch_seconds(get_exemption_cutoff(date_time)),
+                     float(raw_data_entry[SOURCE_AMOUNT_COLUMN]), raw_data_entry))
+        if transaction_kind is not TransactionKind.SELL:
+            buy = (raw_data_entry[TARGET_CURRENCY_COLUMN],
+                   (epoch_seconds, float(raw_data_entry[TARGET_AMOUNT_COLUMN]), native_amount))
+        return sale, buy
@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+
+"""
+This file provides unit tests for the functionality within the module batch_engine,
+which compare the batch engine with the reference implementation in crypto_tax_report.
+"""
+
+# pylint: disable=C0115,C0116
+
+import datetime
+import unittest
+import batch_engine
+import crypto_tax_report
+import crypto_tax_report_test
+from compact_lot_store import get_epoch_seconds
+from crypto_tax_report import Heading, logger
+from crypto_tax_report_benchmark import generate_synthetic_export
+from parallel_processing_test import get_test_corpus
+
+
+def get_reference_cost_basis(raw_data):
+    """
+    Return the cost basis of every sale and swap by row index, computed by the
+    member functions remove and swap of CryptoAquisitionData, and the remaining
+    acquisition records.
+    """
+    crypto_aquisition_data = crypto_tax_report.CryptoAquisitionData()
+    cost_basis = {}
+    for row_index, raw_data_entry in enumerate(raw_data):
+        transaction_kind, _, _ = crypto_tax_report.classify_transaction(
+            raw_data_entry[crypto_tax_report.Heading.IDENTIFIER.value])
+        if transaction_kind is crypto_tax_report.TransactionKind.BUY:
+            crypto_aquisition_data.add(raw_data_entry)
+        elif transaction_kind is crypto_tax_report.TransactionKind.SELL:
+            cost_basis[row_index] = crypto_aquisition_data.remove(raw_data_entry)
+        elif transaction_kind is crypto_tax_report.TransactionKind.SWAP:
+            cost_basis[row_index] = crypto_aquisition_data.swap(raw_data_entry)
+    return cost_basis, crypto_aquisition_data.data_set
+
+
+def get_buys_and_sales(raw_data):
+    """
+    Return the acquisitions as tuples (epoch seconds, amount, Euro amount) and
+    the sales and swaps as tuples (row index, epoch seconds, amount), both by
+    crypto currency.
+    """
+    buys = {}
+    sales = {}
+    for row_index, raw_data_entry in enumerate(raw_data):
+        transaction_kind, from_currency, to_currency = \
+            crypto_tax_report.classify_transaction(raw_data_entry[Heading.IDENTIFIER.value])
+        epoch_seconds = get_epoch_seconds(crypto_tax_report.get_date_time_object(
+            raw_data_entry[Heading.TIMESTAMP.value]))
+        if transaction_kind is not crypto_tax_report.TransactionKind.BUY:
+            sales.setdefault(from_currency, []).append(
+                (row_index, epoch_seconds, float(raw_data_entry[Heading.SOURCE_AMOUNT.value])))
+        if transaction_kind is not crypto_tax_report.TransactionKind.SELL:
+            buys.setdefault(to_currency, []).append(
+                (epoch_seconds, float(raw_data_entry[Heading.TARGET_AMOUNT.value]),
+                 float(raw_data_entry[Heading.NATIVE_CURRENCY_AMOUNT.value])))
+    return buys, sales
+
+
+@unittest.skipIf(batch_engine.numpy is None, "numpy is not installed")
+class FifoBatchTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def test_compute_cost_basis(self):
+        fifo_batch = batch_engine.FifoBatch([10, 20, 30], [2.0, 1.0, 4.0], [20.0, 30.0, 8.0])
+        cost_basis = fifo_batch.compute_cost_basis([25, 26, 40], [1.0, -1.5, 2.5])
+        self.assertEqual(list(cost_basis), [10.0, 25.0, 19.0])
+        self.assertEqual(fifo_batch.get_remaining_lots(5.0), [(30, 2.0, 4.0)])
+
+    def test_compute_exempt_parts(self):
+        fifo_batch = batch_engine.FifoBatch([10, 20, 30], [2.0, 1.0, 4.0], [20.0, 30.0, 8.0])
+        exempt_amounts, exempt_cost_basis = fifo_batch.compute_exempt_parts(
+            [1.0, -1.5, 2.5], [15, 15, 25])
+        self.assertEqual(list(exempt_amounts), [1.0, 1.0, 0.5])
+        self.assertEqual(list(exempt_cost_basis), [10.0, 10.0, 15.0])
+
+    def test_sale_before_acquisition(self):
+        fifo_batch = batch_engine.FifoBatch([10, 20], [2.0, 1.0], [20.0, 30.0])
+        with self.assertRaises(ValueError):
+            fifo_batch.compute_cost_basis([15], [2.5])
+
+    def test_get_available_sale_amounts(self):
+        fifo_batch = batch_engine.FifoBatch([10, 20, 30], [2.0, 1.0, 4.0], [20.0, 30.0, 8.0])
+        # the second sale consumes the remaining 1.5 of the first two acquisitions
+        available_sale_amounts, missing = fifo_batch.get_available_sale_amounts(
+            [15, 25, 40], [1.5, -2.0, 1.0])
+        self.assertEqual(list(available_sale_amounts), [1.5, 1.5, 1.0])
+        self.assertEqual(list(missing), [False, True, False])
+        self.assertEqual(fifo_batch.get_remaining_lots(4.0), [(30, 3.0, 6.0)])
+        # the residue of the float arithmetic in the last consumed lot is no lot
+        fifo_batch = batch_engine.FifoBatch([10, 20], [0.1, 0.2], [10.0, 20.0])
+        self.assertEqual(fifo_batch.get_remaining_lots(0.3), [])
+
+    def test_same_cost_basis_as_remove(self):
+        for seed in range(3):
+            raw_data = list(generate_synthetic_export(3000, seed=seed))
+            reference_cost_basis, _ = get_reference_cost_basis(raw_data)
+            buys, sales = get_buys_and_sales(raw_data)
+            for crypto_currency, currency_sales in sales.items():
+                row_indices, sale_epoch_seconds, sale_amounts = zip(*currency_sales)
+                cost_basis = batch_engine.FifoBatch(
+                    *zip(*buys[crypto_currency])).compute_cost_basis(
+                        sale_epoch_seconds, sale_amounts)
+                for row_index, cost in zip(row_indices, cost_basis):
+                    self.assertAlmostEqual(cost, reference_cost_basis[row_index], delta=1e-6)
+
+
+@unittest.skipIf(batch_engine.numpy is None, "numpy is not installed")
+class BatchProfitCalculatorTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def test_same_result_as_serial_processing(self):
+        raw_data = list(generate_synthetic_export(5000, seed=8))
+        serial_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        batch_calculator = batch_engine.BatchProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        serial_profit = serial_calculator.process_data(raw_data)
+        self.assertAlmostEqual(batch_calculator.process_data(iter(raw_data)), serial_profit,
+                               delta=1e-6 * abs(serial_profit))
+        self.assertEqual(batch_calculator.processed_rows, len(raw_data))
+        serial_data_set = serial_calculator.crypto_aquistion_data.data_set
+        batch_data_set = batch_calculator.crypto_aquistion_data.data_set
+        for crypto_currency, acquisition_records in serial_data_set.items():
+            self.assertEqual(len(batch_data_set[crypto_currency]), len(acquisition_records))
+            for batch_record, record in zip(batch_data_set[crypto_currency],
+                                            acquisition_records):
+                self.assertEqual(batch_record.date_time, record.date_time)
+                self.assertAlmostEqual(batch_record.amount, record.amount, delta=1e-6)
+                self.assertAlmostEqual(batch_record.bought_at, record.bought_at, delta=1e-6)
+
+    def test_same_exempt_profit_as_serial_processing(self):
+        raw_data = get_test_corpus(1000, seed=4)
+        # a gap of more than a year makes the sales after it partially exempt
+        for raw_data_entry in raw_data[500:]:
+            raw_data_entry[Heading.TIMESTAMP.value] = (
+                crypto_tax_report.get_date_time_object(raw_data_entry[Heading.TIMESTAMP.value])
+                + datetime.timedelta(days=400)).strftime(crypto_tax_report.DATE_TIME_FORMAT)
+        serial_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        batch_calculator = batch_engine.BatchProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        serial_calculator.process_data(raw_data)
+        batch_calculator.process_data(raw_data)
+        self.assertNotEqual(serial_calculator.exempt_profit, 0.0)
+        for tax_year, tax_year_profit in serial_calculator.ledger.profits_per_tax_year.items():
+            batch_tax_year_profit = batch_calculator.ledger.profits_per_tax_year[tax_year]
+            self.assertAlmostEqual(batch_tax_year_profit.taxable_profit,
+                                   tax_year_profit.taxable_profit, delta=1e-6)
+            self.assertAlmostEqual(batch_tax_year_profit.exempt_profit,
+                                   tax_year_profit.exempt_profit, delta=1e-6)
+
+    def test_simple_sales(self):
+        crypto_sale_data, expected_remaining_crypto_assets = \
+            crypto_tax_report_test.CryptoAquisitionDataTest.get_testdata_for_crypto_sale()
+        batch_calculator = batch_engine.BatchProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        taxable_profit = batch_calculator.process_data(
+            crypto_tax_report_test.SimplePurchaseData.as_raw() + crypto_sale_data)
+        self.assertAlmostEqual(taxable_profit, 50.0 + 25.0 + 1220.0)
+        self.assertEqual(batch_calculator.crypto_aquistion_data.data_set['CRO'],
+                         expected_remaining_crypto_assets['CRO'])
+
+    def test_aggregated_diagnostics(self):
+        raw_data = crypto_tax_report_test.SimplePurchaseData.as_raw() + [
+            ["2021-12-07 14:01:56", "EUR -> XRP", "EUR", "-3.0", "XRP",
+                "ten", "EUR", "3.0", "3.3", "crypto_viban_exchange",],
+            ["2021-12-08 14:01:56", "ADA -> EUR"],
+        ]
+        diagnostics = crypto_tax_report.Diagnostics()
+        batch_calculator = batch_engine.BatchProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        batch_calculator.set_diagnostics(diagnostics)
+        with self.assertNoLogs(level="WARNING"):
+            batch_calculator.process_data(raw_data)
+        self.assertEqual(diagnostics.events, {("Skipped row", "EUR"): 1, ("Skipped row", ""): 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
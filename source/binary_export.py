@@ -0,0 +1,242 @@
+#!/usr/bin/python3
+
+"""
+The module provides a compact binary format for the parsed transactions of crypto.com
+csv files. Repeated runs on the same data, e.g. tax scenarios, read the binary file
+instead of parsing the text again. A binary file consists of a header, fixed-width
+records and the table of the currency names of the CURRENCY_REGISTRY, since the codes
+of other currencies than the elements of Currency are only valid within one process.
+Each record holds the time stamp in seconds since 1970, the TransactionKind, the
+TaxPolicy of an acquisition, the currencies as codes of the CURRENCY_REGISTRY and the
+amounts as float64. The reader memory-maps the file and feeds the records into the
+CryptoAquisitionData without creating rows of strings. Only buys, sales, swaps and
+rewards are converted; rows of other transactions and rows with an invalid value are
+skipped, like the batch engine does. A reward is stored with its RewardTreatment already
+applied: the received amount as source amount, the cost basis as native amount and its
+TaxPolicy.
+"""
+
+import argparse
+import logging
+import mmap
+import struct
+import sys
+import time
+
+from acquisition_lots import (
+    CURRENCY_REGISTRY, REWARD_TREATMENTS, CryptoAcquisitionRecord, CryptoAquisitionData,
+    TaxPolicy, dispatch_reward, get_date_time_object)
+from batch_engine import (
+    IDENTIFIER_COLUMN, NATIVE_AMOUNT_COLUMN, SOURCE_AMOUNT_COLUMN, SOURCE_CURRENCY_COLUMN,
+    TARGET_AMOUNT_COLUMN, TARGET_CURRENCY_COLUMN, TIMESTAMP_COLUMN)
+from compact_lot_store import get_date_time_from_epoch_seconds, get_epoch_seconds
+from crypto_tax_report import add_report_arguments, write_tax_year_report
+from merged_ingestion import merge_exports
+from profit_calculator import ProfitCalculator, TransactionKind, classify_transaction
+
+logger = logging.getLogger(__name__)
+
+BINARY_EXPORT_MAGIC = b"CTXB"
+BINARY_EXPORT_VERSION = 3
+BINARY_EXPORT_SUFFIX = ".ctxb"
+# magic, version, number of records, offset of the currency name table
+HEADER = struct.Struct("<4sHxxQQ")
+# epoch seconds, transaction kind, tax policy, source and target currency code,
+# source, target and native amount; the padding aligns the amounts to 8 bytes
+RECORD = struct.Struct("<qBBHHxxddd")
+CURRENCY_NAME_COUNT = struct.Struct("<H")
+CURRENCY_NAME_LENGTH = struct.Struct("<B")
+CONVERTED_TRANSACTION_KINDS = (TransactionKind.BUY, TransactionKind.SELL, TransactionKind.SWAP)
+TAX_POLICIES = {tax_policy.value: tax_policy for tax_policy in TaxPolicy}
+
+
+def get_binary_record(raw_data_entry, reward_treatments):
+    """
+    Convert a data row of a crypto.com csv file to a binary record. Returns
+    None for a row of a transaction, which is not converted. Raises a
+    ValueError, an IndexError or a struct.error for a row with an invalid
+    value.
+    """
+    get_currency_code = CURRENCY_REGISTRY.get_code
+    reward_record = dispatch_reward(raw_data_entry, reward_treatments)
+    if reward_record is not None:
+        return RECORD.pack(
+            get_epoch_seconds(reward_record.date_time), TransactionKind.REWARD.value,
+            reward_record.tax_policy.value,
+            get_currency_code(raw_data_entry[SOURCE_CURRENCY_COLUMN]), 0,
+            reward_record.amount, 0.0, reward_record.bought_at)
+    transaction_kind, _, _ = classify_transaction(raw_data_entry[IDENTIFIER_COLUMN])
+    if transaction_kind not in CONVERTED_TRANSACTION_KINDS:
+        return None
+    return RECORD.pack(
+        get_epoch_seconds(get_date_time_object(raw_data_entry[TIMESTAMP_COLUMN])),
+        transaction_kind.value, TaxPolicy.CAPITAL_GAINS.value,
+        get_currency_code(raw_data_entry[SOURCE_CURRENCY_COLUMN]),
+        get_currency_code(raw_data_entry[TARGET_CURRENCY_COLUMN]),
+        float(raw_data_entry[SOURCE_AMOUNT_COLUMN]),
+        float(raw_data_entry[TARGET_AMOUNT_COLUMN]),
+        float(raw_data_entry[NATIVE_AMOUNT_COLUMN]))
+
+
+def write_currency_name_table(binary_file):
+    """Write the names of the currencies of the CURRENCY_REGISTRY indexed by
+    their code."""
+    # the registry only grows, so its names cover the codes of all records
+    currency_names = list(CURRENCY_REGISTRY.names)
+    binary_file.write(CURRENCY_NAME_COUNT.pack(len(currency_names)))
+    for currency_name in currency_names:
+        encoded_currency_name = currency_name.encode("utf-8")
+        binary_file.write(CURRENCY_NAME_LENGTH.pack(len(encoded_currency_name)))
+        binary_file.write(encoded_currency_name)
+
+
+def write_binary_export(raw_crypto_aquisition_data, file_name, reward_treatments=None):
+    """
+    Convert the rows of a crypto.com csv file, given as an iterable in
+    chronological order, e.g. from merged_ingestion.merge_exports, to a
+    binary file. The rewards are converted with the given dispatch table of
+    RewardTreatments, REWARD_TREATMENTS by default. Returns the number of
+    written records and skipped rows.
+    """
+    if reward_treatments is None:
+        reward_treatments = REWARD_TREATMENTS
+    written_records = 0
+    skipped_rows = 0
+    with open(file_name, mode='wb') as binary_file:
+        binary_file.write(bytes(HEADER.size))
+        for raw_data_entry in raw_crypto_aquisition_data:
+            try:
+                record = get_binary_record(raw_data_entry, reward_treatments)
+            except (ValueError, IndexError, struct.error) as e:
+                logger.error("The data entry %s could not be converted: %s. "
+                             "Skip this line.", raw_data_entry, e)
+                record = None
+            if record is None:
+                skipped_rows += 1
+                continue
+            binary_file.write(record)
+            written_records += 1
+        currency_name_table_offset = binary_file.tell()
+        write_currency_name_table(binary_file)
+        binary_file.seek(0)
+        binary_file.write(HEADER.pack(BINARY_EXPORT_MAGIC, BINARY_EXPORT_VERSION,
+                                      written_records, currency_name_table_offset))
+    logger.info("Converted %d rows to %s, skipped %d rows.",
+                written_records, file_name, skipped_rows)
+    return written_records, skipped_rows
+
+
+def read_currency_name_table(mapped_file, offset):
+    """Read the names of the currencies indexed by their code."""
+    (number_of_currency_names,) = CURRENCY_NAME_COUNT.unpack_from(mapped_file, offset)
+    offset += CURRENCY_NAME_COUNT.size
+    currency_names = []
+    for _ in range(number_of_currency_names):
+        (length,) = CURRENCY_NAME_LENGTH.unpack_from(mapped_file, offset)
+        offset += CURRENCY_NAME_LENGTH.size
+        currency_names.append(mapped_file[offset:offset + length].decode("utf-8"))
+        offset += length
+    return currency_names
+
+
+def read_header(mapped_file, file_name):
+    """Check the header of a binary file and return the number of its records
+    and the names of its currencies indexed by their code."""
+    magic, version, number_of_records, currency_name_table_offset = \
+        HEADER.unpack_from(mapped_file)
+    if magic != BINARY_EXPORT_MAGIC or version != BINARY_EXPORT_VERSION:
+        raise ValueError(f"{file_name} is not a binary export of version "
+                         f"{BINARY_EXPORT_VERSION}.")
+    return number_of_records, read_currency_name_table(mapped_file, currency_name_table_offset)
+
+
+def read_binary_export(file_name):
+    """
+    Generator yielding the records of a binary file as tuples of the epoch
+    seconds, the TransactionKind value, the TaxPolicy value, the source and
+    the target currency name and the source, the target and the native
+    amount.
+    """
+    with open(file_name, mode='rb') as binary_file:
+        with mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            number_of_records, currency_names = read_header(mapped_file, file_name)
+            # the view has to be released before the memory map is closed
+            with memoryview(mapped_file)[
+                    HEADER.size:HEADER.size + number_of_records * RECORD.size] as records:
+                for (epoch_seconds, transaction_kind, tax_policy, source_currency,
+                     target_currency, source_amount, target_amount,
+                     native_amount) in RECORD.iter_unpack(records):
+                    yield (epoch_seconds, transaction_kind, tax_policy,
+                           currency_names[source_currency], currency_names[target_currency],
+                           source_amount, target_amount, native_amount)
+
+
+class BinaryProfitCalculator(ProfitCalculator): # pylint: disable=too-few-public-methods
+    """
+    ProfitCalculator, which can also process a binary file. Its records are
+    added to and removed from the CryptoAquisitionData as parsed values, so
+    neither time stamps nor amounts are parsed. This requires a
+    CryptoAquisitionData with float amounts.
+    """
+
+    def process_binary_export(self, file_name):
+        """Process the records of a binary file. Returns the taxable profit
+        accumulated so far."""
+        processed_rows = 0
+        start_time = time.perf_counter()
+        self.crypto_aquistion_data.update_log_level()
+        for record in read_binary_export(file_name):
+            processed_rows += 1
+            self.__process_record(record)
+        self._finish_run(processed_rows, start_time, f" of {file_name}")
+        return self.taxable_profit
+
+    def __process_record(self, record):
+        (epoch_seconds, transaction_kind, tax_policy, source_currency, target_currency,
+         source_amount, target_amount, native_amount) = record
+        crypto_aquisition_data = self.crypto_aquistion_data
+        date_time = get_date_time_from_epoch_seconds(epoch_seconds)
+        if transaction_kind == TransactionKind.BUY.value:
+            crypto_aquisition_data.add_record(
+                target_currency, CryptoAcquisitionRecord(date_time, target_amount, native_amount))
+            return
+        if transaction_kind == TransactionKind.REWARD.value:
+            crypto_aquisition_data.add_record(source_currency, CryptoAcquisitionRecord(
+                date_time, source_amount, native_amount, TAX_POLICIES[tax_policy]))
+            return
+        disposal = crypto_aquisition_data.remove_amount(source_currency, source_amount, date_time)
+        if transaction_kind != TransactionKind.SELL.value:
+            crypto_aquisition_data.add_record(
+                target_currency, CryptoAcquisitionRecord(date_time, target_amount, native_amount))
+        self._book_proceeds(abs(native_amount), disposal)
+
+
+def main():
+    """ Entry point for calling this file directly as a python script."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser(
+        "convert", help="convert crypto.com csv files to a binary file")
+    convert_parser.add_argument("binary_file_name", metavar="binary_file",
+                                help=f"binary file to write, e.g. client{BINARY_EXPORT_SUFFIX}")
+    convert_parser.add_argument("file_names", nargs="+", metavar="csv_file",
+                                help="crypto.com csv file of the client, several files "
+                                "are merged by time stamp")
+    report_parser = subparsers.add_parser(
+        "report", help="report the taxable and the exempt profit of each tax year")
+    report_parser.add_argument("binary_file_name", metavar="binary_file",
+                               help="binary file of the client")
+    add_report_arguments(report_parser)
+    arguments = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if arguments.command == "convert":
+        write_binary_export(merge_exports(arguments.file_names), arguments.binary_file_name)
+    else:
+        profit_calculator = BinaryProfitCalculator(CryptoAquisitionData())
+        profit_calculator.process_binary_export(arguments.binary_file_name)
+        write_tax_year_report(profit_calculator, arguments.output_format, sys.stdout,
+                              *arguments.tax_years, arguments.per_currency)
+
+
+if "__main__" == __name__:
+    main()
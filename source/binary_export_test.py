@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+
+"""
+This file provides unit tests for the functionality within the module binary_export.
+"""
+
+# pylint: disable=C0115,C0116
+
+import os
+import tempfile
+import unittest
+import binary_export
+import crypto_tax_report
+import crypto_tax_report_test
+from crypto_tax_report import logger
+from parallel_processing_test import get_test_corpus
+
+
+class BinaryExportTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+        self.temporary_directory = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.file_name = os.path.join(self.temporary_directory.name,
+                                      "export" + binary_export.BINARY_EXPORT_SUFFIX)
+
+    def tearDown(self) -> None:
+        self.temporary_directory.cleanup()
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def test_round_trip(self):
+        raw_data = [
+            ["2021-01-01 10:00:00", "EUR -> BTC", "EUR", "-100.0", "BTC", "0.5", "EUR",
+             "100.0", "120.0"],
+            ["2021-01-02 10:00:00", "Card Cashback", "CRO", "1.0", "", "", "EUR", "0.1",
+             "0.12"],
+            ["2021-01-03 10:00:00", "BTC -> CRO", "BTC", "-0.25", "CRO", "1000", "EUR",
+             "60.0", "72.0"],
+            ["invalid", "CRO -> EUR", "CRO", "-500", "EUR", "30.0", "EUR", "30.0", "36.0"],
+            ["2022-02-01 10:00:00", "CRO -> EUR", "CRO", "-500", "EUR", "30.0", "EUR",
+             "30.0", "36.0"],
+        ]
+        self.assertEqual(binary_export.write_binary_export(raw_data, self.file_name), (4, 1))
+        capital_gains = crypto_tax_report.TaxPolicy.CAPITAL_GAINS.value
+        self.assertEqual(list(binary_export.read_binary_export(self.file_name)), [
+            (1609495200, crypto_tax_report.TransactionKind.BUY.value, capital_gains, "EUR",
+             "BTC", -100.0, 0.5, 100.0),
+            # the reward is stored with its cost basis of zero
+            (1609581600, crypto_tax_report.TransactionKind.REWARD.value, capital_gains, "CRO",
+             "", 1.0, 0.0, 0.0),
+            (1609668000, crypto_tax_report.TransactionKind.SWAP.value, capital_gains, "BTC",
+             "CRO", -0.25, 1000.0, 60.0),
+            (1643709600, crypto_tax_report.TransactionKind.SELL.value, capital_gains, "CRO",
+             "EUR", -500.0, 30.0, 30.0)])
+
+    def test_invalid_file(self):
+        with open(self.file_name, mode='wb') as binary_file:
+            binary_file.write(bytes(binary_export.HEADER.size))
+        with self.assertRaises(ValueError):
+            list(binary_export.read_binary_export(self.file_name))
+
+    def test_profits_equal_those_of_the_csv_rows(self):
+        raw_data = get_test_corpus(3000, seed=11)
+        reference_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        reference_calculator.process_data(raw_data)
+        binary_export.write_binary_export(raw_data, self.file_name)
+        profit_calculator = binary_export.BinaryProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        profit_calculator.process_binary_export(self.file_name)
+        self.assertEqual(profit_calculator.processed_rows, len(raw_data))
+        self.assertEqual(profit_calculator.taxable_profit.hex(),
+                         reference_calculator.taxable_profit.hex())
+        self.assertEqual(profit_calculator.get_tax_year_rows(),
+                         reference_calculator.get_tax_year_rows())
+        self.assertEqual(profit_calculator.crypto_aquistion_data.data_set,
+                         reference_calculator.crypto_aquistion_data.data_set)
+
+    def test_rewards(self):
+        binary_export.write_binary_export(
+            crypto_tax_report_test.RewardTest.get_reward_data(), self.file_name)
+        profit_calculator = binary_export.BinaryProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        profit_calculator.process_binary_export(self.file_name)
+        self.assertEqual(profit_calculator.get_tax_year_rows(), [(2021, "3.00", "0.00")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+
+"""
+The module provides a memory saving storage for the acquisition records of a crypto
+currency. Instead of one object per acquisition record the data is kept in parallel
+arrays of machine types, which is useful for currencies with millions of open lots.
+"""
+
+import bisect
+import datetime
+from array import array
+
+from acquisition_lots import CryptoAcquisitionRecord, TaxPolicy
+
+EPOCH = datetime.datetime(1970, 1, 1)
+ONE_SECOND = datetime.timedelta(seconds=1)
+# popped entries are only removed from the front of the arrays in blocks
+MINIMAL_NUMBER_OF_POPPED_ENTRIES_TO_COMPACT = 1024
+# the elements of TaxPolicy indexed by their value, which is faster than TaxPolicy(value)
+TAX_POLICIES = tuple(sorted(TaxPolicy, key=lambda tax_policy: tax_policy.value))
+
+
+def get_epoch_seconds(date_time):
+    """Convert a datetime.datetime object to the number of whole seconds since 1970."""
+    return (date_time - EPOCH) // ONE_SECOND
+
+
+def get_date_time_from_epoch_seconds(epoch_seconds):
+    """Convert a number of seconds since 1970 to a datetime.datetime object."""
+    return EPOCH + datetime.timedelta(seconds=epoch_seconds)
+
+
+class CompactAcquisitionRecordView:
+    """
+    Slotted view on a single entry of a CompactAcquisitionRecordQueue. It
+    provides the attributes of a CryptoAcquisitionRecord and changes of the
+    time stamp, the amount, the bought_at value or the tax policy are written
+    to the queue. A change of the time stamp must keep the chronological order.
+    A view is only valid until the next entry is added to or popped from the
+    queue.
+    """
+    __slots__ = ('queue', 'index')
+
+    def __init__(self, queue, index):
+        self.queue = queue
+        self.index = index
+
+    @property
+    def date_time(self):
+        """The time of the acquisition."""
+        return get_date_time_from_epoch_seconds(self.queue.epoch_seconds[self.index])
+
+    @property
+    def amount(self):
+        """The acquired amount of the crypto currency."""
+        return self.queue.amounts[self.index]
+
+    @amount.setter
+    def amount(self, value):
+        self.queue.amounts[self.index] = value
+
+    @property
+    def bought_at(self):
+        """The Euro amount at which the crypto currency has been bought."""
+        return self.queue.bought_at[self.index]
+
+    @bought_at.setter
+    def bought_at(self, value):
+        self.queue.bought_at[self.index] = value
+
+    @property
+    def tax_policy(self):
+        """The TaxPolicy of the acquisition."""
+        return TAX_POLICIES[self.queue.tax_policies[self.index]]
+
+    @tax_policy.setter
+    def tax_policy(self, value):
+        self.queue.tax_policies[self.index] = value.value
+
+    def to_record(self):
+        """Return a CryptoAcquisitionRecord with a copy of the data."""
+        return CryptoAcquisitionRecord(
+            self.date_time, self.amount, self.bought_at, self.tax_policy)
+
+    def __eq__(self, other):
+        try:
+            return (self.date_time, self.amount, self.bought_at, self.tax_policy) == (
+                other.date_time, other.amount, other.bought_at, other.tax_policy)
+        except AttributeError:
+            return NotImplemented
+
+    def __str__(self):
+        return str(self.to_record())
+
+    def __repr__(self):
+        return repr(self.to_record())
+
+
+class CompactAcquisitionRecordQueue:
+    """
+    Drop-in replacement of CryptoAcquisitionRecordQueue, which keeps the time
+    stamps as seconds since 1970 in an array('q') and the amounts and Euro
+    values in arrays('d'). Time stamps are stored with a resolution of one
+    second. Entries are returned as CompactAcquisitionRecordView objects.
+    Popping the oldest entry only advances the index of the first entry; the
+    arrays are shortened once enough entries have been popped.
+    """
+
+    def __init__(self, acquisition_records=()):
+        self.epoch_seconds = array('q')
+        self.amounts = array('d')
+        self.bought_at = array('d')
+        self.tax_policies = array('b')
+        self.first_index = 0
+        for acquisition_record in acquisition_records:
+            self.add(acquisition_record)
+
+    def add(self, acquisition_record):
+        """Add an acquisition record at its chronological position."""
+        epoch_seconds = get_epoch_seconds(acquisition_record.date_time)
+        if len(self.epoch_seconds) == self.first_index or self.epoch_seconds[-1] <= epoch_seconds:
+            self.epoch_seconds.append(epoch_seconds)
+            self.amounts.append(acquisition_record.amount)
+            self.bought_at.append(acquisition_record.bought_at)
+            self.tax_policies.append(acquisition_record.tax_policy.value)
+            return
+        index = bisect.bisect_right(self.epoch_seconds, epoch_seconds, lo=self.first_index)
+        self.epoch_seconds.insert(index, epoch_seconds)
+        self.amounts.insert(index, acquisition_record.amount)
+        self.bought_at.insert(index, acquisition_record.bought_at)
+        self.tax_policies.insert(index, acquisition_record.tax_policy.value)
+
+    def popleft(self):
+        """Remove the oldest acquisition record and return it as a CryptoAcquisitionRecord."""
+        if len(self) == 0:
+            raise IndexError("pop from an empty CompactAcquisitionRecordQueue")
+        acquisition_record = CompactAcquisitionRecordView(self, self.first_index).to_record()
+        self.first_index += 1
+        if (self.first_index >= MINIMAL_NUMBER_OF_POPPED_ENTRIES_TO_COMPACT
+                and 2 * self.first_index >= len(self.epoch_seconds)):
+            self.__compact()
+        return acquisition_record
+
+    def __compact(self):
+        for column in (self.epoch_seconds, self.amounts, self.bought_at, self.tax_policies):
+            del column[:self.first_index]
+        self.first_index = 0
+
+    def __len__(self):
+        return len(self.epoch_seconds) - self.first_index
+
+    def __iter__(self):
+        for index in range(self.first_index, len(self.epoch_seconds)):
+            yield CompactAcquisitionRecordView(self, index)
+
+    def __getitem__(self, index):
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("CompactAcquisitionRecordQueue index out of range")
+        return CompactAcquisitionRecordView(self, self.first_index + index)
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(
+                record == other_record for record, other_record in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return f"{type(self).__name__}({[view.to_record() for view in self]!r})"
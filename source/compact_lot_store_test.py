@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+
+"""
+This file provides unit tests for the functionality within the module compact_lot_store.
+"""
+
+# pylint: disable=C0115,C0116
+
+import unittest
+import compact_lot_store
+import crypto_tax_report
+from crypto_tax_report import datetime, CryptoAcquisitionRecord, logger
+import crypto_tax_report_test
+
+
+class CompactAcquisitionRecordQueueTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def test_add_keeps_chronological_order(self):
+        records = crypto_tax_report_test.get_unordered_acquisition_records()
+        acquisition_records = compact_lot_store.CompactAcquisitionRecordQueue(records)
+        self.assertEqual(acquisition_records,
+                         [records[2], records[0], records[3], records[1]])
+        self.assertEqual(acquisition_records[-1], records[1])
+        self.assertEqual(acquisition_records.popleft(), records[2])
+        self.assertEqual(len(acquisition_records), 3)
+        # changes of a view are written to the queue
+        acquisition_records[0].amount = 0.5
+        self.assertEqual(acquisition_records[0].amount, 0.5)
+        self.assertEqual(acquisition_records[0].date_time, records[0].date_time)
+
+    def test_popleft_compacts_the_arrays(self):
+        number_of_records = 3 * compact_lot_store.MINIMAL_NUMBER_OF_POPPED_ENTRIES_TO_COMPACT
+        start = datetime.datetime(2021, 1, 1)
+        acquisition_records = compact_lot_store.CompactAcquisitionRecordQueue(
+            CryptoAcquisitionRecord(start + datetime.timedelta(minutes=index), 1., float(index))
+            for index in range(number_of_records))
+        for index in range(2 * number_of_records // 3):
+            self.assertEqual(acquisition_records.popleft().bought_at, float(index))
+        self.assertLess(len(acquisition_records.amounts), number_of_records)
+        self.assertEqual(len(acquisition_records), number_of_records // 3)
+        self.assertEqual(acquisition_records[0].bought_at, float(2 * number_of_records // 3))
+        with self.assertRaises(IndexError):
+            acquisition_records[number_of_records // 3]  # pylint: disable=W0104
+
+    def test_crypto_aquisition_data_with_compact_queue(self):
+        compact_data = crypto_tax_report.CryptoAquisitionData(
+            compact_lot_store.CompactAcquisitionRecordQueue)
+        for item in crypto_tax_report_test.SimplePurchaseData.as_raw():
+            compact_data.add(item)
+        crypto_sale_data, expected_remaining_crypto_assets = \
+            crypto_tax_report_test.CryptoAquisitionDataTest.get_testdata_for_crypto_sale()
+        reference_data = crypto_tax_report_test.SimplePurchaseData.as_crypto_acquisition_data()
+        for item in crypto_sale_data:
+            self.assertEqual(compact_data.remove(item), reference_data.remove(item))
+        self.assertEqual(compact_data.data_set['ADA'], expected_remaining_crypto_assets['ADA'])
+        self.assertEqual(compact_data.data_set['CRO'], expected_remaining_crypto_assets['CRO'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,336 +5,319 @@ The module provides functionality for parsing the transactions of a crypto.com c
 and calculating the amount of profit for which Germain capital gains taxes have to be paid.
 """
 
+import argparse
+import collections
+import contextlib
 import csv
-import datetime
+import json
 import logging
-import re
-from enum import Enum
-from dataclasses import dataclass
-
-# Define a currency enum class
+import os
+import sys
+
+from acquisition_lots import (
+    DATE_TIME_FORMAT, NULL_INSTRUMENTATION, ZERO_COST_REWARD, CryptoAcquisitionRecord,
+    CryptoAcquisitionRecordQueue, CryptoAcquisitionRecordRemover, CryptoAquisitionData,
+    Currency, CurrencyLotMap, CurrencyRegistry, Diagnostics, Heading, RewardTreatment,
+    TaxPolicy, datetime, dispatch_reward, get_cached_date_time_object, get_date_time_object,
+    get_exemption_cutoff, get_reward_record_from_raw_data_entry)
+from audit_trail import AUDIT_TRAIL_FORMATS, AuditTrailWriter
+from profit_calculator import (
+    ProfitCalculator, TransactionKind, classify_transaction,
+    match_buy_crypto_currency_with_euro, match_sell_crypto_currency_get_euro,
+    match_swap_of_crypto_currency)
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
-
-class Currency(Enum):
-    """ Identifiers for all handled crypto currencies."""
-    CRO = 1
-    SOL = 2
-    ADA = 3
-    DOT = 4
-    USDT = 5
-    ETH = 6
-    ATOM = 7
-    XRP = 8
-    LINK = 9
-    VVS = 10
-    MANA = 11
-    ELON = 12
-    EUR = 13
-
-
-class Heading(Enum):
-    """ Identifiers for the columns of the read-in crypto.com csv file."""
-    TIMESTAMP = 0
-    IDENTIFIER = 1
-    SOURCE_CURRENCY = 2
-    SOURCE_AMOUNT = 3
-    TARGET_CURRENCY = 4
-    TARGET_AMOUNT = 5
-    NATIVE_CURRENCY = 6
-    NATIVE_CURRENCY_AMOUNT = 7
-    DOLLAR_AMOUNT = 8
-    INTERNAL_IDENTIFIER = 9
-    HASH_KEY = 10
-
-
-class TaxPolicy(Enum):
-    """ The TaxPolixy states how a profit has to be considered with regards to
-    taxation.
-    """
-    EXEMPT = 0
-    CAPITAL_GAINS = 1
-
-
-# Define the regex pattern with named groups
-CURRENCY_EXCHANGE_PATTERN = r'\s*(?P<FromCurrency>[\w]+)\s*->\s*(?P<ToCurrency>[\w]+)\s*'
-
-
-def get_date_time_object(datetime_as_string):
-    """
-    Function for converting a string to a datetime.datetime object.
-    If the conversion is not possible a ValueError is thrown. Otherwise 
-    the datetime.datetime object is returned.
-    """
-    date_format = "%Y-%m-%d %H:%M:%S"
-    return datetime.datetime.strptime(datetime_as_string, date_format)
-
-
-def match_currency_exchange_pattern(string_to_match):
-    """
-    Check whether the given string matches the pattern
-    '<currency1> -> <currency2>', where <currency1> and <currency2>
-    are strings, which should represent an arbitrary currency (like
-    EUR for Euro) or crypto currency (like ADA). Currently it is not
-    checked whether the currency is matches an element of the
-    currency enum.
-    """
-    is_a_match = False
-    from_currency = ""
-    to_currency = ""
-    match_result = re.match(CURRENCY_EXCHANGE_PATTERN, string_to_match)
-    if match_result:
-        is_a_match = True
-        from_currency = match_result.group('FromCurrency')
-        to_currency = match_result.group('ToCurrency')
-    return (is_a_match, from_currency, to_currency)
-
-
-def match_buy_crypto_currency_with_euro(string_to_match):
-    """
-    Check whether the given string matches the pattern 'EUR -> <currency2>',
-    where <currency2 is an arbitrary crypto currency. It is not checked
-    whether this crypto currency is known in any way.
-    """
-    is_a_match, from_currency, _ = match_currency_exchange_pattern(
-        string_to_match)
-    if is_a_match and from_currency == Currency.EUR.name:
-        return True
-    return False
 
-
-def match_sell_crypto_currency_get_euro(string_to_match):
+# the acquisitions, the classification of the transactions and the ProfitCalculator,
+# which the engines build on, are defined in lower-level modules and remain part of the
+# interface of this module
+__all__ = [
+    "DATE_TIME_FORMAT", "NULL_INSTRUMENTATION", "ZERO_COST_REWARD", "CryptoAcquisitionRecord",
+    "CryptoAcquisitionRecordQueue", "CryptoAcquisitionRecordRemover", "CryptoAquisitionData",
+    "Currency", "CurrencyLotMap", "CurrencyRegistry", "Diagnostics", "Heading",
+    "RewardTreatment", "TaxPolicy", "datetime", "dispatch_reward", "get_cached_date_time_object",
+    "get_date_time_object", "get_exemption_cutoff", "get_reward_record_from_raw_data_entry",
+    "ProfitCalculator", "TransactionKind", "classify_transaction",
+    "match_buy_crypto_currency_with_euro", "match_sell_crypto_currency_get_euro",
+    "match_swap_of_crypto_currency", "ENGINES", "ENGINES_WITHOUT_AUDIT_TRAIL", "OUTPUT_FORMATS",
+    "LOG_LEVELS", "ExportProfile", "add_report_arguments", "get_profit_calculator", "logger",
+    "main", "parse_tax_years", "profile_export", "report_files", "write_tax_year_report"]
+
+# choices of the command line
+ENGINES = ("serial", "compact", "fixed-point", "batch", "parallel")
+# engines, which only compute sums of lots and do not know the consumed lots of a sale
+ENGINES_WITHOUT_AUDIT_TRAIL = ("batch",)
+OUTPUT_FORMATS = ("text", "csv", "json")
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+
+def parse_tax_years(tax_years):
     """
-    Check whether the given string matches the pattern '<currency1> -> EUR',
-    where <currency1> is an arbitrary crypto currency. It is not checked
-    whether this crypto currency is known in any way.
+    Convert a tax year like '2022' or a range of tax years like '2021-2023'
+    of the command line to a tuple of the first and the last tax year, the
+    latter being None for a single tax year.
     """
-
-    is_a_match, _, to_currency = match_currency_exchange_pattern(
-        string_to_match)
-    if is_a_match and to_currency == Currency.EUR.name:
-        return True
-    return False
+    first_tax_year, separator, last_tax_year = tax_years.partition("-")
+    if not separator:
+        return (int(first_tax_year), None)
+    return (int(first_tax_year), int(last_tax_year))
 
 
-def match_swap_of_crypto_currency(string_to_match):
+class ExportProfile:
     """
-    Check whether the given string matches the pattern
-    '<currency1> -> <currency2>', where <currency1> and <currency2> are
-    arbitrary crypto currencies. It is not checked whether these crypto
-    currencies are known in any way, only that they are not equal to 'EUR'.
+    Class collecting an overview of a crypto.com csv file in a single pass,
+    which is useful for checking an export before processing it: the distinct
+    transaction kinds and the currencies with the number of rows of each, as
+    well as the first and the last time stamp. Only the distinct values are
+    kept, not the rows.
     """
-    is_a_match, from_currency, to_currency = match_currency_exchange_pattern(
-        string_to_match)
-    if is_a_match and from_currency != Currency.EUR.name and to_currency != Currency.EUR.name:
-        return True
-    return False
-
-
-@dataclass
-class CryptoAcquisitionRecord:
-    """
-    Class representing a data entry of a single acquisition transaction of a
-    crypto currency. It contains all relevant data in order to compute the capital
-    gains tax, if the crypto currency is sold again.
-    """
-    date_time: datetime
-    amount: float
-    bought_at: float
-    tax_policy: Enum = TaxPolicy.CAPITAL_GAINS
-
-    def __str__(self):
-        return (
-            f"Date and Time: {self.date_time}, "
-            f"Amount: {self.amount}, "
-            f"Bought At: {self.bought_at}, "
-            f"Tax Policy: {self.tax_policy.name}"
-        )
 
+    def __init__(self):
+        self.transaction_kinds = collections.Counter()
+        self.currencies = collections.Counter()
+        self.first_date_time = None
+        self.last_date_time = None
+        self.profiled_rows = 0
+        self.skipped_rows = 0
 
-def get_crypto_acquisition_record_from_raw_data_entry(raw_data_entry):
+    def add(self, raw_data_entry):
+        """Add a data row to the profile. Rows without a valid time stamp,
+        e.g. the header, are only counted as skipped."""
+        self.process_data((raw_data_entry,))
+
+    def process_data(self, raw_crypto_aquisition_data):
+        """Add all rows of the given iterable, e.g. a csv.reader, to the profile."""
+        # the column indices are looked up once instead of once per row
+        timestamp_column = Heading.TIMESTAMP.value
+        identifier_column = Heading.IDENTIFIER.value
+        source_currency_column = Heading.SOURCE_CURRENCY.value
+        target_currency_column = Heading.TARGET_CURRENCY.value
+        transaction_kinds = self.transaction_kinds
+        currencies = self.currencies
+        for raw_data_entry in raw_crypto_aquisition_data:
+            try:
+                date_time = get_date_time_object(raw_data_entry[timestamp_column])
+                transaction_kind = raw_data_entry[identifier_column]
+                source_currency = raw_data_entry[source_currency_column]
+            except (ValueError, IndexError) as e:
+                logger.debug("The data entry %s is not profiled: %s.", raw_data_entry, e)
+                self.skipped_rows += 1
+                continue
+            self.profiled_rows += 1
+            transaction_kinds[transaction_kind] += 1
+            # a row is counted once for each currency it involves
+            if source_currency:
+                currencies[source_currency] += 1
+            if len(raw_data_entry) > target_currency_column:
+                target_currency = raw_data_entry[target_currency_column]
+                if target_currency and target_currency != source_currency:
+                    currencies[target_currency] += 1
+            # exports list the newest or the oldest transaction first
+            if self.first_date_time is None or date_time < self.first_date_time:
+                self.first_date_time = date_time
+            if self.last_date_time is None or date_time > self.last_date_time:
+                self.last_date_time = date_time
+        return self
+
+    def get_report(self):
+        """Return the profile as a human readable text."""
+        lines = [f"Rows: {self.profiled_rows} ({self.skipped_rows} skipped)",
+                 f"First transaction: {self.first_date_time}",
+                 f"Last transaction: {self.last_date_time}",
+                 "Transaction kinds:"]
+        lines.extend(f"  {transaction_kind:<40}{count:>10}"
+                     for transaction_kind, count in self.transaction_kinds.most_common())
+        lines.append("Currencies:")
+        lines.extend(f"  {currency:<40}{count:>10}"
+                     for currency, count in self.currencies.most_common())
+        return "\n".join(lines)
+
+
+def profile_export(file_name):
+    """Stream a crypto.com csv file once and return its ExportProfile."""
+    with open(file_name, encoding="utf-8", mode='r', newline='') as csvfile:
+        return ExportProfile().process_data(csv.reader(csvfile, delimiter=','))
+
+
+def get_profit_calculator(engine):
     """
-    Functon to convert a list, obtained from reading in a data row in crypto.com's
-    csv file, to an object of type CryptoAquisitionRecord.
+    Return a new ProfitCalculator of the given engine, one of ENGINES. The
+    modules of the optional engines are only imported on demand, so their
+    dependencies, e.g. numpy or multiprocessing, do not slow down the start.
     """
-    date_time = get_date_time_object(raw_data_entry[Heading.TIMESTAMP.value])
-    crypto_amount = float(raw_data_entry[Heading.TARGET_AMOUNT.value])
-    euro_amount = float(raw_data_entry[Heading.NATIVE_CURRENCY_AMOUNT.value])
-    return CryptoAcquisitionRecord(date_time, crypto_amount, euro_amount)
-
-
-class CryptoAcquisitionRecordRemover: # pylint: disable=too-few-public-methods
+    # pylint: disable=import-outside-toplevel
+    if engine == "serial":
+        return ProfitCalculator(CryptoAquisitionData())
+    if engine == "compact":
+        from compact_lot_store import CompactAcquisitionRecordQueue
+        return ProfitCalculator(CryptoAquisitionData(CompactAcquisitionRecordQueue))
+    if engine == "fixed-point":
+        from fixed_point import FixedPointAquisitionData, FixedPointProfitCalculator
+        return FixedPointProfitCalculator(FixedPointAquisitionData())
+    if engine == "batch":
+        from batch_engine import BatchProfitCalculator
+        return BatchProfitCalculator(CryptoAquisitionData())
+    if engine == "parallel":
+        from parallel_processing import ParallelProfitCalculator
+        return ParallelProfitCalculator(CryptoAquisitionData())
+    raise ValueError(f"Unknown engine: '{engine}'")
+
+
+def write_tax_year_report(profit_calculator, output_format, output_file, tax_year=None,
+                          last_tax_year=None, per_currency=False):
     """
-    Functor, whose constructor is called with the list of actual aquisition
-    records of a certain crypto currency and the amount of how much of it should
-    be removed. Upon being called it removes/changes the oldest aquisition
-    records accordingly and updates the acquistion record list. It returns the
-    Euro amount at which the removed amount of crypto currency has been bought.
+    Write the profits of all tax years, of the given one or of the range from
+    tax_year to last_tax_year as text, csv or JSON. With per_currency the
+    rollups of each tax year and crypto currency are written instead.
     """
-
-    def __init__(self, aquisition_records, amount_to_remove, removal_date_time):
-        self.amount_to_be_removed = abs(float(amount_to_remove))
-        self.removal_date_time = removal_date_time
-        self.removed_crypto_bought_at = 0.0
-        self.new_acquisition_records = []
-        self.old_acquisition_records = aquisition_records
-
-    def __call__(self):
-        logger.debug("Removing the amount of: %7.2f ", self.amount_to_be_removed)
-        for record in self.old_acquisition_records:
-            if record.date_time <= self.removal_date_time:
-                self.__handle_acquisition_record(record)
-            else:
-                self.new_acquisition_records.append(record)
-                logger.warning(
-                    "Skipping the record at %s because it is after the transaction date %s."
-                    , record.date_time, self.removal_date_time
-                )
-        self.old_acquisition_records = self.new_acquisition_records
-        if self.amount_to_be_removed != 0.0:
-            logger.error("There were not enough assets for the crypto sale. "
-                         "Open amount: %7.5f", self.amount_to_be_removed)
-            assert False, "Inconsistent data, see error log."
-        return self.removed_crypto_bought_at
-
-    def __handle_acquisition_record(self, acquisition_record):
-        # do not leave amounts of 1 / 100000 of the original sum
-        if self.amount_to_be_removed > (acquisition_record.amount * 0.99999):
-            self.amount_to_be_removed -= acquisition_record.amount
-            self.removed_crypto_bought_at += acquisition_record.bought_at
-        elif self.amount_to_be_removed > 0.0:
-            relative_reduction_of_entry = (
-                acquisition_record.amount - self.amount_to_be_removed) / acquisition_record.amount
-            new_amount = (1.0 - relative_reduction_of_entry) * acquisition_record.bought_at
-            self.removed_crypto_bought_at += new_amount
-            self.new_acquisition_records.append(CryptoAcquisitionRecord(
-                acquisition_record.date_time,
-                acquisition_record.amount - self.amount_to_be_removed,
-                acquisition_record.bought_at * relative_reduction_of_entry)
-                )
-            self.amount_to_be_removed = 0.0
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    if output_format == "text":
+        if per_currency:
+            report = profit_calculator.get_rollup_report(tax_year, last_tax_year)
         else:
-            self.new_acquisition_records.append(acquisition_record)
-
-
-class CryptoAquisitionData:
+            report = profit_calculator.get_tax_year_report(tax_year, last_tax_year)
+        print(report, file=output_file)
+        return
+    if per_currency:
+        columns = ["tax_year", "crypto_currency", "sales", "proceeds", "cost_basis",
+                   "taxable_profit", "exempt_profit"]
+        rows = profit_calculator.get_rollup_rows(tax_year, last_tax_year)
+    else:
+        columns = ["tax_year", "taxable_profit", "exempt_profit"]
+        rows = profit_calculator.get_tax_year_rows(tax_year, last_tax_year)
+    if output_format == "csv":
+        writer = csv.writer(output_file)
+        writer.writerow(columns)
+        writer.writerows(rows)
+        return
+    json.dump([dict(zip(columns, row)) for row in rows], output_file, indent=2)
+    print(file=output_file)
+
+
+def report_files(file_names, engine="serial", instrumentation=None, diagnostics=None,
+                 audit_trail=None, compact_lots=False, snapshot_file_name=None):
     """
-    Data class, which holds the aquisitions of each crypto currency. The data
-    can be manipulated by the member function add, remove and swap, which
-    correspond to buying, selling and exchanging crypto currencies.
+    Process the crypto.com csv files of a client with the given engine and
+    return the ProfitCalculator. The rows of the files are merged in
+    chronological order, whichever order each file has. The run is
+    instrumented by the given instrumentation hooks, if any. Given
+    Diagnostics are reported once at the end of the run. The consumed lots
+    of each sale are written to the given audit trail, if any. With
+    compact_lots the acquisitions of the same calendar day are merged, if
+    possible. If a snapshot file name is given, the run resumes
+    from this snapshot of the module lot_state_snapshot, if it exists, only
+    processes the rows added since and saves the snapshot again.
     """
-
-    def __init__(self):
-        self.data_set = {}
-
-    def add(self, raw_data_entry):
-        """Add an one-time aquisition of a crypto currency to the data class.
-        The aquistion is given in terms of a crypto.com csv-datafile entry,
-        which has been converted from a string to a list."""
-        crypto_currency = raw_data_entry[Heading.TARGET_CURRENCY.value]
-        try:
-            currency_entry = get_crypto_acquisition_record_from_raw_data_entry(raw_data_entry)
-        except ValueError as e:
-            logger.error("A value error was raised: %s.", e)
-            logger.error("""While trying to parse the string: %s.
-                         The data entry is ignored.""", raw_data_entry
-                         )
-            return
-        self.__add(crypto_currency, currency_entry)
-
-    def __add(self, crypto_currency, currency_entry):
-        if not crypto_currency in self.data_set:
-            self.data_set[crypto_currency] = []
-        logger.debug("Adding entry for crypto currency %s.", crypto_currency)
-        self.data_set[crypto_currency].append(currency_entry)
-        self.data_set[crypto_currency].sort(key=lambda x: x.date_time)
-
-    def remove(self, raw_data_entry):
-        """Remove an amount of a crypto currency from the data class. This
-        corresponds to a one-time sale of the crypto currency. The sale is
-        given in terms of a crypto.com csv-datafile entry, which has been
-        converted from a string to a list.
-        """
-        crypto_currency = raw_data_entry[Heading.SOURCE_CURRENCY.value]
-        if not crypto_currency in self.data_set:
-            logger.error(
-                "Logical error: there should be an entry for the "
-                "crypto currency %s.", crypto_currency
-            )
-            return 0.0
-        amount = raw_data_entry[Heading.SOURCE_AMOUNT.value]
-        logger.debug(
-            "Crypto transaction: removing the amount %s "
-            "of the crypto curreny %s.", amount, crypto_currency
-        )
-        date_time = get_date_time_object(raw_data_entry[Heading.TIMESTAMP.value])
-        transaction_remover = CryptoAcquisitionRecordRemover(
-            self.data_set[crypto_currency], amount, date_time)
-        transaction_remover()
-        self.data_set[crypto_currency] = transaction_remover.new_acquisition_records
-        return float(transaction_remover.removed_crypto_bought_at)
-
-    def swap(self, raw_data_entry):
-        """Convert an amount of one crypto currency into another crypto 
-        currency within the data class. This corresponds to buying one crypto
-        currency with another crypto currency. This crypto exchange is given in 
-        terms of a crypto.com csv-datafile entry, which has been converted from
-        a string to a list.
-        """
-        self.remove(raw_data_entry)
-        crypto_currency = raw_data_entry[Heading.TARGET_CURRENCY.value]
-        currency_entry = get_crypto_acquisition_record_from_raw_data_entry(
-            raw_data_entry)
-        self.__add(crypto_currency, currency_entry)
-
-
-class ProfitCalculator: # pylint: disable=too-few-public-methods
-
-    """
-    Class calcuting those profits from crypto transactions, which are tax-relevant.
-    """
-
-    def __init__(self, crypto_aquistion_data):
-        self.crypto_aquistion_data = crypto_aquistion_data
-        self.taxable_profit = 0.0
-
-    def process_data(self, raw_crypto_aquisition_data): # pylint: disable=unused-argument
-
-        """Process the data from a crypto.com csv file."""
-        return 0
-
-    def __process_raw_entry(self, raw_data_entry):
-        if match_buy_crypto_currency_with_euro(raw_data_entry):
-            return
-        if match_sell_crypto_currency_get_euro(raw_data_entry):
-            return
-        if match_swap_of_crypto_currency(raw_data_entry):
-            return
-
-
-def main():
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    # pylint: disable=import-outside-toplevel
+    from merged_ingestion import merge_exports
+    from lot_state_snapshot import LotStateSnapshot
+    snapshot = None
+    if snapshot_file_name is not None and os.path.exists(snapshot_file_name):
+        snapshot = LotStateSnapshot.load(snapshot_file_name, get_profit_calculator(engine))
+        profit_calculator = snapshot.profit_calculator
+    else:
+        profit_calculator = get_profit_calculator(engine)
+        if snapshot_file_name is not None:
+            snapshot = LotStateSnapshot(profit_calculator)
+    if instrumentation is not None:
+        profit_calculator.set_instrumentation(instrumentation)
+    if diagnostics is not None:
+        profit_calculator.set_diagnostics(diagnostics)
+    if audit_trail is not None:
+        profit_calculator.set_audit_trail(audit_trail)
+    if compact_lots:
+        profit_calculator.set_lot_compaction()
+    if snapshot is None:
+        profit_calculator.process_data(merge_exports(file_names))
+    else:
+        snapshot.process_data(merge_exports(file_names))
+        snapshot.save(snapshot_file_name)
+    if diagnostics is not None:
+        diagnostics.report()
+    return profit_calculator
+
+
+def add_report_arguments(parser):
+    """Add the options of the tax year report to an argument parser."""
+    parser.add_argument("--format", dest="output_format", default="text",
+                        choices=OUTPUT_FORMATS,
+                        help="format of the report, default: %(default)s")
+    parser.add_argument("--tax-year", dest="tax_years", type=parse_tax_years,
+                        default=(None, None), metavar="YEAR[-YEAR]",
+                        help="only report the given tax year or range of tax years")
+    parser.add_argument("--per-currency", action="store_true",
+                        help="report the proceeds, the cost basis and the profits "
+                        "of each tax year per crypto currency")
+
+
+def main(arguments=None):
     """ Entry point for calling this file directly as a python script."""
-    transaction_list = []
-    date_times = []
-    with open('crypto_transactions_record_20230619_084542.csv', encoding="utf-8",
-              mode='r', newline='') as csvfile:
-        tax_report_reader = csv.reader(csvfile, delimiter=',')
-        for row in tax_report_reader:
-            try:
-                date_time = get_date_time_object(
-                    row[Heading.TIMESTAMP.value])
-            except ValueError as e:
-                logger.error("""The time stamp in the data file could not be parsed: %s.
-                              Skip this line.""", e)
-                continue
-            date_times.append(date_time)
-            new_transaction = row[Heading.IDENTIFIER.value]
-            if new_transaction not in transaction_list:
-                transaction_list.append(new_transaction)
-    date_times.reverse()
-    for item in transaction_list:
-        print(item)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--log-level", default="INFO", choices=LOG_LEVELS,
+                        help="minimal level of the logged messages, default: %(default)s")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser(
+        "report", help="report the taxable and the exempt profit of each tax year")
+    report_parser.add_argument("file_names", nargs="+", metavar="csv_file",
+                               help="crypto.com csv file of the client, several files "
+                               "are merged by time stamp")
+    add_report_arguments(report_parser)
+    report_parser.add_argument("--engine", default="serial", choices=ENGINES,
+                               help="engine of the FIFO matching, default: %(default)s")
+    report_parser.add_argument("--instrumentation", action="store_true",
+                               help="write a JSON summary of the time spent in each stage "
+                               "and of the open acquisitions to stderr")
+    report_parser.add_argument("--diagnostics", default="aggregated",
+                               choices=("aggregated", "per-event"),
+                               help="log unusual events once with their number per crypto "
+                               "currency or every time they occur, default: %(default)s")
+    report_parser.add_argument("--audit-trail", metavar="audit_file",
+                               help="write the acquisitions consumed by each sale to the "
+                               "given file")
+    report_parser.add_argument("--audit-format", default="csv", choices=AUDIT_TRAIL_FORMATS,
+                               help="format of the audit trail, default: %(default)s")
+    report_parser.add_argument("--compact-lots", action="store_true",
+                               help="merge the acquisitions of a crypto currency on the same "
+                               "calendar day with the same tax policy (capital gains or "
+                               "exempt) and the same price per unit into one lot, e.g. daily "
+                               "staking rewards; the lots are not merged, while the consumed "
+                               "lots are kept for --audit-trail")
+    report_parser.add_argument("--snapshot", metavar="snapshot_file",
+                               help="resume from the given snapshot of a previous run, if "
+                               "it exists, only process the rows added since and save the "
+                               "snapshot again")
+    profile_parser = subparsers.add_parser(
+        "profile", help="give an overview of a crypto.com csv file")
+    profile_parser.add_argument("file_name", metavar="csv_file",
+                                help="crypto.com csv file of the client")
+    arguments = parser.parse_args(arguments)
+    # invalid combinations are rejected before any output file is opened
+    if (arguments.command == "report" and arguments.audit_trail is not None
+            and arguments.engine in ENGINES_WITHOUT_AUDIT_TRAIL):
+        report_parser.error(f"the engine {arguments.engine} cannot write an audit trail")
+    logging.basicConfig(level=arguments.log_level)
+    if arguments.command == "profile":
+        print(profile_export(arguments.file_name).get_report())
+    else:
+        instrumentation = None
+        if arguments.instrumentation:
+            from instrumentation import Instrumentation  # pylint: disable=import-outside-toplevel
+            instrumentation = Instrumentation()
+        diagnostics = Diagnostics() if arguments.diagnostics == "aggregated" else None
+        with contextlib.ExitStack() as exit_stack:
+            audit_trail = None
+            if arguments.audit_trail is not None:
+                audit_trail = exit_stack.enter_context(
+                    AuditTrailWriter(arguments.audit_trail, arguments.audit_format))
+            profit_calculator = report_files(
+                arguments.file_names, arguments.engine, instrumentation, diagnostics,
+                audit_trail, arguments.compact_lots, arguments.snapshot)
+        write_tax_year_report(profit_calculator, arguments.output_format, sys.stdout,
+                              *arguments.tax_years, arguments.per_currency)
+        if instrumentation is not None:
+            json.dump(instrumentation.get_summary(), sys.stderr, indent=2)
+            print(file=sys.stderr)
 
 
 if "__main__" == __name__:
@@ -0,0 +1,459 @@
+#!/usr/bin/python3
+
+"""
+This file provides a benchmark suite for the module crypto_tax_report. It generates a
+deterministic synthetic crypto.com csv file and times the stages of the processing
+separately: time stamp parsing, classification, the member functions add, remove and
+swap of CryptoAquisitionData and the end-to-end processing in the float and in the
+fixed-point mode. In addition there are micro-benchmarks of the acquisition record
+storage and of the FIFO matching with floats, integers and decimal.Decimal. The results
+are written as JSON, so that the results of different versions can be compared.
+"""
+
+import argparse
+import csv
+import dataclasses
+import datetime
+import decimal
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from acquisition_lots import (
+    CryptoAcquisitionRecord, CryptoAcquisitionRecordQueue, CryptoAcquisitionRecordRemover,
+    CryptoAquisitionData, Currency, DATE_TIME_FORMAT, Heading, TaxPolicy,
+    get_cached_date_time_object, get_date_time_object)
+from compact_lot_store import CompactAcquisitionRecordQueue
+from fixed_point import (
+    FixedPointAcquisitionRecordRemover, FixedPointAquisitionData, FixedPointProfitCalculator)
+from mapped_csv_reader import read_mapped_csv
+from profit_calculator import ProfitCalculator, TransactionKind, classify_transaction
+
+BENCHMARK_RESULT_VERSION = 1
+CSV_HEADER = ["Timestamp (UTC)", "Transaction Description", "Currency", "Amount",
+              "To Currency", "To Amount", "Native Currency", "Native Amount",
+              "Native Amount (in USD)", "Transaction Kind", "Transaction Hash"]
+
+
+def generate_synthetic_export(number_of_rows, seed=0, crypto_currencies=None,
+                              buy_ratio=0.5, sell_ratio=0.3, swap_ratio=0.2):
+    """
+    Generator yielding deterministic synthetic rows of a crypto.com csv file in
+    the column layout of Heading and in chronological order. The kind of each
+    row is drawn with the given ratios of buys, sales and swaps among the given
+    crypto currencies (by default all elements of Currency except EUR). A sale
+    or swap gives away at most half of the held amount, so there are always
+    enough acquisitions; without any holdings a buy is generated instead.
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+    if crypto_currencies is None:
+        crypto_currencies = [currency.name for currency in Currency if currency != Currency.EUR]
+    random_generator = random.Random(seed)
+    holdings = dict.fromkeys(crypto_currencies, 0.0)
+    date_time = datetime.datetime(2020, 1, 1)
+    total_ratio = buy_ratio + sell_ratio + swap_ratio
+    for _ in range(number_of_rows):
+        date_time += datetime.timedelta(seconds=random_generator.randint(1, 600))
+        timestamp = date_time.strftime(DATE_TIME_FORMAT)
+        transaction = random_generator.uniform(0.0, total_ratio)
+        source_currency = random_generator.choice(crypto_currencies)
+        target_currency = random_generator.choice(crypto_currencies)
+        euro_amount = f"{random_generator.uniform(1.0, 1000.0):.2f}"
+        dollar_amount = f"{float(euro_amount) * 1.1:.2f}"
+        hash_key = f"{random_generator.getrandbits(64):016x}"
+        if transaction < buy_ratio or holdings[source_currency] <= 0.0 or (
+                transaction >= buy_ratio + sell_ratio and source_currency == target_currency):
+            amount = round(random_generator.uniform(0.01, 500.0), 8)
+            holdings[target_currency] += amount
+            yield [timestamp, f"EUR -> {target_currency}", "EUR", f"-{euro_amount}",
+                   target_currency, f"{amount:.8f}", "EUR", euro_amount, dollar_amount,
+                   "viban_purchase", hash_key]
+            continue
+        amount = round(holdings[source_currency] * random_generator.uniform(0.05, 0.5), 8)
+        holdings[source_currency] -= amount
+        if transaction < buy_ratio + sell_ratio:
+            yield [timestamp, f"{source_currency} -> EUR", source_currency, f"-{amount:.8f}",
+                   "EUR", euro_amount, "EUR", euro_amount, dollar_amount,
+                   "crypto_viban_exchange", hash_key]
+            continue
+        target_amount = round(random_generator.uniform(0.01, 500.0), 8)
+        holdings[target_currency] += target_amount
+        yield [timestamp, f"{source_currency} -> {target_currency}", source_currency,
+               f"-{amount:.8f}", target_currency, f"{target_amount:.8f}", "EUR", euro_amount,
+               dollar_amount, "crypto_exchange", hash_key]
+
+
+def write_synthetic_export(file_name, number_of_rows, **generator_arguments):
+    """
+    Write a synthetic crypto.com csv file with a header row, see
+    generate_synthetic_export for the arguments.
+    """
+    with open(file_name, encoding="utf-8", mode='w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(generate_synthetic_export(number_of_rows, **generator_arguments))
+
+
+@dataclasses.dataclass
+class UnslottedAcquisitionRecord:
+    """Baseline: CryptoAcquisitionRecord as a dataclass with a __dict__ per instance."""
+    date_time: datetime.datetime
+    amount: float
+    bought_at: float
+    tax_policy: TaxPolicy = TaxPolicy.CAPITAL_GAINS
+
+
+def get_acquisition_records(number_of_lots):
+    """
+    Function returning a list of chronologically ordered acquisition records,
+    one per minute.
+    """
+    start = datetime.datetime(2021, 1, 1)
+    return [
+        CryptoAcquisitionRecord(start + datetime.timedelta(minutes=index), 1.0, 0.5)
+        for index in range(number_of_lots)
+    ]
+
+
+def benchmark_sorted_list_insertion(acquisition_records):
+    """
+    Baseline: append every record to a list and sort the list afterwards,
+    like CryptoAquisitionData did before using CryptoAcquisitionRecordQueue.
+    """
+    start_time = time.perf_counter()
+    records = []
+    for acquisition_record in acquisition_records:
+        records.append(acquisition_record)
+        records.sort(key=lambda x: x.date_time)
+    return time.perf_counter() - start_time
+
+
+def benchmark_queue_insertion(acquisition_records):
+    """Add every record to a CryptoAcquisitionRecordQueue."""
+    start_time = time.perf_counter()
+    records = CryptoAcquisitionRecordQueue()
+    for acquisition_record in acquisition_records:
+        records.add(acquisition_record)
+    return time.perf_counter() - start_time
+
+
+def benchmark_small_sales(acquisition_records, number_of_sales):
+    """
+    Sell a quarter of a lot per sale from a queue with many open lots, so most
+    sales only touch the oldest lot.
+    """
+    records = CryptoAcquisitionRecordQueue(acquisition_records)
+    removal_date_time = acquisition_records[-1].date_time
+    start_time = time.perf_counter()
+    for _ in range(number_of_sales):
+        CryptoAcquisitionRecordRemover(records, 0.25, removal_date_time)()
+    return time.perf_counter() - start_time
+
+
+def benchmark_small_sales_fixed_point(acquisition_records, number_of_sales):
+    """
+    Like benchmark_small_sales, but with integer amounts in units of 10**-8
+    and Euro amounts in cents, which are matched by the fixed-point mode.
+    """
+    records = CryptoAcquisitionRecordQueue(
+        CryptoAcquisitionRecord(acquisition_record.date_time, 100000000, 50)
+        for acquisition_record in acquisition_records)
+    removal_date_time = acquisition_records[-1].date_time
+    start_time = time.perf_counter()
+    for _ in range(number_of_sales):
+        FixedPointAcquisitionRecordRemover(records, 25000000, removal_date_time)()
+    return time.perf_counter() - start_time
+
+
+class DecimalAcquisitionRecordRemover: # pylint: disable=too-few-public-methods
+    """
+    Baseline: the FIFO matching of FixedPointAcquisitionRecordRemover with
+    decimal.Decimal amounts instead of integers.
+    """
+
+    def __init__(self, aquisition_records, amount_to_remove, removal_date_time):
+        self.amount_to_be_removed = abs(amount_to_remove)
+        self.removal_date_time = removal_date_time
+        self.removed_crypto_bought_at = decimal.Decimal(0)
+        self.acquisition_records = aquisition_records
+
+    def __call__(self):
+        acquisition_records = self.acquisition_records
+        while self.amount_to_be_removed > 0 and acquisition_records:
+            acquisition_record = acquisition_records[0]
+            if acquisition_record.date_time > self.removal_date_time:
+                break
+            if self.amount_to_be_removed >= acquisition_record.amount:
+                self.amount_to_be_removed -= acquisition_record.amount
+                self.removed_crypto_bought_at += acquisition_record.bought_at
+                acquisition_records.popleft()
+            else:
+                removed_bought_at = (acquisition_record.bought_at * self.amount_to_be_removed
+                                     / acquisition_record.amount)
+                self.removed_crypto_bought_at += removed_bought_at
+                acquisition_record.amount -= self.amount_to_be_removed
+                acquisition_record.bought_at -= removed_bought_at
+                self.amount_to_be_removed = decimal.Decimal(0)
+        assert self.amount_to_be_removed == 0, "Inconsistent data."
+        return self.removed_crypto_bought_at
+
+
+def benchmark_small_sales_decimal(acquisition_records, number_of_sales):
+    """Like benchmark_small_sales, but with decimal.Decimal amounts."""
+    records = CryptoAcquisitionRecordQueue(
+        CryptoAcquisitionRecord(acquisition_record.date_time, decimal.Decimal(1),
+                                decimal.Decimal("0.5"))
+        for acquisition_record in acquisition_records)
+    removal_date_time = acquisition_records[-1].date_time
+    amount_to_remove = decimal.Decimal("0.25")
+    start_time = time.perf_counter()
+    for _ in range(number_of_sales):
+        DecimalAcquisitionRecordRemover(records, amount_to_remove, removal_date_time)()
+    return time.perf_counter() - start_time
+
+
+def measure_lot_memory(record_type, record_queue_type, number_of_lots):
+    """
+    Return the number of bytes allocated for storing the given number of
+    acquisition records of record_type in a queue of record_queue_type. The
+    datetime.datetime objects of the records are included.
+    """
+    start = datetime.datetime(2021, 1, 1)
+    tracemalloc.start()
+    records = record_queue_type()
+    for index in range(number_of_lots):
+        records.add(record_type(start + datetime.timedelta(minutes=index), 1.0, 0.5))
+    allocated_memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return allocated_memory
+
+
+def get_date_time_strings(number_of_strings):
+    """
+    Function returning a list of distinct time stamps in the format of the
+    crypto.com csv file.
+    """
+    start = datetime.datetime(2021, 1, 1)
+    return [
+        (start + datetime.timedelta(seconds=17 * index)).strftime(DATE_TIME_FORMAT)
+        for index in range(number_of_strings)
+    ]
+
+
+def benchmark_date_time_parsing(parse_function, date_time_strings):
+    """Parse every string with the given function."""
+    start_time = time.perf_counter()
+    for date_time_string in date_time_strings:
+        parse_function(date_time_string)
+    return time.perf_counter() - start_time
+
+
+def strptime_date_time_object(datetime_as_string):
+    """Baseline: parsing with datetime.datetime.strptime."""
+    return datetime.datetime.strptime(datetime_as_string, DATE_TIME_FORMAT)
+
+
+def benchmark_classification(transactions):
+    """Classify every transaction description, starting with an empty cache."""
+    classify_transaction.cache_clear()
+    start_time = time.perf_counter()
+    for transaction in transactions:
+        classify_transaction(transaction)
+    return time.perf_counter() - start_time
+
+
+def benchmark_aquisition_data_stages(raw_data):
+    """
+    Pass the rows to the member functions add, remove and swap of
+    CryptoAquisitionData in their order and return the accumulated time spent
+    in each member function together with the number of calls.
+    """
+    crypto_aquisition_data = CryptoAquisitionData()
+    member_functions = {
+        TransactionKind.BUY: crypto_aquisition_data.add,
+        TransactionKind.SELL: crypto_aquisition_data.remove,
+        TransactionKind.SWAP: crypto_aquisition_data.swap,
+    }
+    elapsed_times = dict.fromkeys(member_functions, 0.0)
+    number_of_calls = dict.fromkeys(member_functions, 0)
+    perf_counter = time.perf_counter
+    for raw_data_entry in raw_data:
+        transaction_kind = classify_transaction(raw_data_entry[Heading.IDENTIFIER.value])[0]
+        member_function = member_functions.get(transaction_kind)
+        if member_function is None:
+            continue
+        start_time = perf_counter()
+        member_function(raw_data_entry)
+        elapsed_times[transaction_kind] += perf_counter() - start_time
+        number_of_calls[transaction_kind] += 1
+    return {transaction_kind: (number_of_calls[transaction_kind], elapsed_time)
+            for transaction_kind, elapsed_time in elapsed_times.items()}
+
+
+def benchmark_end_to_end(raw_data):
+    """Process the rows with a ProfitCalculator."""
+    start_time = time.perf_counter()
+    ProfitCalculator(CryptoAquisitionData()).process_data(raw_data)
+    return time.perf_counter() - start_time
+
+
+def benchmark_end_to_end_fixed_point(raw_data):
+    """Process the rows with a FixedPointProfitCalculator."""
+    start_time = time.perf_counter()
+    FixedPointProfitCalculator(FixedPointAquisitionData()).process_data(raw_data)
+    return time.perf_counter() - start_time
+
+
+def benchmark_end_to_end_csv_file(file_name):
+    """Read a csv file with csv.reader and process it with a ProfitCalculator."""
+    start_time = time.perf_counter()
+    with open(file_name, encoding="utf-8", mode='r', newline='') as csv_file:
+        ProfitCalculator(CryptoAquisitionData()).process_data(csv.reader(csv_file))
+    return time.perf_counter() - start_time
+
+
+def benchmark_end_to_end_mapped_csv_file(file_name):
+    """Read a csv file with read_mapped_csv and process it with a ProfitCalculator."""
+    start_time = time.perf_counter()
+    ProfitCalculator(CryptoAquisitionData()).process_data(read_mapped_csv(file_name))
+    return time.perf_counter() - start_time
+
+
+def add_result(results, name, number_of_items, elapsed_time):
+    """Add the timing of a single benchmark to the results."""
+    results[name] = {
+        "items": number_of_items,
+        "seconds": elapsed_time,
+        "items_per_second": number_of_items / elapsed_time if elapsed_time > 0.0 else None,
+    }
+
+
+def add_memory_result(results, name, number_of_items, allocated_memory):
+    """Add the result of a single memory measurement to the results."""
+    results[name] = {
+        "items": number_of_items,
+        "bytes": allocated_memory,
+        "bytes_per_item": allocated_memory / number_of_items,
+    }
+
+
+def run_stage_benchmarks(results, number_of_rows, seed):
+    """Run the benchmarks of the processing stages on a synthetic csv file."""
+    raw_data = list(generate_synthetic_export(number_of_rows, seed=seed))
+    add_result(results, "timestamp_parsing_strptime", len(raw_data), benchmark_date_time_parsing(
+        strptime_date_time_object, [row[Heading.TIMESTAMP.value] for row in raw_data]))
+    add_result(results, "timestamp_parsing", len(raw_data), benchmark_date_time_parsing(
+        get_date_time_object, [row[Heading.TIMESTAMP.value] for row in raw_data]))
+    add_result(results, "classification", len(raw_data), benchmark_classification(
+        [row[Heading.IDENTIFIER.value] for row in raw_data]))
+    for transaction_kind, (number_of_calls, elapsed_time) in \
+            benchmark_aquisition_data_stages(raw_data).items():
+        name = {TransactionKind.BUY: "add", TransactionKind.SELL: "remove",
+                TransactionKind.SWAP: "swap"}[transaction_kind]
+        add_result(results, f"aquisition_data_{name}", number_of_calls, elapsed_time)
+    add_result(results, "end_to_end_in_memory", len(raw_data), benchmark_end_to_end(raw_data))
+    add_result(results, "end_to_end_in_memory_fixed_point", len(raw_data),
+               benchmark_end_to_end_fixed_point(raw_data))
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        file_name = os.path.join(temporary_directory, "synthetic_export.csv")
+        write_synthetic_export(file_name, number_of_rows, seed=seed)
+        add_result(results, "end_to_end_csv_reader", number_of_rows + 1,
+                   benchmark_end_to_end_csv_file(file_name))
+        add_result(results, "end_to_end_mapped_csv_reader", number_of_rows + 1,
+                   benchmark_end_to_end_mapped_csv_file(file_name))
+
+
+def run_storage_benchmarks(results, arguments):
+    """Run the micro-benchmarks of the acquisition record storage."""
+    acquisition_records = get_acquisition_records(max(arguments.lots, arguments.baseline_lots))
+    add_result(results, "lot_insertion_sorted_list", arguments.baseline_lots,
+               benchmark_sorted_list_insertion(acquisition_records[:arguments.baseline_lots]))
+    add_result(results, "lot_insertion_queue", arguments.lots,
+               benchmark_queue_insertion(acquisition_records[:arguments.lots]))
+    add_result(results, "small_sales", arguments.sales,
+               benchmark_small_sales(acquisition_records[:arguments.lots], arguments.sales))
+    add_result(results, "small_sales_fixed_point", arguments.sales,
+               benchmark_small_sales_fixed_point(acquisition_records[:arguments.lots],
+                                                 arguments.sales))
+    add_result(results, "small_sales_decimal", arguments.sales,
+               benchmark_small_sales_decimal(acquisition_records[:arguments.lots],
+                                             arguments.sales))
+    for name, record_type, record_queue_type in [
+            ("lot_memory_unslotted_dataclass", UnslottedAcquisitionRecord,
+             CryptoAcquisitionRecordQueue),
+            ("lot_memory_slotted_dataclass", CryptoAcquisitionRecord,
+             CryptoAcquisitionRecordQueue),
+            ("lot_memory_compact_queue", CryptoAcquisitionRecord,
+             CompactAcquisitionRecordQueue)]:
+        add_memory_result(results, name, arguments.memory_lots, measure_lot_memory(
+            record_type, record_queue_type, arguments.memory_lots))
+    date_time_strings = get_date_time_strings(arguments.timestamps)
+    # every time stamp is parsed twice, like a row which is sold and added in a swap
+    add_result(results, "timestamp_parsing_cached_twice", 2 * arguments.timestamps,
+               benchmark_date_time_parsing(
+                   get_cached_date_time_object,
+                   [item for item in date_time_strings for _ in range(2)]))
+
+
+def print_results(results, output_file):
+    """Print a human-readable summary of the results."""
+    for name, result in results.items():
+        if "bytes" in result:
+            print(f"{name:<40} {result['items']:>10} items "
+                  f"{result['bytes'] / 2**20:10.1f} MiB "
+                  f"{result['bytes_per_item']:14.1f} bytes/item", file=output_file)
+        else:
+            print(f"{name:<40} {result['items']:>10} items {result['seconds']:10.4f} s "
+                  f"{result['items_per_second'] or 0.0:14.0f} items/s", file=output_file)
+
+
+def main():
+    """ Entry point for calling this file directly as a python script."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000,
+                        help="number of rows of the synthetic csv file")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the synthetic csv file")
+    parser.add_argument("--lots", type=int, default=1000000,
+                        help="number of acquisition records added to the queue")
+    parser.add_argument("--baseline-lots", type=int, default=10000,
+                        help="number of acquisition records for the sorted list baseline")
+    parser.add_argument("--sales", type=int, default=100000,
+                        help="number of small sales from the acquisition records")
+    parser.add_argument("--memory-lots", type=int, default=1000000,
+                        help="number of acquisition records for the memory measurement")
+    parser.add_argument("--timestamps", type=int, default=200000,
+                        help="number of parsed time stamps")
+    parser.add_argument("--output", help="file name of the JSON results, default: stdout")
+    parser.add_argument("--skip-storage-benchmarks", action="store_true",
+                        help="only run the benchmarks of the processing stages")
+    arguments = parser.parse_args()
+
+    results = {}
+    run_stage_benchmarks(results, arguments.rows, arguments.seed)
+    if not arguments.skip_storage_benchmarks:
+        run_storage_benchmarks(results, arguments)
+    benchmark_result = {
+        "version": BENCHMARK_RESULT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": vars(arguments),
+        "results": results,
+    }
+    if arguments.output:
+        with open(arguments.output, encoding="utf-8", mode='w') as output_file:
+            json.dump(benchmark_result, output_file, indent=2)
+        print_results(results, sys.stdout)
+    else:
+        json.dump(benchmark_result, sys.stdout, indent=2)
+        print()
+        print_results(results, sys.stderr)
+
+
+if "__main__" == __name__:
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+
+"""
+This file provides unit tests for the functionality within the module
+crypto_tax_report_benchmark.
+"""
+
+# pylint: disable=C0115,C0116
+
+import collections
+import json
+import unittest
+import crypto_tax_report
+import crypto_tax_report_benchmark
+from crypto_tax_report import logger
+
+
+class SyntheticExportTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def test_generator_is_deterministic(self):
+        raw_data = list(crypto_tax_report_benchmark.generate_synthetic_export(500, seed=1))
+        self.assertEqual(
+            raw_data, list(crypto_tax_report_benchmark.generate_synthetic_export(500, seed=1)))
+        self.assertNotEqual(
+            raw_data, list(crypto_tax_report_benchmark.generate_synthetic_export(500, seed=2)))
+        self.assertTrue(all(len(row) == len(crypto_tax_report.Heading) for row in raw_data))
+        timestamps = [row[crypto_tax_report.Heading.TIMESTAMP.value] for row in raw_data]
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_generator_ratios_and_currencies(self):
+        raw_data = list(crypto_tax_report_benchmark.generate_synthetic_export(
+            2000, crypto_currencies=["CRO", "ADA"], buy_ratio=0.6, sell_ratio=0.4,
+            swap_ratio=0.0))
+        transaction_kinds = collections.Counter(
+            crypto_tax_report.classify_transaction(
+                row[crypto_tax_report.Heading.IDENTIFIER.value])[0] for row in raw_data)
+        self.assertEqual(transaction_kinds[crypto_tax_report.TransactionKind.SWAP], 0)
+        self.assertGreater(transaction_kinds[crypto_tax_report.TransactionKind.SELL], 600)
+        self.assertEqual({row[crypto_tax_report.Heading.TARGET_CURRENCY.value]
+                          for row in raw_data}, {"CRO", "ADA", "EUR"})
+        # there are always enough acquisitions for the sales
+        crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData()).process_data(raw_data)
+
+    def test_stage_benchmark_results_are_serializable(self):
+        results = {}
+        crypto_tax_report_benchmark.run_stage_benchmarks(results, 300, seed=4)
+        self.assertEqual(results["timestamp_parsing"]["items"], 300)
+        self.assertEqual(sum(results[f"aquisition_data_{name}"]["items"]
+                             for name in ("add", "remove", "swap")), 300)
+        self.assertIn("end_to_end_mapped_csv_reader", results)
+        self.assertIn("end_to_end_in_memory_fixed_point", results)
+        self.assertEqual(json.loads(json.dumps(results)), results)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,11 +4,23 @@
 This file provides unit tests for the functionality within the module crypto_tax_report.
 """
 
-# pylint: disable=C0115,C0116
-
+# pylint: disable=C0115,C0116,C0302
+
+import contextlib
+import csv
+import io
+import json
+import copy
+import logging
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
 import unittest
 import crypto_tax_report
 from crypto_tax_report import datetime, CryptoAcquisitionRecord, logger
+from profit_calculator import TaxYearCurrencyRollup
 
 # Create a test class
 class TestRawDataConversions(unittest.TestCase):
@@ -51,6 +63,21 @@ class TestRawDataConversions(unittest.TestCase):
         with self.assertRaises(ValueError):
             crypto_tax_report.get_date_time_object(invalid_raw_date_time)
 
+    def test_get_date_time_object_same_as_strptime(self):
+        for raw_date_time in [r'2024-02-29 23:59:59', r'2021-1-2 4:10:03']:
+            self.assertEqual(
+                crypto_tax_report.get_date_time_object(raw_date_time),
+                datetime.datetime.strptime(raw_date_time, "%Y-%m-%d %H:%M:%S"))
+        for invalid_raw_date_time in [r'2023-02-29 04:10:03', r'2021-12-02 04:10:60',
+                                      r'2021-12-02T04:10:03', r'2021-12-02 04:10:03.5',
+                                      r'Timestamp (UTC)']:
+            with self.assertRaises(ValueError):
+                crypto_tax_report.get_date_time_object(invalid_raw_date_time)
+            with self.assertRaises(ValueError):
+                crypto_tax_report.get_cached_date_time_object(invalid_raw_date_time)
+        self.assertEqual(crypto_tax_report.get_cached_date_time_object(r'2021-12-02 04:10:03'),
+                         datetime.datetime(2021, 12, 2, 4, 10, 3))
+
     def test_match_buy_crypto_currency_with_euro(self):
         match_successful = crypto_tax_report.match_buy_crypto_currency_with_euro(
             r'EUR -> ADA')
@@ -106,6 +133,96 @@ class TestRawDataConversions(unittest.TestCase):
         self.assertFalse(match_successful)
 
 
+    def test_classify_transaction(self):
+        transaction_kind = crypto_tax_report.TransactionKind
+        self.assertEqual(crypto_tax_report.classify_transaction(r'  EUR -> ADA '),
+                         (transaction_kind.BUY, 'EUR', 'ADA'))
+        self.assertEqual(crypto_tax_report.classify_transaction(r'CRO -> EUR'),
+                         (transaction_kind.SELL, 'CRO', 'EUR'))
+        self.assertEqual(crypto_tax_report.classify_transaction(r'ETH->SOL'),
+                         (transaction_kind.SWAP, 'ETH', 'SOL'))
+        self.assertEqual(crypto_tax_report.classify_transaction(r'CRO Stake Rewards'),
+                         (transaction_kind.OTHER, '', ''))
+
+    def test_get_exemption_cutoff(self):
+        self.assertEqual(
+            crypto_tax_report.get_exemption_cutoff(datetime.datetime(2022, 5, 21, 10, 3, 7)),
+            datetime.datetime(2021, 5, 21))
+        # the previous year has no February 29
+        self.assertEqual(
+            crypto_tax_report.get_exemption_cutoff(datetime.datetime(2024, 2, 29, 23, 59, 59)),
+            datetime.datetime(2023, 3, 1))
+        self.assertEqual(
+            crypto_tax_report.get_exemption_cutoff(datetime.datetime(2021, 3, 1)),
+            datetime.datetime(2020, 3, 1))
+
+
+def get_unordered_acquisition_records():
+    """
+    Return acquisition records, which are not added in chronological order
+    and two of which have the same time stamp.
+    """
+    return [
+        CryptoAcquisitionRecord(datetime.datetime(2021, 5, 20, 12, 0, 0), 1., 1.),
+        CryptoAcquisitionRecord(datetime.datetime(2021, 6, 20, 12, 0, 0), 2., 2.),
+        CryptoAcquisitionRecord(datetime.datetime(2021, 4, 20, 12, 0, 0), 3., 3.),
+        CryptoAcquisitionRecord(datetime.datetime(2021, 5, 20, 12, 0, 0), 4., 4.),
+    ]
+
+
+class CryptoAcquisitionRecordQueueTest(unittest.TestCase):
+
+    def test_add_keeps_chronological_order(self):
+        records = get_unordered_acquisition_records()
+        acquisition_records = crypto_tax_report.CryptoAcquisitionRecordQueue(records)
+        # records with the same time stamp keep the order in which they were added
+        self.assertEqual(acquisition_records,
+                         [records[2], records[0], records[3], records[1]])
+        self.assertEqual(acquisition_records.popleft(), records[2])
+        self.assertEqual(len(acquisition_records), 3)
+        self.assertEqual(acquisition_records[0], records[0])
+
+    def test_remover_consumes_records_in_place(self):
+        records = [
+            CryptoAcquisitionRecord(datetime.datetime(2021, 5, 20, 12, 0, 0), 1., 10.),
+            CryptoAcquisitionRecord(datetime.datetime(2021, 6, 20, 12, 0, 0), 2., 40.),
+            CryptoAcquisitionRecord(datetime.datetime(2021, 8, 20, 12, 0, 0), 3., 90.),
+        ]
+        acquisition_records = crypto_tax_report.CryptoAcquisitionRecordQueue(records)
+        remover = crypto_tax_report.CryptoAcquisitionRecordRemover(
+            acquisition_records, "-1.5", datetime.datetime(2021, 7, 1))
+        self.assertAlmostEqual(remover(), 20.0)
+        self.assertEqual(len(acquisition_records), 2)
+        # the partially consumed record is reduced in place
+        self.assertIs(acquisition_records[0], records[1])
+        self.assertAlmostEqual(records[1].amount, 1.5)
+        self.assertAlmostEqual(records[1].bought_at, 30.0)
+        self.assertIs(acquisition_records[1], records[2])
+        # the record acquired after the removal date can not be consumed
+        remover = crypto_tax_report.CryptoAcquisitionRecordRemover(
+            acquisition_records, "-2.0", datetime.datetime(2021, 7, 1))
+        with self.assertRaises(ValueError):
+            remover()
+
+    def test_remover_splits_off_exempt_part(self):
+        records = [
+            CryptoAcquisitionRecord(datetime.datetime(2021, 5, 20, 12, 0, 0), 1., 10.),
+            CryptoAcquisitionRecord(datetime.datetime(2021, 6, 20, 12, 0, 0), 2., 40.),
+            CryptoAcquisitionRecord(datetime.datetime(2021, 8, 20, 12, 0, 0), 3., 90.),
+        ]
+        acquisition_records = crypto_tax_report.CryptoAcquisitionRecordQueue(records)
+        # the records up to June 20, 2021 have been held for more than a year
+        remover = crypto_tax_report.CryptoAcquisitionRecordRemover(
+            acquisition_records, "-4.0", datetime.datetime(2022, 6, 21))
+        self.assertAlmostEqual(remover(), 80.0)
+        self.assertAlmostEqual(remover.disposal.exempt_amount, 3.0)
+        self.assertAlmostEqual(remover.disposal.exempt_bought_at, 50.0)
+        # a holding period of exactly one year is not enough
+        remover = crypto_tax_report.CryptoAcquisitionRecordRemover(
+            acquisition_records, "-1.0", datetime.datetime(2022, 8, 20, 23, 0, 0))
+        self.assertAlmostEqual(remover(), 30.0)
+        self.assertEqual(remover.disposal.exempt_amount, 0.0)
+
 
 class SimplePurchaseData:
     @staticmethod
@@ -482,7 +599,7 @@ class CryptoAquisitionDataTest(unittest.TestCase):
         for item in crypto_sale_data[:-1]:
             self.crypto_acquisition_data.remove(item)
         # Assert
-        with self.assertRaises(AssertionError):
+        with self.assertRaises(ValueError):
             self.crypto_acquisition_data.remove(crypto_sale_data[-1])
 
     @staticmethod
@@ -504,7 +621,7 @@ class CryptoAquisitionDataTest(unittest.TestCase):
         for item in crypto_sale_data[:-1]:
             self.crypto_acquisition_data.remove(item)
         # Assert that exception is raised. At the time of removal there are not enough ada assets
-        with self.assertRaises(AssertionError):
+        with self.assertRaises(ValueError):
             self.crypto_acquisition_data.remove(crypto_sale_data[-1])
 
     @staticmethod
@@ -536,7 +653,7 @@ class CryptoAquisitionDataTest(unittest.TestCase):
         for item in crypto_sale_data[:-1]:
             self.crypto_acquisition_data.remove(item)
         # Assert
-        with self.assertRaises(AssertionError):
+        with self.assertRaises(ValueError):
             self.crypto_acquisition_data.remove(crypto_sale_data[-1])
 
 
@@ -620,5 +737,656 @@ class CryptoSwapTest(unittest.TestCase):
         )
 
 
+class ProfitCalculatorTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+        self.profit_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    @staticmethod
+    def get_header():
+        return ["Timestamp (UTC)", "Transaction Description", "Currency", "Amount",
+                "To Currency", "To Amount", "Native Currency", "Native Amount",
+                "Native Amount (in USD)", "Transaction Kind", "Transaction Hash"]
+
+    def test_process_data_of_sales(self):
+        crypto_sale_data, _ = CryptoAquisitionDataTest.get_testdata_for_crypto_sale()
+        raw_data = [ProfitCalculatorTest.get_header()] + SimplePurchaseData.as_raw() + \
+            crypto_sale_data
+        # the rows are handed over one by one, like from a csv.reader
+        taxable_profit = self.profit_calculator.process_data(iter(raw_data))
+        # ADA: 200 - 150, 200 - (150 + 25); CRO: 2000 - (20 + 760)
+        self.assertAlmostEqual(taxable_profit, 50.0 + 25.0 + 1220.0)
+        self.assertAlmostEqual(self.profit_calculator.taxable_profit, taxable_profit)
+        self.assertEqual(self.profit_calculator.processed_rows, len(raw_data))
+        self.assertEqual(len(self.profit_calculator.crypto_aquistion_data.data_set['CRO']), 2)
+
+    def test_process_data_of_swap(self):
+        crypto_swap_data = [
+            ["2021-12-06 14:01:56", "ADA -> CRO", "ADA", "-50.0", "CRO",
+                "200.0", "ADA", "40.0", "40.0", "crypto_viban_exchange",]
+        ]
+        taxable_profit = self.profit_calculator.process_data(
+            SimplePurchaseData.as_raw() + crypto_swap_data)
+        # 50 ADA bought at 75 Euro are given away for 40 Euro
+        self.assertAlmostEqual(taxable_profit, -35.0)
+        self.assertEqual(len(self.profit_calculator.crypto_aquistion_data.data_set['CRO']), 4)
+
+    def test_process_data_skips_invalid_rows(self):
+        raw_data = SimplePurchaseData.as_raw() + [
+            ["2021-13-30 10:24:33", "ADA -> EUR", "ADA", "-100.0", "EUR",
+                "200.0", "EUR", "200.0", "220.0", "crypto_viban_exchange",],
+            [],
+        ]
+        taxable_profit = self.profit_calculator.process_data(raw_data)
+        self.assertEqual(taxable_profit, 0.0)
+        self.assertEqual(len(self.profit_calculator.crypto_aquistion_data.data_set['ADA']), 2)
+
+    def test_process_data_with_exempt_sale(self):
+        crypto_sale_data = [
+            ["2021-12-06 14:01:56", "CRO -> EUR", "CRO", "-100.0", "EUR",
+                "30.0", "EUR", "30.0", "33.0", "crypto_viban_exchange",],
+            ["2022-06-01 10:24:33", "ADA -> EUR", "ADA", "-250.0", "EUR",
+                "500.0", "EUR", "500.0", "550.0", "crypto_viban_exchange",],
+        ]
+        taxable_profit = self.profit_calculator.process_data(
+            SimplePurchaseData.as_raw() + crypto_sale_data)
+        # CRO: 30 - 10; ADA: the 200 ADA bought on 2021-05-20 for 300 Euro are exempt
+        # and receive 4/5 of the proceeds, 50 ADA bought on 2021-06-27 are taxable
+        self.assertAlmostEqual(taxable_profit, 20.0 + 50.0)
+        self.assertAlmostEqual(self.profit_calculator.exempt_profit, 100.0)
+        profits_per_tax_year = self.profit_calculator.ledger.profits_per_tax_year
+        self.assertEqual(sorted(profits_per_tax_year), [2021, 2022])
+        self.assertAlmostEqual(profits_per_tax_year[2021].taxable_profit, 20.0)
+        self.assertEqual(profits_per_tax_year[2021].exempt_profit, 0.0)
+        self.assertAlmostEqual(profits_per_tax_year[2022].taxable_profit, 50.0)
+        self.assertAlmostEqual(profits_per_tax_year[2022].exempt_profit, 100.0)
+        self.assertEqual(self.profit_calculator.get_tax_year_report().splitlines()[1:], [
+            "2021                     20.00                0.00",
+            "2022                     50.00              100.00"])
+
+    def test_sale_ranges_of_a_rollup(self):
+        rollup = TaxYearCurrencyRollup()
+        for sale in (0, 1, 2, 5, 7, 8):
+            rollup.add_sale(sale)
+        self.assertEqual(rollup.number_of_sales, 6)
+        self.assertEqual(rollup.sale_ranges, [[0, 2], [5, 5], [7, 8]])
+        self.assertEqual(list(rollup.get_sales()), [0, 1, 2, 5, 7, 8])
+
+    def test_rollups_per_tax_year_and_currency(self):
+        crypto_sale_data = [
+            ["2021-12-06 14:01:56", "CRO -> EUR", "CRO", "-100.0", "EUR",
+                "30.0", "EUR", "30.0", "33.0", "crypto_viban_exchange",],
+            ["2022-06-01 10:24:33", "ADA -> EUR", "ADA", "-250.0", "EUR",
+                "500.0", "EUR", "500.0", "550.0", "crypto_viban_exchange",],
+            ["2023-01-02 10:00:00", "CRO -> EUR", "CRO", "-100.0", "EUR",
+                "40.0", "EUR", "40.0", "44.0", "crypto_viban_exchange",],
+        ]
+        self.profit_calculator.process_data(SimplePurchaseData.as_raw() + crypto_sale_data)
+        rollups = self.profit_calculator.ledger.rollups
+        self.assertEqual(sorted(rollups), [(2021, "CRO"), (2022, "ADA"), (2023, "CRO")])
+        ada_rollup = rollups[(2022, "ADA")]
+        self.assertAlmostEqual(ada_rollup.proceeds, 500.0)
+        # 200 ADA bought for 300 Euro and 50 ADA of those bought for 150 Euro
+        self.assertAlmostEqual(ada_rollup.cost_basis, 350.0)
+        self.assertAlmostEqual(ada_rollup.taxable_profit, 50.0)
+        self.assertAlmostEqual(ada_rollup.exempt_profit, 100.0)
+        self.assertEqual(ada_rollup.number_of_sales, 1)
+        self.assertEqual(ada_rollup.sale_ranges, [[1, 1]])
+        self.assertEqual(self.profit_calculator.ledger.number_of_sales, 3)
+        self.assertEqual(self.profit_calculator.get_rollup_rows(2022, 2023), [
+            (2022, "ADA", 1, "500.00", "350.00", "50.00", "100.00"),
+            (2023, "CRO", 1, "40.00", "10.00", "0.00", "30.00")])
+        self.assertEqual(self.profit_calculator.get_tax_year_rows(2021, 2022), [
+            (2021, "20.00", "0.00"), (2022, "50.00", "100.00")])
+
+    @staticmethod
+    def get_testdata_of_a_sale_of_two_lots():
+        return [
+            ["2021-01-01 10:00:00", "EUR -> ADA", "EUR", "-10.0", "ADA",
+                "0.1", "EUR", "10.0", "12.0", "viban_purchase",],
+            ["2021-01-02 10:00:00", "EUR -> ADA", "EUR", "-20.0", "ADA",
+                "0.2", "EUR", "20.0", "24.0", "viban_purchase",],
+            ["2021-03-01 10:00:00", "ADA -> EUR", "ADA", "-0.3", "EUR",
+                "36.0", "EUR", "36.0", "40.0", "crypto_viban_exchange",],
+        ]
+
+    def test_float_residue_of_a_sale(self):
+        for engine in crypto_tax_report.ENGINES:
+            with self.subTest(engine=engine):
+                profit_calculator = crypto_tax_report.get_profit_calculator(engine)
+                diagnostics = crypto_tax_report.Diagnostics()
+                profit_calculator.set_diagnostics(diagnostics)
+                # 0.1 + 0.2 - 0.3 leaves a residue of the float arithmetic
+                profit_calculator.process_data(
+                    ProfitCalculatorTest.get_testdata_of_a_sale_of_two_lots())
+                self.assertEqual(profit_calculator.get_tax_year_rows(), [(2021, "6.00", "0.00")])
+                self.assertEqual(diagnostics.events, {})
+                self.assertEqual(
+                    len(profit_calculator.crypto_aquistion_data.data_set.get("ADA", ())), 0)
+
+    def test_sale_of_unavailable_assets_skips_the_row(self):
+        raw_data = ProfitCalculatorTest.get_testdata_of_a_sale_of_two_lots()
+        # the second sale consumes the purchase before it and more than it, the
+        # third one is taken from the last purchase
+        raw_data += [
+            ["2021-04-01 10:00:00", "EUR -> ADA", "EUR", "-20.0", "ADA",
+                "0.2", "EUR", "20.0", "24.0", "viban_purchase",],
+            ["2021-05-01 10:00:00", "ADA -> EUR", "ADA", "-0.3", "EUR",
+                "36.0", "EUR", "36.0", "40.0", "crypto_viban_exchange",],
+            ["2021-06-01 10:00:00", "EUR -> ADA", "EUR", "-20.0", "ADA",
+                "0.2", "EUR", "20.0", "24.0", "viban_purchase",],
+            ["2021-07-01 10:00:00", "ADA -> EUR", "ADA", "-0.1", "EUR",
+                "16.0", "EUR", "16.0", "17.6", "crypto_viban_exchange",],
+        ]
+        for engine in crypto_tax_report.ENGINES:
+            with self.subTest(engine=engine):
+                profit_calculator = crypto_tax_report.get_profit_calculator(engine)
+                diagnostics = crypto_tax_report.Diagnostics()
+                profit_calculator.set_diagnostics(diagnostics)
+                profit_calculator.process_data(raw_data)
+                self.assertEqual(profit_calculator.get_tax_year_rows(),
+                                 [(2021, "12.00", "0.00")])
+                self.assertEqual(diagnostics.events, {("Skipped row", "ADA"): 1})
+                self.assertEqual(
+                    len(profit_calculator.crypto_aquistion_data.data_set["ADA"]), 1)
+
+    def test_sale_of_an_unknown_currency(self):
+        raw_data = [
+            ["2021-01-01 10:00:00", "XRP -> EUR", "XRP", "-10.0", "EUR",
+                "5.5", "EUR", "5.5", "6.0", "crypto_viban_exchange",],
+            ["2021-01-02 10:00:00", "EUR -> XRP", "EUR", "-20.0", "XRP",
+                "10.0", "EUR", "20.0", "24.0", "viban_purchase",],
+            ["2021-01-03 10:00:00", "XRP -> EUR", "XRP", "-5.0", "EUR",
+                "11.0", "EUR", "11.0", "12.1", "crypto_viban_exchange",],
+            ["2021-01-04 10:00:00", "DOT -> EUR", "DOT", "-10.0", "EUR",
+                "5.5", "EUR", "5.5", "6.0", "crypto_viban_exchange",],
+        ]
+        for engine in crypto_tax_report.ENGINES:
+            with self.subTest(engine=engine):
+                profit_calculator = crypto_tax_report.get_profit_calculator(engine)
+                diagnostics = crypto_tax_report.Diagnostics()
+                profit_calculator.set_diagnostics(diagnostics)
+                profit_calculator.process_data(raw_data)
+                # the full proceeds of a sale before the first acquisition are taxable
+                self.assertEqual(profit_calculator.get_rollup_rows(), [
+                    (2021, "DOT", 1, "5.50", "0.00", "5.50", "0.00"),
+                    (2021, "XRP", 2, "16.50", "10.00", "6.50", "0.00")])
+                self.assertEqual(diagnostics.events, {
+                    ("Removal without an acquisition", "XRP"): 1,
+                    ("Removal without an acquisition", "DOT"): 1})
+                self.assertEqual(
+                    len(profit_calculator.crypto_aquistion_data.data_set["XRP"]), 1)
+
+    def test_parse_tax_years(self):
+        self.assertEqual(crypto_tax_report.parse_tax_years("2022"), (2022, None))
+        self.assertEqual(crypto_tax_report.parse_tax_years("2021-2023"), (2021, 2023))
+        with self.assertRaises(ValueError):
+            crypto_tax_report.parse_tax_years("2021-")
+
+
+class RewardTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    @staticmethod
+    def get_reward_data():
+        return [
+            ["2021-03-01 08:00:00", "CRO Stake Rewards", "CRO", "10.0", "", "", "EUR",
+                "1.5", "1.8", "crypto_earn_interest_paid",],
+            # a reverted cashback has a negative amount and is ignored
+            ["2021-03-02 08:00:00", "Card Cashback", "CRO", "-2.0", "", "", "EUR",
+                "-0.3", "-0.36", "reimbursement_reverted",],
+            ["2021-04-01 10:00:00", "CRO -> EUR", "CRO", "-10.0", "EUR",
+                "3.0", "EUR", "3.0", "3.6", "crypto_viban_exchange",],
+        ]
+
+    def test_rewards_are_acquisitions_at_zero_cost(self):
+        for engine in crypto_tax_report.ENGINES:
+            with self.subTest(engine=engine):
+                profit_calculator = crypto_tax_report.get_profit_calculator(engine)
+                profit_calculator.process_data(RewardTest.get_reward_data())
+                # the full proceeds of the sale of the rewards are taxable
+                self.assertEqual(profit_calculator.get_tax_year_rows(),
+                                 [(2021, "3.00", "0.00")])
+                self.assertEqual(
+                    len(profit_calculator.crypto_aquistion_data.data_set.get("CRO", ())), 0)
+
+    def test_reward_at_market_value(self):
+        profit_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        profit_calculator.reward_treatments = {
+            "CRO Stake Rewards": crypto_tax_report.RewardTreatment(
+                at_market_value=True, tax_policy=crypto_tax_report.TaxPolicy.EXEMPT)}
+        profit_calculator.process_data(RewardTest.get_reward_data())
+        # the reward is bought at 1.5 Euro and its sale is exempt, the reverted
+        # cashback is not a reward of this dispatch table and dropped as well
+        self.assertEqual(profit_calculator.taxable_profit, 0.0)
+        self.assertAlmostEqual(profit_calculator.exempt_profit, 1.5)
+
+    def test_get_reward_record_of_a_reverted_reward(self):
+        with self.assertRaises(ValueError):
+            crypto_tax_report.get_reward_record_from_raw_data_entry(
+                RewardTest.get_reward_data()[1], crypto_tax_report.ZERO_COST_REWARD)
+
+
+class LotCompactionTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    @staticmethod
+    def get_staking_data(number_of_days=800):
+        raw_data = []
+        first_day = datetime.datetime(2021, 1, 1)
+        for day in range(number_of_days):
+            date = first_day + datetime.timedelta(days=day)
+            for hour in (6, 12, 18):
+                if hour == 12 and day % 10 == 0:
+                    raw_data.append([f"{date:%Y-%m-%d} 09:00:00", "EUR -> SOL", "EUR", "-20.0",
+                                     "SOL", "1.0", "EUR", "20.0", "24.0", "viban_purchase",])
+                raw_data.append([f"{date:%Y-%m-%d} {hour:02d}:00:00", "Staking Rewards", "SOL",
+                                 f"{0.01 * (1 + day % 7) + hour / 1000:.6f}", "", "", "EUR",
+                                 "0.5", "0.6", "crypto_earn_interest_paid",])
+                if hour == 12 and day % 30 == 29:
+                    raw_data.append([f"{date:%Y-%m-%d} 12:30:00", "SOL -> EUR", "SOL", "-1.25",
+                                     "EUR", "45.0", "EUR", "45.0", "54.0",
+                                     "crypto_viban_exchange",])
+        return raw_data
+
+    def test_same_profits_with_fewer_lots(self):
+        raw_data = LotCompactionTest.get_staking_data()
+        for engine in ("serial", "compact", "fixed-point", "parallel"):
+            with self.subTest(engine=engine):
+                reference_calculator = crypto_tax_report.get_profit_calculator(engine)
+                reference_calculator.process_data(raw_data)
+                profit_calculator = crypto_tax_report.get_profit_calculator(engine)
+                profit_calculator.set_lot_compaction()
+                profit_calculator.process_data(raw_data)
+                # the rewards of each day are merged, unless a buy is in between
+                number_of_lots = len(profit_calculator.crypto_aquistion_data.data_set["SOL"])
+                self.assertLess(
+                    2 * number_of_lots,
+                    len(reference_calculator.crypto_aquistion_data.data_set["SOL"]))
+                self.assertNotEqual(profit_calculator.exempt_profit, 0)
+                # only the order of the float additions differs, integers are exact
+                places = 0 if engine == "fixed-point" else 9
+                for tax_year, profit in reference_calculator.ledger.profits_per_tax_year.items():
+                    compacted_profit = profit_calculator.ledger.profits_per_tax_year[tax_year]
+                    self.assertAlmostEqual(compacted_profit.taxable_profit,
+                                           profit.taxable_profit, places=places)
+                    self.assertAlmostEqual(compacted_profit.exempt_profit,
+                                           profit.exempt_profit, places=places)
+                for key, rollup in reference_calculator.ledger.rollups.items():
+                    self.assertAlmostEqual(profit_calculator.ledger.rollups[key].cost_basis,
+                                           rollup.cost_basis, places=places)
+
+    def test_rewards_of_different_days_are_not_merged(self):
+        raw_data = [
+            ["2021-01-10 12:00:00", "Staking Rewards", "SOL", "0.5", "", "", "EUR", "10.0",
+             "12.0", "crypto_earn_interest_paid",],
+            ["2021-01-15 12:00:00", "Staking Rewards", "SOL", "0.5", "", "", "EUR", "10.0",
+             "12.0", "crypto_earn_interest_paid",],
+            # only the reward of 2021-01-10 has been held for more than a year
+            ["2022-01-12 12:00:00", "SOL -> EUR", "SOL", "-0.5", "EUR", "50.0", "EUR", "50.0",
+             "60.0", "crypto_viban_exchange",],
+        ]
+        profit_calculator = crypto_tax_report.get_profit_calculator("serial")
+        profit_calculator.set_lot_compaction()
+        profit_calculator.process_data(raw_data)
+        self.assertEqual(profit_calculator.taxable_profit, 0.0)
+        self.assertAlmostEqual(profit_calculator.exempt_profit, 50.0)
+        self.assertEqual(len(profit_calculator.crypto_aquistion_data.data_set["SOL"]), 1)
+
+    def test_only_lots_of_the_same_day_price_and_tax_policy_are_merged(self):
+        crypto_aquisition_data = crypto_tax_report.CryptoAquisitionData()
+        crypto_aquisition_data.lot_policy.compact_lots = True
+        for acquisition_record in [
+                CryptoAcquisitionRecord(datetime.datetime(2021, 1, 1, 6), 1.0, 0.0),
+                CryptoAcquisitionRecord(datetime.datetime(2021, 1, 1, 12), 2.0, 0.0),
+                # a different price per unit
+                CryptoAcquisitionRecord(datetime.datetime(2021, 1, 1, 13), 1.0, 10.0),
+                CryptoAcquisitionRecord(datetime.datetime(2021, 1, 1, 14), 3.0, 30.0),
+                # a different tax policy
+                CryptoAcquisitionRecord(datetime.datetime(2021, 1, 1, 15), 1.0, 10.0,
+                                        crypto_tax_report.TaxPolicy.EXEMPT),
+                # the next day
+                CryptoAcquisitionRecord(datetime.datetime(2021, 1, 2, 1), 1.0, 10.0,
+                                        crypto_tax_report.TaxPolicy.EXEMPT),
+                # an older acquisition is inserted at its position
+                CryptoAcquisitionRecord(datetime.datetime(2021, 1, 1, 16), 1.0, 10.0,
+                                        crypto_tax_report.TaxPolicy.EXEMPT)]:
+            crypto_aquisition_data.add_record("SOL", acquisition_record)
+        # the merged lots keep the time stamp of their first acquisition
+        self.assertEqual(list(crypto_aquisition_data.data_set["SOL"]), [
+            CryptoAcquisitionRecord(datetime.datetime(2021, 1, 1, 6), 3.0, 0.0),
+            CryptoAcquisitionRecord(datetime.datetime(2021, 1, 1, 13), 4.0, 40.0),
+            CryptoAcquisitionRecord(datetime.datetime(2021, 1, 1, 15), 1.0, 10.0,
+                                    crypto_tax_report.TaxPolicy.EXEMPT),
+            CryptoAcquisitionRecord(datetime.datetime(2021, 1, 1, 16), 1.0, 10.0,
+                                    crypto_tax_report.TaxPolicy.EXEMPT),
+            CryptoAcquisitionRecord(datetime.datetime(2021, 1, 2, 1), 1.0, 10.0,
+                                    crypto_tax_report.TaxPolicy.EXEMPT)])
+
+
+class CurrencyRegistryTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def test_codes_of_the_known_currencies(self):
+        registry = crypto_tax_report.CurrencyRegistry()
+        self.assertEqual(registry.get_code(""), 0)
+        for currency in crypto_tax_report.Currency:
+            self.assertEqual(registry.get_code(currency.name), currency.value)
+            self.assertEqual(registry.get_name(currency.value), currency.name)
+
+    def test_registration_of_an_unknown_currency(self):
+        registry = crypto_tax_report.CurrencyRegistry()
+        number_of_codes = len(registry)
+        code = registry.get_code("BTC")
+        self.assertEqual(code, number_of_codes)
+        self.assertEqual(registry.get_code("BTC"), code)
+        self.assertEqual(registry.get_name(code), "BTC")
+        self.assertEqual(len(registry), number_of_codes + 1)
+
+    def test_currency_lot_map(self):
+        lot_map = crypto_tax_report.CurrencyLotMap(crypto_tax_report.CurrencyRegistry())
+        ada_records = crypto_tax_report.CryptoAcquisitionRecordQueue()
+        btc_records = crypto_tax_report.CryptoAcquisitionRecordQueue()
+        lot_map["BTC"] = btc_records
+        lot_map["ADA"] = ada_records
+        self.assertEqual(len(lot_map), 2)
+        self.assertIn("BTC", lot_map)
+        self.assertNotIn("ETH", lot_map)
+        self.assertNotIn("XYZ", lot_map)
+        self.assertIs(lot_map.get_lots(crypto_tax_report.Currency.ADA.value), ada_records)
+        self.assertEqual(lot_map, {"ADA": ada_records, "BTC": btc_records})
+        self.assertEqual(pickle.loads(pickle.dumps(lot_map)),
+                         {"ADA": ada_records, "BTC": btc_records})
+        self.assertIs(lot_map.pop("BTC"), btc_records)
+        self.assertEqual(list(lot_map), ["ADA"])
+        with self.assertRaises(KeyError):
+            lot_map["BTC"]  # pylint: disable=pointless-statement
+
+    def test_process_data_of_an_unknown_currency(self):
+        profit_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        taxable_profit = profit_calculator.process_data([
+            ["2021-03-01 10:00:00", "EUR -> NEWCOIN", "EUR", "-100.0", "NEWCOIN", "10.0",
+             "EUR", "100.0", "120.0", "viban_purchase"],
+            ["2021-04-01 10:00:00", "NEWCOIN -> EUR", "NEWCOIN", "-5.0", "EUR", "80.0",
+             "EUR", "80.0", "96.0", "crypto_viban_exchange"]])
+        self.assertAlmostEqual(taxable_profit, 30.0)
+        self.assertEqual(
+            len(profit_calculator.crypto_aquistion_data.data_set["NEWCOIN"]), 1)
+
+    def test_copies_of_the_acquisition_data(self):
+        crypto_acquisition_data = SimplePurchaseData.as_crypto_acquisition_data()
+        ada_purchase = SimplePurchaseData.as_raw()[2]
+        for acquisition_data_copy in (copy.deepcopy(crypto_acquisition_data),
+                                      pickle.loads(pickle.dumps(crypto_acquisition_data))):
+            self.assertIsInstance(acquisition_data_copy.data_set,
+                                  crypto_tax_report.CurrencyLotMap)
+            self.assertEqual(acquisition_data_copy.data_set, crypto_acquisition_data.data_set)
+            acquisition_data_copy.add(ada_purchase)
+            self.assertEqual(len(acquisition_data_copy.data_set["ADA"]),
+                             len(crypto_acquisition_data.data_set["ADA"]) + 1)
+
+    def test_replaced_data_set(self):
+        crypto_acquisition_data = crypto_tax_report.CryptoAquisitionData()
+        data_set = SimplePurchaseData.as_crypto_acquisition_data().data_set
+        # e.g. a snapshot or the parallel processing replace the data set
+        crypto_acquisition_data.data_set = data_set
+        crypto_acquisition_data.add(SimplePurchaseData.as_raw()[2])
+        self.assertIs(crypto_acquisition_data.data_set, data_set)
+        self.assertEqual(len(data_set["ADA"]),
+                         len(SimplePurchaseData.as_crypto_acquisition_data().data_set["ADA"]) + 1)
+
+
+def get_raw_data_with_diagnostics():
+    """
+    Return the simple purchases followed by a sale of unknown XRP, a purchase
+    with an invalid amount and a row, which cannot be processed.
+    """
+    return SimplePurchaseData.as_raw() + [
+        ["2021-12-06 14:01:56", "XRP -> EUR", "XRP", "-10.0", "EUR",
+            "3.0", "EUR", "3.0", "3.3", "crypto_viban_exchange",],
+        ["2021-12-07 14:01:56", "EUR -> XRP", "EUR", "-3.0", "XRP",
+            "ten", "EUR", "3.0", "3.3", "crypto_viban_exchange",],
+        ["2021-12-08 14:01:56", "ADA -> EUR"],
+    ]
+
+
+class DiagnosticsTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+        self.profit_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        self.raw_data = get_raw_data_with_diagnostics()
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def test_aggregated_diagnostics(self):
+        diagnostics = crypto_tax_report.Diagnostics()
+        self.profit_calculator.set_diagnostics(diagnostics)
+        with self.assertNoLogs(level="WARNING"):
+            self.profit_calculator.process_data(self.raw_data + self.raw_data[-3:])
+        self.assertEqual(diagnostics.events, {
+            ("Removal without an acquisition", "XRP"): 2,
+            ("Ignored acquisition with an invalid value", "XRP"): 2,
+            ("Skipped row", ""): 2,
+        })
+        with self.assertLogs(level="WARNING") as captured_logs:
+            diagnostics.report()
+        self.assertEqual(len(captured_logs.records), 3)
+        self.assertIn("Removal without an acquisition: 2 times for the crypto currency XRP.",
+                      captured_logs.output[1])
+        # the aggregated events keep the level of the logged events
+        self.assertEqual([record.levelname for record in captured_logs.records],
+                         ["ERROR", "ERROR", "ERROR"])
+
+    def test_merge_diagnostics(self):
+        diagnostics = crypto_tax_report.Diagnostics()
+        diagnostics.count("Acquisition after the removal date", "ADA")
+        worker_diagnostics = crypto_tax_report.Diagnostics()
+        worker_diagnostics.count("Acquisition after the removal date", "ADA")
+        worker_diagnostics.count("Skipped row", "CRO", logging.ERROR)
+        diagnostics.update(worker_diagnostics)
+        self.assertEqual(diagnostics.events, {
+            ("Acquisition after the removal date", "ADA"): 2,
+            ("Skipped row", "CRO"): 1,
+        })
+        with self.assertLogs(level="WARNING") as captured_logs:
+            diagnostics.report()
+        self.assertEqual([record.levelname for record in captured_logs.records],
+                         ["WARNING", "ERROR"])
+
+    def test_events_are_logged_without_diagnostics(self):
+        with self.assertLogs(level="WARNING") as captured_logs:
+            self.profit_calculator.process_data(self.raw_data)
+        self.assertEqual([record.levelname for record in captured_logs.records],
+                         ["ERROR", "ERROR", "ERROR"])
+
+    def test_acquisition_after_the_removal_date(self):
+        crypto_aquisition_data = self.profit_calculator.crypto_aquistion_data
+        diagnostics = crypto_tax_report.Diagnostics()
+        crypto_aquisition_data.set_diagnostics(diagnostics)
+        for item in SimplePurchaseData.as_raw():
+            crypto_aquisition_data.add(item)
+        # the second acquisition of ADA is dated after the sale
+        with self.assertRaises(ValueError):
+            crypto_aquisition_data.remove(
+                ["2021-06-01 10:24:33", "ADA -> EUR", "ADA", "-250.0", "EUR",
+                 "300.0", "EUR", "300.0", "330.0", "crypto_viban_exchange",])
+        self.assertEqual(diagnostics.events,
+                         {("Acquisition after the removal date", "ADA"): 1})
+
+
+class ExportProfileTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def test_process_data(self):
+        crypto_sale_data, _ = CryptoAquisitionDataTest.get_testdata_for_crypto_sale()
+        raw_data = [ProfitCalculatorTest.get_header()] + crypto_sale_data[::-1] + \
+            SimplePurchaseData.as_raw() + [[]]
+        export_profile = crypto_tax_report.ExportProfile().process_data(iter(raw_data))
+        self.assertEqual(export_profile.profiled_rows, len(raw_data) - 2)
+        self.assertEqual(export_profile.skipped_rows, 2)
+        self.assertEqual(export_profile.first_date_time, min(
+            crypto_tax_report.get_date_time_object(row[0]) for row in raw_data[1:-1]))
+        self.assertEqual(export_profile.last_date_time, max(
+            crypto_tax_report.get_date_time_object(row[0]) for row in raw_data[1:-1]))
+        self.assertEqual(sum(export_profile.transaction_kinds.values()), len(raw_data) - 2)
+        # every row involves Euro and one crypto currency
+        self.assertEqual(export_profile.currencies["EUR"], len(raw_data) - 2)
+        self.assertEqual(sum(export_profile.currencies.values()), 2 * (len(raw_data) - 2))
+        report = export_profile.get_report()
+        self.assertIn(f"Rows: {len(raw_data) - 2} (2 skipped)", report)
+        self.assertIn("Currencies:", report)
+
+
+class CommandLineTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+        self.temporary_directory = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        crypto_sale_data, _ = CryptoAquisitionDataTest.get_testdata_for_crypto_sale()
+        self.file_name = os.path.join(self.temporary_directory.name, "export.csv")
+        with open(self.file_name, encoding="utf-8", mode='w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(ProfitCalculatorTest.get_header())
+            # crypto.com lists the newest transaction first
+            writer.writerows((SimplePurchaseData.as_raw() + crypto_sale_data)[::-1])
+
+    def tearDown(self) -> None:
+        self.temporary_directory.cleanup()
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def run_main(self, arguments):
+        output_file = io.StringIO()
+        with contextlib.redirect_stdout(output_file):
+            crypto_tax_report.main(["--log-level", "WARNING"] + arguments)
+        return output_file.getvalue()
+
+    def test_report(self):
+        for engine in crypto_tax_report.ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(
+                    self.run_main(["report", self.file_name, "--engine", engine,
+                                   "--format", "csv", "--tax-year", "2022"]).splitlines(),
+                    ["tax_year,taxable_profit,exempt_profit", "2022,1245.00,0.00"])
+        self.assertIn('"taxable_profit": "50.00"',
+                      self.run_main(["report", self.file_name, "--format", "json"]))
+        self.assertEqual(self.run_main(["report", self.file_name]).splitlines()[1:], [
+            "2021                     50.00                0.00",
+            "2022                   1245.00                0.00"])
+
+    def test_report_per_currency(self):
+        expected_rows = [
+            "tax_year,crypto_currency,sales,proceeds,cost_basis,taxable_profit,exempt_profit",
+            "2021,ADA,1,200.00,150.00,50.00,0.00",
+            "2022,ADA,1,200.00,175.00,25.00,0.00",
+            "2022,CRO,1,2000.00,780.00,1220.00,0.00"]
+        for engine in crypto_tax_report.ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(
+                    self.run_main(["report", self.file_name, "--engine", engine, "--format",
+                                   "csv", "--tax-year", "2021-2022", "--per-currency"]
+                                  ).splitlines(), expected_rows)
+        self.assertEqual(
+            self.run_main(["report", self.file_name, "--per-currency", "--tax-year",
+                           "2022"]).splitlines()[1:],
+            ["2022      ADA              1          200.00          175.00"
+             "               25.00                0.00",
+             "2022      CRO              1         2000.00          780.00"
+             "             1220.00                0.00"])
+
+    def test_report_with_audit_trail(self):
+        audit_file_name = os.path.join(self.temporary_directory.name, "audit.jsonl")
+        self.run_main(["report", self.file_name, "--audit-trail", audit_file_name,
+                       "--audit-format", "jsonl"])
+        with open(audit_file_name, encoding="utf-8") as audit_file:
+            audit_rows = [json.loads(line) for line in audit_file]
+        # the last sale of CRO consumes two acquisitions
+        self.assertEqual([audit_row["sale"] for audit_row in audit_rows], [0, 1, 1, 2, 2])
+
+    def test_report_rejects_an_audit_trail_of_the_batch_engine(self):
+        audit_file_name = os.path.join(self.temporary_directory.name, "audit.csv")
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            self.run_main(["report", self.file_name, "--engine", "batch",
+                           "--audit-trail", audit_file_name])
+        self.assertFalse(os.path.exists(audit_file_name))
+
+    def test_report_with_lot_compaction(self):
+        for engine in crypto_tax_report.ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(
+                    self.run_main(["report", self.file_name, "--engine", engine,
+                                   "--format", "csv", "--compact-lots"]).splitlines(),
+                    ["tax_year,taxable_profit,exempt_profit", "2021,50.00,0.00",
+                     "2022,1245.00,0.00"])
+
+    def test_report_with_snapshot(self):
+        # a snapshot requires the rows in chronological order
+        crypto_sale_data, _ = CryptoAquisitionDataTest.get_testdata_for_crypto_sale()
+        raw_data = sorted(SimplePurchaseData.as_raw() + crypto_sale_data)
+        snapshot_file_name = os.path.join(self.temporary_directory.name, "snapshot.json.gz")
+        for number_of_rows in (5, len(raw_data)):
+            with open(self.file_name, encoding="utf-8", mode='w', newline='') as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(ProfitCalculatorTest.get_header())
+                writer.writerows(raw_data[:number_of_rows])
+            rows = self.run_main(["report", self.file_name, "--format", "csv",
+                                  "--snapshot", snapshot_file_name]).splitlines()
+        # the second run resumes from the snapshot and only processes the new rows
+        self.assertEqual(rows, self.run_main(
+            ["report", self.file_name, "--format", "csv"]).splitlines())
+        self.assertEqual(rows[1:], ["2021,50.00,0.00", "2022,1245.00,0.00"])
+
+    def test_profile(self):
+        self.assertIn("Rows: 8 (1 skipped)", self.run_main(["profile", self.file_name]))
+
+    def test_get_profit_calculator_of_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            crypto_tax_report.get_profit_calculator("unknown")
+
+    def test_optional_engines_are_imported_lazily(self):
+        modules = subprocess.run(
+            [sys.executable, "-c", "import sys, crypto_tax_report; print(*sys.modules)"],
+            cwd=os.path.dirname(os.path.abspath(crypto_tax_report.__file__)),
+            capture_output=True, check=True, text=True).stdout.split()
+        for module in ["numpy", "concurrent.futures", "batch_engine", "parallel_processing"]:
+            self.assertNotIn(module, modules)
+
+
 if __name__ == '__main__':
     unittest.main()
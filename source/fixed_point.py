@@ -0,0 +1,264 @@
+#!/usr/bin/python3
+
+"""
+The module provides an exact fixed-point mode for the FIFO matching. Amounts of crypto
+currency are kept as integers in the smallest unit of the currency, i.e. scaled by its
+number of decimals on chain, and Euro amounts as integers in cents. The matching only
+uses integer arithmetic, so a lot is removed exactly when it has been sold completely:
+there is no need for the 0.99999 threshold of the float mode and no dust lots remain.
+The cost of a partially sold lot is split by rounding the pro-rata share of the sold
+amount to a cent and keeping the remainder in the lot, so the costs of all parts of a
+lot always add up to its cost. Python integers are used instead of decimal.Decimal,
+since they are exact as well and considerably faster.
+"""
+
+import decimal
+import logging
+
+from acquisition_lots import (
+    CryptoAcquisitionRecord, CryptoAcquisitionRecordRemover, CryptoAquisitionData, Currency,
+    Disposal, Heading, get_date_time_object)
+from profit_calculator import ProfitCalculator
+
+logger = logging.getLogger(__name__)
+
+# number of decimals of the smallest unit of each currency
+CURRENCY_DECIMALS = {
+    Currency.CRO: 8,
+    Currency.SOL: 9,
+    Currency.ADA: 6,
+    Currency.DOT: 10,
+    Currency.USDT: 6,
+    Currency.ETH: 18,
+    Currency.ATOM: 6,
+    Currency.XRP: 6,
+    Currency.LINK: 18,
+    Currency.VVS: 18,
+    Currency.MANA: 18,
+    Currency.ELON: 18,
+    Currency.EUR: 2,
+}
+CURRENCY_DECIMALS_BY_NAME = {
+    currency.name: decimals for currency, decimals in CURRENCY_DECIMALS.items()}
+# number of decimals of crypto currencies, which are not an element of Currency
+DEFAULT_DECIMALS = 18
+NATIVE_CURRENCY_DECIMALS = CURRENCY_DECIMALS[Currency.EUR]
+
+
+def get_currency_decimals(currency):
+    """
+    Return the number of decimals of the smallest unit of the currency with
+    the given name.
+    """
+    return CURRENCY_DECIMALS_BY_NAME.get(currency, DEFAULT_DECIMALS)
+
+
+def parse_fixed_point(amount_as_string, decimals):
+    """
+    Function for converting a decimal string to an integer in units of
+    10**-decimals without the detour via float, e.g. '-1.5' with 2 decimals
+    is converted to -150. Digits beyond the given number of decimals are
+    rounded half to even. If the conversion is not possible a ValueError is
+    thrown.
+    """
+    integer_digits, _, fraction_digits = amount_as_string.partition('.')
+    if (len(fraction_digits) <= decimals and (fraction_digits.isdigit() or (
+            not fraction_digits and integer_digits[-1:].isdigit()))):
+        try:
+            return int(integer_digits + fraction_digits.ljust(decimals, '0'))
+        except ValueError:
+            pass
+    # exponents and surplus digits are rare and left to decimal.Decimal
+    try:
+        amount = decimal.Decimal(amount_as_string)
+    except decimal.InvalidOperation:
+        amount = None
+    if amount is None or not amount.is_finite():
+        raise ValueError(f"Invalid decimal number: '{amount_as_string}'")
+    return int(amount.scaleb(decimals).quantize(1, rounding=decimal.ROUND_HALF_EVEN))
+
+
+def format_fixed_point(amount, decimals):
+    """Convert an integer in units of 10**-decimals to a decimal string."""
+    return str(to_decimal(amount, decimals))
+
+
+def to_decimal(amount, decimals):
+    """Convert an integer in units of 10**-decimals to a decimal.Decimal."""
+    return decimal.Decimal(amount).scaleb(-decimals)
+
+
+def get_pro_rata_share(total, part, whole):
+    """
+    Return total * part / whole rounded half up to an integer, with integer
+    arithmetic only.
+    """
+    return (2 * total * part + whole) // (2 * whole)
+
+
+def get_fixed_point_acquisition_record_from_raw_data_entry(raw_data_entry, date_time=None):
+    """
+    Functon to convert a list, obtained from reading in a data row in crypto.com's
+    csv file, to an object of type CryptoAquisitionRecord, whose amount is given in
+    the smallest unit of the acquired crypto currency and whose Euro amount is
+    given in cents.
+    """
+    if date_time is None:
+        date_time = get_date_time_object(raw_data_entry[Heading.TIMESTAMP.value])
+    crypto_amount = parse_fixed_point(
+        raw_data_entry[Heading.TARGET_AMOUNT.value],
+        get_currency_decimals(raw_data_entry[Heading.TARGET_CURRENCY.value]))
+    euro_amount = parse_fixed_point(
+        raw_data_entry[Heading.NATIVE_CURRENCY_AMOUNT.value], NATIVE_CURRENCY_DECIMALS)
+    return CryptoAcquisitionRecord(date_time, crypto_amount, euro_amount)
+
+
+def get_fixed_point_reward_record_from_raw_data_entry(raw_data_entry, reward_treatment,
+                                                      date_time=None):
+    """
+    Function to convert a data row of a reward in crypto.com's csv file to an
+    object of type CryptoAquisitionRecord with integer amounts, the cost basis
+    and the tax policy of the given RewardTreatment. Raises a ValueError for an
+    amount, which is not positive.
+    """
+    if date_time is None:
+        date_time = get_date_time_object(raw_data_entry[Heading.TIMESTAMP.value])
+    crypto_amount = parse_fixed_point(
+        raw_data_entry[Heading.SOURCE_AMOUNT.value],
+        get_currency_decimals(raw_data_entry[Heading.SOURCE_CURRENCY.value]))
+    if crypto_amount <= 0:
+        raise ValueError(f"The amount {crypto_amount} of a reward is not positive.")
+    euro_amount = 0
+    if reward_treatment.at_market_value:
+        euro_amount = abs(parse_fixed_point(
+            raw_data_entry[Heading.NATIVE_CURRENCY_AMOUNT.value], NATIVE_CURRENCY_DECIMALS))
+    return CryptoAcquisitionRecord(date_time, crypto_amount, euro_amount,
+                                   reward_treatment.tax_policy)
+
+
+class FixedPointAcquisitionRecordRemover(CryptoAcquisitionRecordRemover):
+    """
+    CryptoAcquisitionRecordRemover for acquisition records with integer amounts.
+    A record is only popped, if it has been consumed completely. A partially
+    consumed record is reduced in place. Upon being called it returns the cents
+    at which the removed amount of crypto currency has been bought. Integer
+    amounts leave no residue, so any open amount raises a ValueError.
+    """
+    # pylint: disable=too-few-public-methods
+
+    relative_amount_tolerance = 0
+
+    def __init__(self, aquisition_records, amount_to_remove, removal_date_time):
+        super().__init__(aquisition_records, 0, removal_date_time)
+        self.amount_to_be_removed = abs(amount_to_remove)
+        self.disposal = Disposal(removal_date_time, self.amount_to_be_removed, 0, 0, 0)
+
+    def _is_consumed_completely(self, acquisition_record):
+        """Check whether the removal consumes the acquisition record completely."""
+        return self.amount_to_be_removed >= acquisition_record.amount
+
+    @staticmethod
+    def _get_removed_bought_at(acquisition_record, removed_amount):
+        """Return the cents at which the removed part of a partially consumed
+        acquisition record has been bought, rounded to a cent."""
+        return get_pro_rata_share(
+            acquisition_record.bought_at, removed_amount, acquisition_record.amount)
+
+
+class FixedPointAquisitionData(CryptoAquisitionData):
+    """
+    CryptoAquisitionData, whose acquisition records hold the amount in the
+    smallest unit of the crypto currency and the Euro amount in cents as
+    integers. The member functions remove and swap return cents. The arrays of
+    a CompactAcquisitionRecordQueue cannot hold integers of arbitrary size, so
+    it is not suited as record_queue_type.
+    """
+
+    def _get_acquisition_record(self, raw_data_entry, date_time=None):
+        """Convert a data row to the acquisition record of the acquired crypto
+        currency with integer amounts."""
+        return get_fixed_point_acquisition_record_from_raw_data_entry(raw_data_entry, date_time)
+
+    def _get_reward_record(self, raw_data_entry, reward_treatment, date_time=None):
+        """Convert a data row of a reward to the acquisition record of the
+        received crypto currency with integer amounts."""
+        return get_fixed_point_reward_record_from_raw_data_entry(
+            raw_data_entry, reward_treatment, date_time)
+
+    def _remove(self, raw_data_entry, date_time):
+        """Remove the amount of the source crypto currency of a data row."""
+        crypto_currency = raw_data_entry[Heading.SOURCE_CURRENCY.value]
+        return self.remove_amount(
+            crypto_currency, parse_fixed_point(raw_data_entry[Heading.SOURCE_AMOUNT.value],
+                                               get_currency_decimals(crypto_currency)),
+            date_time)
+
+    def remove_amount(self, crypto_currency, amount, date_time):
+        """Remove the given amount of a crypto currency as an integer in its
+        smallest unit, which has been sold or swapped at date_time, and return
+        the Disposal in integer units."""
+        acquisition_records = self._get_lots(crypto_currency)
+        if acquisition_records is None:
+            self._log_unknown_currency(crypto_currency)
+            return Disposal(date_time, 0, 0, 0, 0, crypto_currency)
+        amount = abs(amount)
+        if self.is_debug_enabled:
+            logger.debug(
+                "Crypto transaction: removing the amount %d "
+                "of the crypto curreny %s.", amount, crypto_currency
+            )
+        transaction_remover = FixedPointAcquisitionRecordRemover(
+            acquisition_records, amount, date_time)
+        return self._call_remover(crypto_currency, transaction_remover)
+
+
+class FixedPointProfitCalculator(ProfitCalculator): # pylint: disable=too-few-public-methods
+    """
+    ProfitCalculator for a FixedPointAquisitionData, which accumulates the
+    taxable and the exempt profit exactly as integer numbers of cents. Like
+    the other engines, process_data returns the taxable profit in Euro.
+    """
+
+    def __init__(self, crypto_aquistion_data):
+        super().__init__(crypto_aquistion_data)
+        self.taxable_profit = 0
+        self.exempt_profit = 0
+
+    def process_data(self, raw_crypto_aquisition_data):
+        """Process the data like ProfitCalculator.process_data, but return the
+        taxable profit accumulated so far in Euro as a decimal.Decimal, while
+        the profits are kept in cents."""
+        super().process_data(raw_crypto_aquisition_data)
+        return self.get_taxable_profit_in_euro()
+
+    def get_taxable_profit_in_euro(self):
+        """Return the taxable profit in Euro as a decimal.Decimal."""
+        return to_decimal(self.taxable_profit, NATIVE_CURRENCY_DECIMALS)
+
+    def _format_profit(self, profit):
+        """Format a profit in cents for the report."""
+        return format_fixed_point(profit, NATIVE_CURRENCY_DECIMALS)
+
+    def _format_amount(self, crypto_currency, amount):
+        """Format an amount in the smallest unit of the crypto currency for the
+        audit trail."""
+        return format_fixed_point(amount, get_currency_decimals(crypto_currency))
+
+    def _format_cost(self, cost):
+        """Format the cents at which a lot has been bought for the audit trail."""
+        return format_fixed_point(cost, NATIVE_CURRENCY_DECIMALS)
+
+    def _book_disposal(self, raw_data_entry, disposal):
+        """Add the profit of a sale or a swap in cents to the taxable and the
+        exempt profit. The proceeds are split in proportion to the exempt
+        amount and rounded to a cent."""
+        proceeds = abs(parse_fixed_point(
+            raw_data_entry[Heading.NATIVE_CURRENCY_AMOUNT.value], NATIVE_CURRENCY_DECIMALS))
+        exempt_proceeds = 0
+        if disposal.exempt_amount != 0:
+            exempt_proceeds = get_pro_rata_share(
+                proceeds, disposal.exempt_amount, disposal.amount)
+        self._book_profit(
+            disposal, proceeds,
+            (proceeds - exempt_proceeds) - (disposal.bought_at - disposal.exempt_bought_at),
+            exempt_proceeds - disposal.exempt_bought_at)
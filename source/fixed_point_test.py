@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+
+"""
+This file provides unit tests for the functionality within the module fixed_point.
+"""
+
+# pylint: disable=C0115,C0116
+
+import datetime
+import unittest
+import crypto_tax_report
+import crypto_tax_report_test
+import fixed_point
+from crypto_tax_report import CryptoAcquisitionRecord, CryptoAcquisitionRecordQueue, Heading, logger
+from parallel_processing_test import get_test_corpus
+
+
+class FixedPointParsingTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def test_parse_fixed_point(self):
+        for amount_as_string, decimals, expected_amount in [
+                ("1.5", 8, 150000000), ("-0.00000001", 8, -1), ("12", 2, 1200),
+                ("-300.0", 2, -30000), (".5", 1, 5), ("1e-3", 6, 1000),
+                # surplus digits are rounded half to even
+                ("1.005", 2, 100), ("1.015", 2, 102)]:
+            self.assertEqual(fixed_point.parse_fixed_point(amount_as_string, decimals),
+                             expected_amount)
+
+    def test_parse_invalid_fixed_point(self):
+        for amount_as_string in ["", ".", "-", "abc", "1.2.3", "nan", "inf"]:
+            with self.assertRaises(ValueError):
+                fixed_point.parse_fixed_point(amount_as_string, 2)
+
+    def test_format_fixed_point(self):
+        self.assertEqual(fixed_point.format_fixed_point(-150, 8), "-0.00000150")
+        self.assertEqual(fixed_point.format_fixed_point(129500, 2), "1295.00")
+
+    def test_get_currency_decimals(self):
+        self.assertEqual(fixed_point.get_currency_decimals("CRO"), 8)
+        self.assertEqual(fixed_point.get_currency_decimals("EUR"), 2)
+        self.assertEqual(fixed_point.get_currency_decimals("UNKNOWN"),
+                         fixed_point.DEFAULT_DECIMALS)
+
+
+class FixedPointAquisitionDataTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def test_no_dust_lot(self):
+        # with floats 0.3 - 0.1 - 0.2 leaves an open amount, which is not zero
+        purchase_date_time = datetime.datetime(2021, 1, 1)
+        acquisition_records = CryptoAcquisitionRecordQueue(
+            [CryptoAcquisitionRecord(purchase_date_time, 30000000, 1000)])
+        removed_crypto_bought_at = 0
+        for amount in ("0.1", "0.2"):
+            removed_crypto_bought_at += fixed_point.FixedPointAcquisitionRecordRemover(
+                acquisition_records, fixed_point.parse_fixed_point(amount, 8),
+                purchase_date_time)()
+        self.assertEqual(len(acquisition_records), 0)
+        self.assertEqual(removed_crypto_bought_at, 1000)
+
+    def test_costs_of_partial_sales_add_up(self):
+        purchase_date_time = datetime.datetime(2021, 1, 1)
+        acquisition_records = CryptoAcquisitionRecordQueue(
+            [CryptoAcquisitionRecord(purchase_date_time, 3, 100)])
+        removed_costs = [
+            fixed_point.FixedPointAcquisitionRecordRemover(
+                acquisition_records, 1, purchase_date_time)()
+            for _ in range(3)]
+        self.assertEqual(removed_costs, [33, 34, 33])
+        self.assertEqual(len(acquisition_records), 0)
+
+    def test_remove(self):
+        crypto_acquisition_data = fixed_point.FixedPointAquisitionData()
+        for item in crypto_tax_report_test.SimplePurchaseData.as_raw():
+            crypto_acquisition_data.add(item)
+        crypto_sale_data, _ = \
+            crypto_tax_report_test.CryptoAquisitionDataTest.get_testdata_for_crypto_sale()
+        removed_costs = [crypto_acquisition_data.remove(item) for item in crypto_sale_data]
+        self.assertEqual(removed_costs, [15000, 17500, 78000])
+        self.assertEqual(crypto_acquisition_data.data_set["CRO"], [
+            CryptoAcquisitionRecord(datetime.datetime(2021, 9, 13, 13, 58, 2),
+                                    120000000000, 24000),
+            CryptoAcquisitionRecord(datetime.datetime(2021, 9, 15, 13, 33, 7),
+                                    200000000000, 80000)])
+
+
+class FixedPointProfitCalculatorTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def test_process_data_of_sales(self):
+        crypto_sale_data, _ = \
+            crypto_tax_report_test.CryptoAquisitionDataTest.get_testdata_for_crypto_sale()
+        profit_calculator = fixed_point.FixedPointProfitCalculator(
+            fixed_point.FixedPointAquisitionData())
+        taxable_profit = profit_calculator.process_data(
+            crypto_tax_report_test.SimplePurchaseData.as_raw() + crypto_sale_data)
+        # the profits are kept in cents and returned in Euro like by the other engines
+        self.assertEqual(profit_calculator.taxable_profit, 129500)
+        self.assertEqual(str(taxable_profit), "1295.00")
+        self.assertEqual(taxable_profit, profit_calculator.get_taxable_profit_in_euro())
+
+    def test_reward_at_market_value(self):
+        reward_record = fixed_point.get_fixed_point_reward_record_from_raw_data_entry(
+            crypto_tax_report_test.RewardTest.get_reward_data()[0],
+            crypto_tax_report.RewardTreatment(at_market_value=True))
+        self.assertEqual((reward_record.amount, reward_record.bought_at), (1000000000, 150))
+        with self.assertRaises(ValueError):
+            fixed_point.get_fixed_point_reward_record_from_raw_data_entry(
+                crypto_tax_report_test.RewardTest.get_reward_data()[1],
+                crypto_tax_report.ZERO_COST_REWARD)
+
+    def test_same_result_as_float_processing(self):
+        raw_data = get_test_corpus(3000, seed=5)
+        # a gap of more than a year makes the sales after it partially exempt
+        for raw_data_entry in raw_data[1500:]:
+            raw_data_entry[Heading.TIMESTAMP.value] = (
+                crypto_tax_report.get_date_time_object(raw_data_entry[Heading.TIMESTAMP.value])
+                + datetime.timedelta(days=400)).strftime(crypto_tax_report.DATE_TIME_FORMAT)
+        float_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        float_calculator.process_data(raw_data)
+        profit_calculator = fixed_point.FixedPointProfitCalculator(
+            fixed_point.FixedPointAquisitionData())
+        profit_calculator.process_data(raw_data)
+        self.assertNotEqual(profit_calculator.exempt_profit, 0)
+        # every sale and swap rounds its cost basis and proceeds to a cent at most
+        self.assertAlmostEqual(float(profit_calculator.get_taxable_profit_in_euro()),
+                               float_calculator.taxable_profit, delta=0.01 * len(raw_data))
+        self.assertAlmostEqual(profit_calculator.exempt_profit / 100,
+                               float_calculator.exempt_profit, delta=0.01 * len(raw_data))
+
+
+if __name__ == '__main__':
+    unittest.main()
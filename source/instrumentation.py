@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+
+"""
+The module provides an opt-in instrumentation of a run of a ProfitCalculator, which
+counts and times the stages of the processing: reading the rows, parsing the time
+stamps, classifying the transactions and the member functions add, remove_disposal and
+swap_disposal of the CryptoAquisitionData. It also counts the acquisition records
+consumed per removal and keeps a histogram of the number of open acquisition records of
+each crypto currency. The results are summarized as a dictionary, e.g. for JSON.
+Without an Instrumentation the hooks of acquisition_lots.NullInstrumentation are used,
+which leave the processing unchanged.
+"""
+
+import collections
+import functools
+import time
+from dataclasses import dataclass
+
+from acquisition_lots import NullInstrumentation
+
+
+@dataclass(slots=True)
+class StageStatistics:
+    """The number of calls of a stage and the time spent in it."""
+    calls: int = 0
+    seconds: float = 0.0
+
+
+def get_histogram_bucket_label(bucket):
+    """
+    Return the range of counts of a histogram bucket, in which the counts
+    with the given bit length are collected, e.g. '4-7' for the bucket 3.
+    """
+    if bucket < 2:
+        return str(bucket)
+    return f"{1 << (bucket - 1)}-{(1 << bucket) - 1}"
+
+
+class Instrumentation(NullInstrumentation):
+    """
+    Hooks of the instrumentation of a run, which collect the data. The calls
+    of a wrapped function and the iteration of a wrapped iterable are timed
+    with time.perf_counter; the time of a stage includes the time of the
+    stages called from it, e.g. add includes get_date_time_object. The
+    histograms of the open acquisition records are sampled after each removal
+    and have buckets of powers of two.
+    """
+
+    def __init__(self):
+        self.stages = collections.defaultdict(StageStatistics)
+        self.consumed_records_per_removal = collections.Counter()
+        self.open_records_histograms = collections.defaultdict(collections.Counter)
+        self.maximal_open_records = collections.Counter()
+        self.open_records = {}
+        self.processed_rows = 0
+        self.elapsed_time = 0.0
+
+    def wrap(self, stage, function):
+        """Return a function calling the given one, whose calls are timed."""
+        statistics = self.stages[stage]
+        perf_counter = time.perf_counter
+
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            start_time = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                statistics.calls += 1
+                statistics.seconds += perf_counter() - start_time
+        return timed_function
+
+    def wrap_iterable(self, stage, iterable):
+        """Return an iterator over the given iterable, whose steps are timed."""
+        return self.__time_iteration(self.stages[stage], iter(iterable))
+
+    @staticmethod
+    def __time_iteration(statistics, iterator):
+        perf_counter = time.perf_counter
+        while True:
+            start_time = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                statistics.seconds += perf_counter() - start_time
+                return
+            statistics.calls += 1
+            statistics.seconds += perf_counter() - start_time
+            yield item
+
+    def record_removal(self, crypto_currency, acquisition_record_remover):
+        """Count the consumed records and sample the number of open records."""
+        self.consumed_records_per_removal[acquisition_record_remover.consumed_records] += 1
+        open_records = len(acquisition_record_remover.acquisition_records)
+        self.open_records_histograms[crypto_currency][open_records.bit_length()] += 1
+        if open_records > self.maximal_open_records[crypto_currency]:
+            self.maximal_open_records[crypto_currency] = open_records
+
+    def record_run(self, profit_calculator, processed_rows, elapsed_time):
+        """Add the processed rows and keep the open records at the end of a run."""
+        self.processed_rows += processed_rows
+        self.elapsed_time += elapsed_time
+        self.open_records = {
+            crypto_currency: len(acquisition_records) for crypto_currency, acquisition_records
+            in profit_calculator.crypto_aquistion_data.data_set.items()}
+
+    def get_summary(self):
+        """Return the collected data as a dictionary of JSON compatible types."""
+        crypto_currencies = sorted(set(self.open_records) | set(self.open_records_histograms))
+        return {
+            "processed_rows": self.processed_rows,
+            "elapsed_seconds": self.elapsed_time,
+            "stages": {
+                stage: {
+                    "calls": statistics.calls,
+                    "seconds": statistics.seconds,
+                    "microseconds_per_call": (
+                        1e6 * statistics.seconds / statistics.calls if statistics.calls else 0.0),
+                } for stage, statistics in self.stages.items()},
+            "consumed_records_per_removal": {
+                str(consumed_records): count for consumed_records, count
+                in sorted(self.consumed_records_per_removal.items())},
+            "open_records": {
+                crypto_currency: {
+                    "final": self.open_records.get(crypto_currency, 0),
+                    "maximum": self.maximal_open_records[crypto_currency],
+                    "histogram": {
+                        get_histogram_bucket_label(bucket): count for bucket, count
+                        in sorted(self.open_records_histograms[crypto_currency].items())},
+                } for crypto_currency in crypto_currencies},
+        }
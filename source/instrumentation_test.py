@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+
+"""
+This file provides unit tests for the functionality within the module instrumentation.
+"""
+
+# pylint: disable=C0115,C0116
+
+import datetime
+import json
+import unittest
+import crypto_tax_report
+import crypto_tax_report_test
+import fixed_point
+import instrumentation
+from crypto_tax_report import CryptoAcquisitionRecord, CryptoAcquisitionRecordQueue, logger
+from parallel_processing_test import get_test_corpus
+
+
+class InstrumentationTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def test_null_instrumentation_leaves_functions_unchanged(self):
+        null_instrumentation = crypto_tax_report.NULL_INSTRUMENTATION
+        self.assertIs(null_instrumentation.wrap("stage", len), len)
+        rows = [[], []]
+        self.assertIs(null_instrumentation.wrap_iterable("stage", rows), rows)
+
+    def test_get_histogram_bucket_label(self):
+        self.assertEqual([instrumentation.get_histogram_bucket_label(count.bit_length())
+                          for count in [0, 1, 2, 3, 4, 7, 8]],
+                         ["0", "1", "2-3", "2-3", "4-7", "4-7", "8-15"])
+
+    def test_remover_counts_consumed_records(self):
+        purchase_date_time = datetime.datetime(2021, 1, 1)
+        acquisition_records = CryptoAcquisitionRecordQueue(
+            [CryptoAcquisitionRecord(purchase_date_time, 1.0, 1.0) for _ in range(3)])
+        transaction_remover = crypto_tax_report.CryptoAcquisitionRecordRemover(
+            acquisition_records, 1.5, purchase_date_time)
+        transaction_remover()
+        # one record is popped, the second one is reduced
+        self.assertEqual(transaction_remover.consumed_records, 2)
+        self.assertEqual(len(acquisition_records), 2)
+
+    def test_summary_of_a_run(self):
+        raw_data = get_test_corpus(2000, seed=4)
+        reference_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        reference_calculator.process_data(raw_data)
+        run_instrumentation = instrumentation.Instrumentation()
+        profit_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        profit_calculator.set_instrumentation(run_instrumentation)
+        profit_calculator.process_data(iter(raw_data))
+        self.assertEqual(profit_calculator.taxable_profit.hex(),
+                         reference_calculator.taxable_profit.hex())
+        summary = json.loads(json.dumps(run_instrumentation.get_summary()))
+        self.assertEqual(summary["processed_rows"], len(raw_data))
+        stages = summary["stages"]
+        self.assertEqual(stages["read_rows"]["calls"], len(raw_data))
+        self.assertEqual(stages["classify_transaction"]["calls"], len(raw_data))
+        removals = stages["remove_disposal"]["calls"] + stages["swap_disposal"]["calls"]
+        self.assertEqual(sum(summary["consumed_records_per_removal"].values()), removals)
+        self.assertGreater(stages["add"]["calls"], 0)
+        self.assertGreaterEqual(stages["get_date_time_object"]["calls"],
+                                stages["add"]["calls"] + removals)
+        open_records = summary["open_records"]
+        for crypto_currency, acquisition_records in \
+                profit_calculator.crypto_aquistion_data.data_set.items():
+            self.assertEqual(open_records[crypto_currency]["final"], len(acquisition_records))
+
+    def test_instrumented_fixed_point_removal(self):
+        run_instrumentation = instrumentation.Instrumentation()
+        profit_calculator = fixed_point.FixedPointProfitCalculator(
+            fixed_point.FixedPointAquisitionData())
+        profit_calculator.set_instrumentation(run_instrumentation)
+        crypto_sale_data, _ = \
+            crypto_tax_report_test.CryptoAquisitionDataTest.get_testdata_for_crypto_sale()
+        profit_calculator.process_data(
+            crypto_tax_report_test.SimplePurchaseData.as_raw() + crypto_sale_data)
+        self.assertEqual(profit_calculator.taxable_profit, 129500)
+        self.assertEqual(sum(run_instrumentation.consumed_records_per_removal.values()),
+                         len(crypto_sale_data))
+
+
+if __name__ == '__main__':
+    unittest.main()
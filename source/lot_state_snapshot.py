@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+
+"""
+The module provides the incremental processing of a crypto.com csv file. The open
+acquisitions of each crypto currency, the accumulated profits and the position of the
+last processed row are stored in a compact snapshot file. A later run loads the
+snapshot and only processes the rows, which have been added to the csv file since.
+A snapshot can only be resumed by an engine with the same kind of amounts, e.g. the
+integer amounts of the fixed-point engine.
+"""
+
+import collections
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+import os
+
+from acquisition_lots import (
+    CryptoAcquisitionRecord, CryptoAquisitionData, Heading, TaxPolicy, get_date_time_object)
+from compact_lot_store import get_date_time_from_epoch_seconds, get_epoch_seconds
+from profit_calculator import (
+    ProfitCalculator, ProfitLedger, TaxYearCurrencyRollup, TaxYearProfit)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 6
+
+
+def get_row_hash(raw_data_entry):
+    """Return a hash of all columns of a data row in crypto.com's csv file."""
+    return hashlib.sha1("\x1f".join(raw_data_entry).encode("utf-8")).hexdigest()
+
+
+class LotStateSnapshot:
+    """
+    Class wrapping a ProfitCalculator together with the time stamp of the last
+    processed row and the hashes of all processed rows with this time stamp.
+    The rows passed to process_data have to be in chronological order. Rows
+    older than the last processed row and the already processed rows with the
+    same time stamp are skipped, so an appended csv file can be processed
+    again and only the new rows change the state.
+    """
+
+    def __init__(self, profit_calculator, last_timestamp="", last_row_hashes=()):
+        self.profit_calculator = profit_calculator
+        self.last_timestamp = last_timestamp
+        # the rows are compared by their parsed time stamp, not by its string
+        self.last_date_time = get_date_time_object(last_timestamp) if last_timestamp \
+            else datetime.datetime.min
+        self.last_row_hashes = list(last_row_hashes)
+
+    def new_rows(self, raw_crypto_aquisition_data):
+        """
+        Generator yielding the rows, which have not been processed before,
+        while keeping track of the last processed row.
+        """
+        processed_row_hashes = collections.Counter(self.last_row_hashes)
+        last_rows = []
+        skipped_rows = 0
+        try:
+            for raw_data_entry in raw_crypto_aquisition_data:
+                try:
+                    timestamp = raw_data_entry[Heading.TIMESTAMP.value]
+                    date_time = get_date_time_object(timestamp)
+                except (ValueError, IndexError):
+                    yield raw_data_entry
+                    continue
+                if date_time < self.last_date_time:
+                    skipped_rows += 1
+                    continue
+                if date_time == self.last_date_time and processed_row_hashes:
+                    row_hash = get_row_hash(raw_data_entry)
+                    if processed_row_hashes[row_hash] > 0:
+                        processed_row_hashes[row_hash] -= 1
+                        skipped_rows += 1
+                        continue
+                if date_time != self.last_date_time:
+                    self.last_timestamp = timestamp
+                    self.last_date_time = date_time
+                    self.last_row_hashes = []
+                    processed_row_hashes.clear()
+                    last_rows = []
+                last_rows.append(raw_data_entry)
+                yield raw_data_entry
+        finally:
+            # only the rows with the last time stamp are hashed
+            self.last_row_hashes.extend(
+                get_row_hash(raw_data_entry) for raw_data_entry in last_rows)
+            logger.info("Skipped %d already processed rows.", skipped_rows)
+
+    def process_data(self, raw_crypto_aquisition_data):
+        """Process the new rows of a crypto.com csv file. Returns the taxable
+        profit accumulated so far."""
+        return self.profit_calculator.process_data(self.new_rows(raw_crypto_aquisition_data))
+
+    def save(self, file_name):
+        """Write the snapshot to a gzip compressed JSON file."""
+        profit_calculator = self.profit_calculator
+        ledger = profit_calculator.ledger
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "acquisition_data_type": type(profit_calculator.crypto_aquistion_data).__name__,
+            "taxable_profit": profit_calculator.taxable_profit,
+            "exempt_profit": profit_calculator.exempt_profit,
+            "profits_per_tax_year": {
+                str(tax_year): [tax_year_profit.taxable_profit, tax_year_profit.exempt_profit]
+                for tax_year, tax_year_profit in ledger.profits_per_tax_year.items()
+            },
+            "rollups": [
+                [tax_year, crypto_currency, rollup.taxable_profit, rollup.exempt_profit,
+                 rollup.proceeds, rollup.cost_basis, rollup.number_of_sales,
+                 rollup.sale_ranges]
+                for (tax_year, crypto_currency), rollup in ledger.rollups.items()
+            ],
+            "number_of_sales": ledger.number_of_sales,
+            "processed_rows": profit_calculator.processed_rows,
+            "last_timestamp": self.last_timestamp,
+            "last_row_hashes": self.last_row_hashes,
+            "lots": {
+                crypto_currency: [
+                    [get_epoch_seconds(record.date_time), record.amount, record.bought_at,
+                     record.tax_policy.value]
+                    for record in acquisition_records
+                ]
+                for crypto_currency, acquisition_records
+                in profit_calculator.crypto_aquistion_data.data_set.items()
+            },
+        }
+        temporary_file_name = file_name + ".tmp"
+        with gzip.open(temporary_file_name, mode="wt", encoding="utf-8") as snapshot_file:
+            json.dump(snapshot, snapshot_file, separators=(",", ":"))
+        os.replace(temporary_file_name, file_name)
+
+    @classmethod
+    def load(cls, file_name, profit_calculator=None):
+        """
+        Read a snapshot, which has been written by save, into the given new
+        ProfitCalculator of any engine, e.g. from get_profit_calculator of
+        the module crypto_tax_report, or into a new serial ProfitCalculator
+        for None. Raises a ValueError, if the amounts of the snapshot are not
+        of the kind of the engine, e.g. a snapshot of the fixed-point engine
+        for the serial engine.
+        """
+        with gzip.open(file_name, mode="rt", encoding="utf-8") as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {snapshot.get('version')} "
+                             f"in {file_name}.")
+        if profit_calculator is None:
+            profit_calculator = ProfitCalculator(CryptoAquisitionData())
+        crypto_aquisition_data = profit_calculator.crypto_aquistion_data
+        if snapshot["acquisition_data_type"] != type(crypto_aquisition_data).__name__:
+            raise ValueError(f"The snapshot {file_name} of a {snapshot['acquisition_data_type']} "
+                             f"cannot be resumed with a {type(crypto_aquisition_data).__name__}.")
+        record_queue_type = crypto_aquisition_data.record_queue_type
+        for crypto_currency, lots in snapshot["lots"].items():
+            crypto_aquisition_data.data_set[crypto_currency] = record_queue_type(
+                CryptoAcquisitionRecord(get_date_time_from_epoch_seconds(epoch_seconds),
+                                        amount, bought_at, TaxPolicy(tax_policy))
+                for epoch_seconds, amount, bought_at, tax_policy in lots
+            )
+        profit_calculator.taxable_profit = snapshot["taxable_profit"]
+        profit_calculator.exempt_profit = snapshot["exempt_profit"]
+        profit_calculator.ledger = ProfitLedger(
+            {int(tax_year): TaxYearProfit(taxable_profit, exempt_profit)
+             for tax_year, (taxable_profit, exempt_profit)
+             in snapshot["profits_per_tax_year"].items()},
+            {(tax_year, crypto_currency): TaxYearCurrencyRollup(*rollup)
+             for tax_year, crypto_currency, *rollup in snapshot["rollups"]},
+            snapshot["number_of_sales"])
+        profit_calculator.processed_rows = snapshot["processed_rows"]
+        return cls(profit_calculator, snapshot["last_timestamp"], snapshot["last_row_hashes"])
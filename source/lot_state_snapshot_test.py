@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+
+"""
+This file provides unit tests for the functionality within the module lot_state_snapshot.
+"""
+
+# pylint: disable=C0115,C0116
+
+import datetime
+import os
+import tempfile
+import unittest
+import crypto_tax_report
+import lot_state_snapshot
+from crypto_tax_report import logger
+from parallel_processing_test import get_test_corpus
+
+
+class LotStateSnapshotTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+        self.temporary_directory = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.snapshot_file_name = os.path.join(self.temporary_directory.name, "snapshot.json.gz")
+
+    def tearDown(self) -> None:
+        self.temporary_directory.cleanup()
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    @staticmethod
+    def get_raw_data():
+        raw_data = get_test_corpus(1000, seed=3)
+        # a gap of more than a year makes the sales after it partially exempt
+        for raw_data_entry in raw_data[300:]:
+            raw_data_entry[crypto_tax_report.Heading.TIMESTAMP.value] = (
+                crypto_tax_report.get_date_time_object(
+                    raw_data_entry[crypto_tax_report.Heading.TIMESTAMP.value])
+                + datetime.timedelta(days=400)).strftime(crypto_tax_report.DATE_TIME_FORMAT)
+        # the first run ends in the middle of rows with the same time stamp
+        for index in (599, 600, 601):
+            raw_data[index][crypto_tax_report.Heading.TIMESTAMP.value] = \
+                raw_data[598][crypto_tax_report.Heading.TIMESTAMP.value]
+        return raw_data
+
+    def test_resume_from_snapshot(self):
+        raw_data = LotStateSnapshotTest.get_raw_data()
+        reference_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        reference_profit = reference_calculator.process_data(raw_data)
+
+        snapshot = lot_state_snapshot.LotStateSnapshot(crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData()))
+        snapshot.process_data(raw_data[:600])
+        snapshot.save(self.snapshot_file_name)
+        self.assertEqual(len(snapshot.last_row_hashes), 2)
+
+        resumed_snapshot = lot_state_snapshot.LotStateSnapshot.load(self.snapshot_file_name)
+        # the complete file is passed on again, but only the new rows are processed
+        resumed_profit = resumed_snapshot.process_data(iter(raw_data))
+        self.assertEqual(resumed_profit.hex(), reference_profit.hex())
+        self.assertEqual(resumed_snapshot.profit_calculator.exempt_profit.hex(),
+                         reference_calculator.exempt_profit.hex())
+        self.assertEqual(resumed_snapshot.profit_calculator.ledger.profits_per_tax_year,
+                         reference_calculator.ledger.profits_per_tax_year)
+        self.assertEqual(resumed_snapshot.profit_calculator.ledger.rollups,
+                         reference_calculator.ledger.rollups)
+        self.assertEqual(resumed_snapshot.profit_calculator.processed_rows, len(raw_data))
+        self.assertEqual(resumed_snapshot.last_timestamp,
+                         raw_data[-1][crypto_tax_report.Heading.TIMESTAMP.value])
+        reference_data_set = reference_calculator.crypto_aquistion_data.data_set
+        resumed_data_set = resumed_snapshot.profit_calculator.crypto_aquistion_data.data_set
+        self.assertEqual(resumed_data_set.keys(), reference_data_set.keys())
+        for crypto_currency, acquisition_records in reference_data_set.items():
+            self.assertEqual(resumed_data_set[crypto_currency], acquisition_records)
+
+    def test_unchanged_file_is_not_processed_again(self):
+        raw_data = LotStateSnapshotTest.get_raw_data()
+        snapshot = lot_state_snapshot.LotStateSnapshot(crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData()))
+        profit = snapshot.process_data(raw_data)
+        snapshot.save(self.snapshot_file_name)
+        resumed_snapshot = lot_state_snapshot.LotStateSnapshot.load(self.snapshot_file_name)
+        self.assertEqual(resumed_snapshot.process_data(raw_data), profit)
+        self.assertEqual(resumed_snapshot.profit_calculator.processed_rows, len(raw_data))
+
+    def test_resume_with_the_fixed_point_engine(self):
+        raw_data = LotStateSnapshotTest.get_raw_data()
+        reference_calculator = crypto_tax_report.get_profit_calculator("fixed-point")
+        reference_calculator.process_data(raw_data)
+        snapshot = lot_state_snapshot.LotStateSnapshot(
+            crypto_tax_report.get_profit_calculator("fixed-point"))
+        snapshot.process_data(raw_data[:600])
+        snapshot.save(self.snapshot_file_name)
+        with self.assertRaises(ValueError):
+            lot_state_snapshot.LotStateSnapshot.load(self.snapshot_file_name)
+        resumed_snapshot = lot_state_snapshot.LotStateSnapshot.load(
+            self.snapshot_file_name, crypto_tax_report.get_profit_calculator("fixed-point"))
+        self.assertEqual(resumed_snapshot.process_data(raw_data),
+                         reference_calculator.get_taxable_profit_in_euro())
+        self.assertEqual(resumed_snapshot.profit_calculator.crypto_aquistion_data.data_set,
+                         reference_calculator.crypto_aquistion_data.data_set)
+
+    def test_time_stamps_are_compared_as_dates(self):
+        snapshot = lot_state_snapshot.LotStateSnapshot(
+            crypto_tax_report.get_profit_calculator("serial"), "2021-12-06 14:01:56")
+        raw_data = [
+            # an older time stamp without leading zeros, which is after the last one as a string
+            ["2021-5-03 10:00:00", "EUR -> CRO", "EUR", "-10.0", "CRO", "100.0", "EUR",
+             "10.0", "12.0", "viban_purchase"],
+            ["2022-01-01 10:00:00", "EUR -> CRO", "EUR", "-10.0", "CRO", "100.0", "EUR",
+             "10.0", "12.0", "viban_purchase"]]
+        self.assertEqual(list(snapshot.new_rows(raw_data)), raw_data[1:])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
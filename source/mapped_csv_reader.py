@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+
+"""
+The module provides a reader for crypto.com csv files, which memory-maps the file and
+only splits off the columns actually needed instead of creating a string for every
+column of a row. By default these are the columns TIMESTAMP, IDENTIFIER, the currencies
+and the amounts used by the ProfitCalculator, while columns like DOLLAR_AMOUNT or
+HASH_KEY are left unsplit. The rows are lists of strings rather than views into the
+mapped file: every column is looked up several times by the engines, and decoding a
+field on each access of a view costs more than decoding the line and splitting it once.
+"""
+
+import csv
+import mmap
+
+from acquisition_lots import Heading
+
+ENGINE_COLUMNS = (
+    Heading.TIMESTAMP, Heading.IDENTIFIER, Heading.SOURCE_CURRENCY, Heading.SOURCE_AMOUNT,
+    Heading.TARGET_CURRENCY, Heading.TARGET_AMOUNT, Heading.NATIVE_CURRENCY_AMOUNT)
+UTF8_BYTE_ORDER_MARK = b'\xef\xbb\xbf'
+
+
+def get_lines_backwards(mapped_file, start):
+    """
+    Generator yielding the lines of a memory-mapped file behind the position
+    start from the last line to the first one.
+    """
+    end = len(mapped_file)
+    while end > start:
+        # a line break at the end of the current line is part of the line
+        line_break = mapped_file.rfind(b'\n', start, end - 1)
+        line_start = start if line_break < 0 else line_break + 1
+        yield mapped_file[line_start:end]
+        end = line_start
+
+
+def read_mapped_csv(file_name, columns=ENGINE_COLUMNS, reverse=False):
+    """
+    Generator yielding the rows of the given csv file as lists, which can be
+    indexed like the rows of a csv.reader for the given columns. A row is only
+    split up to the last of these columns; the element behind it holds the
+    unsplit rest of the row. Rows with quoted fields are completely parsed by
+    csv.reader. A quoted field may contain line breaks: the lines of such a
+    row are joined until its quotes are balanced. A quoted field, which is
+    still open at the end of the file, raises a csv.Error. Empty lines are
+    skipped. With reverse the rows are yielded from the last one to the first
+    one, e.g. for an export with the newest transaction first, without reading
+    the whole file beforehand.
+    """
+    maximal_number_of_splits = max(column.value for column in columns) + 1
+    with open(file_name, mode='rb') as csv_file:
+        if csv_file.seek(0, 2) == 0:
+            return
+        with mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            if mapped_file[:len(UTF8_BYTE_ORDER_MARK)] == UTF8_BYTE_ORDER_MARK:
+                mapped_file.seek(len(UTF8_BYTE_ORDER_MARK))
+            if reverse:
+                lines = get_lines_backwards(mapped_file, mapped_file.tell())
+            else:
+                lines = iter(mapped_file.readline, b'')
+            open_line = None
+            for line in lines:
+                if open_line is not None:
+                    line = open_line + line if not reverse else line + open_line
+                # an odd number of quotes leaves a quoted field with a line break open
+                if line.count(b'"') % 2:
+                    open_line = line
+                    continue
+                open_line = None
+                line = line.decode('utf-8').rstrip('\r\n')
+                if not line:
+                    continue
+                if '"' in line:
+                    # the csv.reader of a single line yields at most one row
+                    yield from csv.reader([line])
+                else:
+                    yield line.split(',', maximal_number_of_splits)
+            if open_line is not None:
+                raise csv.Error(f"The quoted field of the row {open_line!r} is not closed "
+                                f"at the end of the file {file_name}.")
@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+
+"""
+This file provides unit tests for the functionality within the module mapped_csv_reader.
+"""
+
+# pylint: disable=C0115,C0116
+
+import csv
+import os
+import tempfile
+import unittest
+import crypto_tax_report
+import mapped_csv_reader
+from crypto_tax_report import logger
+from parallel_processing_test import get_test_corpus
+
+
+class MappedCsvReaderTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+        self.temporary_directory = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.csv_file_name = os.path.join(self.temporary_directory.name, "transactions.csv")
+
+    def tearDown(self) -> None:
+        self.temporary_directory.cleanup()
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def write_csv_file(self, raw_data):
+        with open(self.csv_file_name, encoding="utf-8", mode='w', newline='') as csv_file:
+            csv.writer(csv_file).writerows(raw_data)
+
+    def test_rows_are_the_same_as_with_csv_reader(self):
+        raw_data = [
+            ["Timestamp (UTC)", "Transaction Description", "Currency", "Amount"],
+            ["2021-05-20 12:57:28", "EUR -> ADA", "EUR", "-300.0", "ADA", "200.0", "EUR",
+             "300.0", "330.0", "viban_purchase", ""],
+            ["2021-05-21 12:57:28", "Card Cashback, Ruby", "CRO", "1.5", "", "", "EUR",
+             "0.2", "0.22", "referral_card_cashback", "0x12"],
+        ]
+        self.write_csv_file(raw_data)
+        rows = list(mapped_csv_reader.read_mapped_csv(self.csv_file_name))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0], raw_data[0])
+        for row, raw_data_entry in zip(rows[1:], raw_data[1:]):
+            for column in mapped_csv_reader.ENGINE_COLUMNS:
+                self.assertEqual(row[column.value], raw_data_entry[column.value])
+        # the columns behind NATIVE_CURRENCY_AMOUNT are not split
+        self.assertEqual(len(rows[1]), crypto_tax_report.Heading.DOLLAR_AMOUNT.value + 1)
+        self.assertEqual(rows[1][-1], "330.0,viban_purchase,")
+        # a row with quoted fields is parsed completely
+        self.assertEqual(rows[2], raw_data[2])
+        rows = list(mapped_csv_reader.read_mapped_csv(
+            self.csv_file_name, columns=list(crypto_tax_report.Heading)))
+        self.assertEqual(rows, raw_data)
+
+    def test_process_data_with_mapped_rows(self):
+        raw_data = get_test_corpus(500, seed=5)
+        self.write_csv_file(raw_data)
+        reference_profit = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData()).process_data(raw_data)
+        profit = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData()).process_data(
+                mapped_csv_reader.read_mapped_csv(self.csv_file_name))
+        self.assertEqual(profit, reference_profit)
+
+    def test_reverse(self):
+        raw_data = get_test_corpus(50, seed=2)
+        self.write_csv_file(raw_data)
+        columns = list(crypto_tax_report.Heading)[:len(raw_data[0])]
+        self.assertEqual(
+            list(mapped_csv_reader.read_mapped_csv(self.csv_file_name, columns, reverse=True)),
+            raw_data[::-1])
+        # without a line break at the end of the file
+        with open(self.csv_file_name, encoding="utf-8", mode='w', newline='') as csv_file:
+            csv_file.write("a,b\r\n\r\nc,d")
+        self.assertEqual(
+            list(mapped_csv_reader.read_mapped_csv(self.csv_file_name, reverse=True)),
+            [["c", "d"], ["a", "b"]])
+
+    def test_quoted_field_with_line_breaks(self):
+        raw_data = [
+            ["2021-05-20 12:57:28", "EUR -> ADA", "EUR", "-300.0", "ADA", "200.0", "EUR",
+             "300.0", "330.0", "viban_purchase", ""],
+            ["2021-05-21 12:57:28", "Card Cashback\nRuby, \"Metal\"\r\n", "CRO", "1.5", "",
+             "", "EUR", "0.2", "0.22", "referral_card_cashback", "0x12"],
+            ["2021-05-22 12:57:28", "CRO -> EUR", "CRO", "-1.5", "EUR", "0.3", "EUR",
+             "0.3", "0.33", "crypto_viban_exchange", ""],
+        ]
+        self.write_csv_file(raw_data)
+        columns = list(crypto_tax_report.Heading)
+        self.assertEqual(
+            list(mapped_csv_reader.read_mapped_csv(self.csv_file_name, columns)), raw_data)
+        self.assertEqual(
+            list(mapped_csv_reader.read_mapped_csv(self.csv_file_name, columns, reverse=True)),
+            raw_data[::-1])
+
+    def test_quoted_field_open_at_the_end_of_the_file(self):
+        with open(self.csv_file_name, encoding="utf-8", mode='w', newline='') as csv_file:
+            csv_file.write('a,b\r\nc,"d\r\ne')
+        with self.assertRaises(csv.Error):
+            list(mapped_csv_reader.read_mapped_csv(self.csv_file_name))
+
+    def test_empty_file(self):
+        self.write_csv_file([])
+        self.assertEqual(list(mapped_csv_reader.read_mapped_csv(self.csv_file_name)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
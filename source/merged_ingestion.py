@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+
+"""
+The module provides the ingestion of several crypto.com csv files of a client, e.g. the
+exports of the app and of the exchange or exports split by year. The rows of all files
+are merged in chronological order by a streaming k-way merge, so neither the files nor
+their rows are held in memory. Each file may list its transactions oldest or newest
+first. Rows contained in overlapping exports are passed on only once. The report command
+of crypto_tax_report reads the files of a client with merge_exports.
+"""
+
+import collections
+import datetime
+import heapq
+import logging
+
+from acquisition_lots import Heading, get_cached_date_time_object, get_date_time_object
+from mapped_csv_reader import ENGINE_COLUMNS, read_mapped_csv
+
+logger = logging.getLogger(__name__)
+
+# the column indices are looked up once, since every row is touched several times
+TIMESTAMP_COLUMN = Heading.TIMESTAMP.value
+INTERNAL_IDENTIFIER_COLUMN = Heading.INTERNAL_IDENTIFIER.value
+HASH_KEY_COLUMN = Heading.HASH_KEY.value
+# the columns of the engines and of the duplicate key; the latter are the last
+# columns of an export, so the rows are split up to the HASH_KEY
+MERGE_COLUMNS = ENGINE_COLUMNS + (Heading.INTERNAL_IDENTIFIER, Heading.HASH_KEY)
+
+
+def get_timestamp(raw_data_entry):
+    """Return the time stamp string of a data row, by which the rows are merged."""
+    return raw_data_entry[TIMESTAMP_COLUMN]
+
+
+def is_data_row(raw_data_entry):
+    """Check whether the time stamp of a data row can be parsed, unlike the header."""
+    try:
+        get_date_time_object(get_timestamp(raw_data_entry))
+    except ValueError:
+        return False
+    return True
+
+
+def get_duplicate_key(raw_data_entry):
+    """
+    Return the key identifying a transaction across different exports: its
+    HASH_KEY together with its INTERNAL_IDENTIFIER, if there is a hash key,
+    and the complete row otherwise.
+    """
+    if len(raw_data_entry) > HASH_KEY_COLUMN and raw_data_entry[HASH_KEY_COLUMN]:
+        return (raw_data_entry[HASH_KEY_COLUMN], raw_data_entry[INTERNAL_IDENTIFIER_COLUMN])
+    return tuple(raw_data_entry)
+
+
+def read_export(file_name):
+    """
+    Generator yielding the data rows of a crypto.com csv file in chronological
+    order. A header is skipped. Whether the file lists the newest transaction
+    first is decided by its first and its last data row; such a file is read
+    backwards.
+    """
+    columns = MERGE_COLUMNS
+    first_rows = read_mapped_csv(file_name, columns)
+    first_row = next(first_rows, None)
+    has_header = first_row is not None and not is_data_row(first_row)
+    if has_header:
+        first_row = next(first_rows, None)
+    first_rows.close()
+    if first_row is None:
+        return
+    last_rows = read_mapped_csv(file_name, columns, reverse=True)
+    last_row = next(last_rows, None)
+    last_rows.close()
+    if last_row is None:
+        return
+    newest_first = get_timestamp(first_row) > get_timestamp(last_row)
+    logger.info("Reading %s with the %s transaction first.", file_name,
+                "newest" if newest_first else "oldest")
+    rows = read_mapped_csv(file_name, columns, reverse=newest_first)
+    if not has_header:
+        yield from rows
+    elif not newest_first:
+        next(rows, None)
+        yield from rows
+    else:
+        # the header is the last row, if the file is read backwards
+        previous_row = next(rows, None)
+        if previous_row is None:
+            return
+        for raw_data_entry in rows:
+            yield previous_row
+            previous_row = raw_data_entry
+
+
+class DuplicateFilter: # pylint: disable=too-few-public-methods
+    """
+    Functor dropping the rows of the merged exports, which have already been
+    passed on from another export. Duplicates have the same time stamp, so
+    only the keys of the rows with the current time stamp are kept, which
+    bounds the memory. A row occurring several times within one export is
+    passed on as often as in the export containing it most often.
+    """
+
+    def __init__(self):
+        self.timestamp = None
+        self.occurrences_per_export = collections.Counter()
+        self.passed_on_occurrences = collections.Counter()
+        self.dropped_rows = 0
+
+    def __call__(self, export_index, raw_data_entry):
+        timestamp = raw_data_entry[TIMESTAMP_COLUMN]
+        if timestamp != self.timestamp:
+            self.timestamp = timestamp
+            self.occurrences_per_export.clear()
+            self.passed_on_occurrences.clear()
+        duplicate_key = get_duplicate_key(raw_data_entry)
+        export_key = (export_index, duplicate_key)
+        occurrences = self.occurrences_per_export[export_key] + 1
+        self.occurrences_per_export[export_key] = occurrences
+        if occurrences <= self.passed_on_occurrences[duplicate_key]:
+            self.dropped_rows += 1
+            return False
+        self.passed_on_occurrences[duplicate_key] += 1
+        return True
+
+
+def get_merge_items(export_index, file_name):
+    """
+    Generator yielding the data rows of a crypto.com csv file in chronological
+    order as tuples (datetime.datetime of the time stamp, export index, row).
+    The time stamps are parsed with a cache, since many rows share the same
+    time stamp. A row, whose time stamp cannot be parsed, keeps the datetime
+    of the previous row, so it stays at its position within its file and is
+    skipped by the engines.
+    """
+    date_time = datetime.datetime.min
+    for raw_data_entry in read_export(file_name):
+        try:
+            date_time = get_cached_date_time_object(raw_data_entry[TIMESTAMP_COLUMN])
+        except ValueError:
+            pass
+        yield date_time, export_index, raw_data_entry
+
+
+def merge_exports(file_names):
+    """
+    Generator yielding the data rows of all given crypto.com csv files merged
+    in chronological order without duplicates. Rows with the same time stamp
+    keep the order of the files.
+    """
+    duplicate_filter = DuplicateFilter()
+    # the rows of different files with the same time stamp are ordered by the
+    # index of the file, so the rows themselves are never compared
+    merged_rows = heapq.merge(*(
+        get_merge_items(export_index, file_name)
+        for export_index, file_name in enumerate(file_names)))
+    for _, export_index, raw_data_entry in merged_rows:
+        if duplicate_filter(export_index, raw_data_entry):
+            yield raw_data_entry
+    logger.info("Dropped %d rows contained in several exports.", duplicate_filter.dropped_rows)
@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+
+"""
+This file provides unit tests for the functionality within the module merged_ingestion.
+"""
+
+# pylint: disable=C0115,C0116
+
+import csv
+import os
+import tempfile
+import unittest
+import crypto_tax_report
+import merged_ingestion
+from crypto_tax_report import logger
+from parallel_processing_test import get_test_corpus
+
+
+class MergedIngestionTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+        self.temporary_directory = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+
+    def tearDown(self) -> None:
+        self.temporary_directory.cleanup()
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def write_csv_file(self, file_name, raw_data, header=True):
+        file_name = os.path.join(self.temporary_directory.name, file_name)
+        with open(file_name, encoding="utf-8", mode='w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            if header:
+                writer.writerow(["Timestamp (UTC)", "Transaction Description", "Currency"])
+            writer.writerows(raw_data)
+        return file_name
+
+    def test_read_export_newest_first(self):
+        raw_data = get_test_corpus(20, seed=1)
+        file_name = self.write_csv_file("newest_first.csv", raw_data[::-1])
+        self.assertEqual(list(merged_ingestion.read_export(file_name)), raw_data)
+        file_name = self.write_csv_file("oldest_first.csv", raw_data, header=False)
+        self.assertEqual(list(merged_ingestion.read_export(file_name)), raw_data)
+        file_name = self.write_csv_file("header_only.csv", [])
+        self.assertEqual(list(merged_ingestion.read_export(file_name)), [])
+
+    def test_merge_overlapping_exports(self):
+        raw_data = get_test_corpus(600, seed=9)
+        file_names = [
+            self.write_csv_file("app.csv", raw_data[:250][::-1]),
+            # the exports overlap by 50 rows
+            self.write_csv_file("exchange.csv", raw_data[200:450], header=False),
+            self.write_csv_file("yearly.csv", raw_data[400:][::-1]),
+        ]
+        self.assertEqual(list(merged_ingestion.merge_exports(file_names)), raw_data)
+        reference_profit = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData()).process_data(raw_data)
+        profit_calculator = crypto_tax_report.report_files(file_names)
+        self.assertEqual(profit_calculator.taxable_profit.hex(), reference_profit.hex())
+        self.assertEqual(profit_calculator.processed_rows, len(raw_data))
+
+    def test_merge_by_the_parsed_time_stamps(self):
+        raw_data = get_test_corpus(3, seed=3)
+        # a time stamp without leading zeros sorts behind the others as a string
+        raw_data[0][crypto_tax_report.Heading.TIMESTAMP.value] = "2021-1-1 1:00:00"
+        invalid_row = ["invalid", "EUR -> CRO"]
+        file_names = [
+            self.write_csv_file("app.csv", raw_data[1:]),
+            self.write_csv_file("exchange.csv", [raw_data[0], invalid_row], header=False),
+        ]
+        # the invalid row stays behind the previous row of its export
+        self.assertEqual(list(merged_ingestion.merge_exports(file_names)),
+                         [raw_data[0], invalid_row] + raw_data[1:])
+
+    def test_duplicate_filter(self):
+        timestamp = "2021-05-20 12:57:28"
+        reward = [timestamp, "CRO Stake Rewards", "CRO", "1.5", "", "", "EUR", "0.2", "0.22",
+                  "crypto_earn_interest_paid", ""]
+        purchase = [timestamp, "EUR -> CRO", "EUR", "-20.0", "CRO", "200.0", "EUR", "20.0",
+                    "21.2", "viban_purchase", "0x12"]
+        duplicate_filter = merged_ingestion.DuplicateFilter()
+        # two equal rows within an export are two transactions
+        self.assertTrue(duplicate_filter(0, reward))
+        self.assertTrue(duplicate_filter(0, list(reward)))
+        self.assertTrue(duplicate_filter(0, purchase))
+        # the same transactions in a second export are dropped, the hash key
+        # identifies a transaction, even if its other columns differ
+        self.assertFalse(duplicate_filter(1, list(reward)))
+        self.assertFalse(duplicate_filter(1, purchase[:7] + ["20.00"] + purchase[8:]))
+        self.assertFalse(duplicate_filter(1, list(reward)))
+        self.assertTrue(duplicate_filter(1, list(reward)))
+        self.assertEqual(duplicate_filter.dropped_rows, 3)
+        # the window only contains the rows of the current time stamp
+        later_purchase = ["2021-05-20 12:57:29"] + purchase[1:]
+        self.assertTrue(duplicate_filter(1, later_purchase))
+        self.assertEqual(len(duplicate_filter.passed_on_occurrences), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
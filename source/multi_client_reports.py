@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+
+"""
+The module provides an asyncio driver generating the tax reports of many clients on a
+single report server. The clients are taken from a bounded asyncio.Queue, which applies
+backpressure to the producer, so a manifest of thousands of clients is read only as fast
+as the reports are generated. A fixed number of consumers hand the reading and the FIFO
+matching of a client to a concurrent.futures.ProcessPoolExecutor and write each report
+as soon as it has finished. Only the small report text is sent back from a worker
+process, since the rows of the exports are streamed from the memory-mapped files within
+the worker instead of being passed between processes.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import csv
+import io
+import logging
+import os
+from dataclasses import dataclass, field
+
+from crypto_tax_report import (
+    ENGINES, OUTPUT_FORMATS, Diagnostics, report_files, write_tax_year_report)
+
+logger = logging.getLogger(__name__)
+
+# number of clients waiting for a consumer per worker process
+QUEUED_CLIENTS_PER_WORKER = 4
+OUTPUT_FILE_EXTENSIONS = {"text": "txt", "csv": "csv", "json": "json"}
+
+
+@dataclass(frozen=True)
+class ClientJob:
+    """The crypto.com csv files of a client and the file name of the report."""
+    client_name: str
+    file_names: tuple
+    output_file_name: str
+
+
+@dataclass
+class ReportRunSummary:
+    """The outcome of generating the reports of several clients."""
+    succeeded: int = 0
+    failed_clients: list = field(default_factory=list)
+
+
+def generate_report(client_job, engine="serial", output_format="text"):
+    """
+    Read the csv files of a client, process them with the given engine and
+    return the report as a string. This runs in a worker process.
+    """
+    profit_calculator = report_files(list(client_job.file_names), engine,
+                                     diagnostics=Diagnostics())
+    output_file = io.StringIO()
+    write_tax_year_report(profit_calculator, output_format, output_file)
+    return output_file.getvalue()
+
+
+def write_report(output_file_name, report):
+    """Write the report of a client to a file."""
+    with open(output_file_name, encoding="utf-8", mode='w', newline='') as output_file:
+        output_file.write(report)
+
+
+def read_manifest(manifest_file_name, output_directory, output_format="text"):
+    """
+    Generator yielding a ClientJob for each row of a manifest csv file. A row
+    holds the name of a client followed by its crypto.com csv files. The
+    report is written to the output directory as <client name>.<format>.
+    """
+    extension = OUTPUT_FILE_EXTENSIONS[output_format]
+    with open(manifest_file_name, encoding="utf-8", mode='r', newline='') as manifest_file:
+        for row in csv.reader(manifest_file):
+            if len(row) < 2:
+                continue
+            yield ClientJob(row[0], tuple(row[1:]),
+                            os.path.join(output_directory, f"{row[0]}.{extension}"))
+
+
+async def produce_client_jobs(client_jobs, queue, number_of_consumers):
+    """Put the client jobs into the queue, waiting while it is full, and
+    finally one None per consumer."""
+    for client_job in client_jobs:
+        await queue.put(client_job)
+    for _ in range(number_of_consumers):
+        await queue.put(None)
+
+
+async def consume_client_jobs(queue, executor, engine, output_format, summary):
+    """Generate the reports of the client jobs from the queue in the executor
+    and write them, until None is taken from the queue."""
+    loop = asyncio.get_running_loop()
+    while (client_job := await queue.get()) is not None:
+        try:
+            report = await loop.run_in_executor(
+                executor, generate_report, client_job, engine, output_format)
+            await asyncio.to_thread(write_report, client_job.output_file_name, report)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # a failing client must not stop the reports of the others
+            logger.error("The report of the client %s could not be generated: %s.",
+                         client_job.client_name, e)
+            summary.failed_clients.append(client_job.client_name)
+        else:
+            summary.succeeded += 1
+
+
+async def run_reports(client_jobs, max_workers=None, engine="serial", output_format="text",
+                      executor=None):
+    """
+    Generate the reports of the given client jobs, an iterable which is only
+    consumed as fast as the reports are generated, with max_workers worker
+    processes or the given executor. Returns a ReportRunSummary.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    # one consumer more than workers keeps the workers busy while a report is written
+    number_of_consumers = max_workers + 1
+    queue = asyncio.Queue(maxsize=QUEUED_CLIENTS_PER_WORKER * max_workers)
+    summary = ReportRunSummary()
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        await asyncio.gather(
+            produce_client_jobs(client_jobs, queue, number_of_consumers),
+            *(consume_client_jobs(queue, executor, engine, output_format, summary)
+              for _ in range(number_of_consumers)))
+    finally:
+        if own_executor:
+            executor.shutdown()
+    logger.info("Generated %d reports, %d failed.", summary.succeeded,
+                len(summary.failed_clients))
+    return summary
+
+
+def main():
+    """ Entry point for calling this file directly as a python script."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("manifest", help="csv file with one row per client: the name of "
+                        "the client followed by its crypto.com csv files")
+    parser.add_argument("output_directory", help="directory of the reports")
+    parser.add_argument("--workers", type=int, help="number of worker processes, "
+                        "default: number of CPUs")
+    parser.add_argument("--format", dest="output_format", default="text",
+                        choices=OUTPUT_FORMATS, help="format of the reports, "
+                        "default: %(default)s")
+    parser.add_argument("--engine", default="serial", choices=ENGINES,
+                        help="engine of the FIFO matching, default: %(default)s")
+    arguments = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    os.makedirs(arguments.output_directory, exist_ok=True)
+    summary = asyncio.run(run_reports(
+        read_manifest(arguments.manifest, arguments.output_directory, arguments.output_format),
+        arguments.workers, arguments.engine, arguments.output_format))
+    if summary.failed_clients:
+        raise SystemExit(f"The reports of {len(summary.failed_clients)} clients failed.")
+
+
+if "__main__" == __name__:
+    main()
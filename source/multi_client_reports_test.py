@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+
+"""
+This file provides unit tests for the functionality within the module multi_client_reports.
+"""
+
+# pylint: disable=C0115,C0116
+
+import asyncio
+import concurrent.futures
+import csv
+import io
+import os
+import tempfile
+import unittest
+import crypto_tax_report
+import multi_client_reports
+from crypto_tax_report import logger
+from parallel_processing_test import get_test_corpus
+
+
+class MultiClientReportsTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+        self.temporary_directory = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.output_directory = os.path.join(self.temporary_directory.name, "reports")
+        os.mkdir(self.output_directory)
+
+    def tearDown(self) -> None:
+        self.temporary_directory.cleanup()
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def write_csv_file(self, file_name, raw_data):
+        file_name = os.path.join(self.temporary_directory.name, file_name)
+        with open(file_name, encoding="utf-8", mode='w', newline='') as csv_file:
+            csv.writer(csv_file).writerows(raw_data)
+        return file_name
+
+    def get_client_jobs(self, number_of_clients, number_of_rows=200):
+        client_jobs = []
+        for client_index in range(number_of_clients):
+            raw_data = get_test_corpus(number_of_rows, seed=client_index)
+            # every second client has an export of the app and one of the exchange
+            exports = [raw_data[::2], raw_data[1::2]] if client_index % 2 else [raw_data]
+            client_name = f"client{client_index}"
+            client_jobs.append(multi_client_reports.ClientJob(
+                client_name,
+                tuple(self.write_csv_file(f"{client_name}_{export_index}.csv", export)
+                      for export_index, export in enumerate(exports)),
+                os.path.join(self.output_directory, f"{client_name}.txt")))
+        return client_jobs
+
+    @staticmethod
+    def get_expected_report(client_job):
+        profit_calculator = crypto_tax_report.report_files(list(client_job.file_names))
+        output_file = io.StringIO()
+        crypto_tax_report.write_tax_year_report(profit_calculator, "text", output_file)
+        return output_file.getvalue()
+
+    def test_run_reports(self):
+        client_jobs = self.get_client_jobs(5)
+        failing_client_job = multi_client_reports.ClientJob(
+            "missing", ("missing.csv",), os.path.join(self.output_directory, "missing.txt"))
+        summary = asyncio.run(multi_client_reports.run_reports(
+            client_jobs[:2] + [failing_client_job] + client_jobs[2:], max_workers=2))
+        self.assertEqual(summary.succeeded, len(client_jobs))
+        self.assertEqual(summary.failed_clients, ["missing"])
+        for client_job in client_jobs:
+            with open(client_job.output_file_name, encoding="utf-8") as report_file:
+                self.assertEqual(report_file.read(), self.get_expected_report(client_job))
+
+    def test_backpressure(self):
+        client_jobs = self.get_client_jobs(30, number_of_rows=20)
+        max_workers = 2
+        maximal_number_of_pending_jobs = 0
+
+        def get_client_jobs():
+            nonlocal maximal_number_of_pending_jobs
+            for number_of_taken_jobs, client_job in enumerate(client_jobs):
+                written_reports = len(os.listdir(self.output_directory))
+                maximal_number_of_pending_jobs = max(
+                    maximal_number_of_pending_jobs, number_of_taken_jobs - written_reports)
+                yield client_job
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            summary = asyncio.run(multi_client_reports.run_reports(
+                get_client_jobs(), max_workers=max_workers, executor=executor))
+        self.assertEqual(summary.succeeded, len(client_jobs))
+        # the jobs in the queue and those of the consumers
+        self.assertLessEqual(
+            maximal_number_of_pending_jobs,
+            multi_client_reports.QUEUED_CLIENTS_PER_WORKER * max_workers + max_workers + 1)
+
+    def test_read_manifest(self):
+        manifest_file_name = self.write_csv_file(
+            "manifest.csv", [["alice", "a.csv"], [], ["bob", "b1.csv", "b2.csv"]])
+        self.assertEqual(
+            list(multi_client_reports.read_manifest(manifest_file_name, "out", "json")), [
+                multi_client_reports.ClientJob("alice", ("a.csv",),
+                                               os.path.join("out", "alice.json")),
+                multi_client_reports.ClientJob("bob", ("b1.csv", "b2.csv"),
+                                               os.path.join("out", "bob.json"))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+
+"""
+The module provides a variant of the ProfitCalculator, which processes the acquisitions
+and sales of each crypto currency in a separate process. The FIFO matching of a crypto
+currency does not depend on any other currency: a swap removes an amount of the source
+currency and adds an acquisition of the target currency, whose Euro value is taken from
+the data row and not from the removed acquisitions. Therefore a swap is split into an
+ordered removal event of the source currency and an ordered acquisition event of the
+target currency.
+"""
+
+import concurrent.futures
+import time
+
+from acquisition_lots import (
+    REWARD_TREATMENTS, CryptoAquisitionData, Diagnostics, Heading,
+    get_crypto_acquisition_record_from_raw_data_entry, get_date_time_object)
+from profit_calculator import ProfitCalculator, TransactionKind, classify_transaction, skip_row
+
+
+def partition_raw_data(raw_crypto_aquisition_data, reward_treatments=None, diagnostics=None):
+    """
+    Partition the rows of a crypto.com csv file by crypto currency. Returns the
+    number of rows and a dictionary, which maps each crypto currency to a list
+    of events (row index, transaction kind, row) in the order of the rows. A
+    swap results in a SWAP event for the target currency and a SELL event for
+    the source currency, a row with a description in reward_treatments in a
+    REWARD event for the received currency. Rows of other transaction kinds
+    are dropped. The reward_treatments default to REWARD_TREATMENTS. Skipped
+    rows are counted with the given Diagnostics instead of being logged.
+    """
+    if reward_treatments is None:
+        reward_treatments = REWARD_TREATMENTS
+    partitions = {}
+    number_of_rows = 0
+    for row_index, raw_data_entry in enumerate(raw_crypto_aquisition_data):
+        number_of_rows += 1
+        try:
+            if raw_data_entry[Heading.IDENTIFIER.value] in reward_treatments:
+                partitions.setdefault(raw_data_entry[Heading.SOURCE_CURRENCY.value], []).append(
+                    (row_index, TransactionKind.REWARD, raw_data_entry))
+                continue
+            transaction_kind, _, _ = classify_transaction(
+                raw_data_entry[Heading.IDENTIFIER.value])
+            if transaction_kind is TransactionKind.OTHER:
+                continue
+            if transaction_kind is not TransactionKind.BUY:
+                partitions.setdefault(raw_data_entry[Heading.SOURCE_CURRENCY.value], []).append(
+                    (row_index, TransactionKind.SELL, raw_data_entry))
+            if transaction_kind is not TransactionKind.SELL:
+                partitions.setdefault(raw_data_entry[Heading.TARGET_CURRENCY.value], []).append(
+                    (row_index, transaction_kind, raw_data_entry))
+        except IndexError as e:
+            skip_row(raw_data_entry, e, diagnostics)
+    return number_of_rows, partitions
+
+
+def process_partition(crypto_currency, events, acquisition_records, record_queue_type,
+                      lot_policy=None, reward_treatments=None, diagnostics=None):
+    """
+    Process the events of a single crypto currency, starting with the given
+    acquisition records of this currency (or None). Returns a list of the
+    removals as tuples (row index, Disposal), the remaining acquisition
+    records and the diagnostics. Invalid rows are skipped in the same way as
+    by ProfitCalculator.process_data. The lots are kept like those of a
+    CryptoAquisitionData with the given LotPolicy, so the Disposals hold the
+    consumed lots for an audit trail, if requested. The
+    reward_treatments default to REWARD_TREATMENTS. The unusual events are
+    counted with the given Diagnostics, which are returned to the parent
+    process, or logged for None.
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    if reward_treatments is None:
+        reward_treatments = REWARD_TREATMENTS
+    crypto_aquisition_data = CryptoAquisitionData(record_queue_type)
+    if lot_policy is not None:
+        crypto_aquisition_data.lot_policy = lot_policy
+    crypto_aquisition_data.set_diagnostics(diagnostics)
+    if acquisition_records is not None:
+        crypto_aquisition_data.data_set[crypto_currency] = acquisition_records
+    removals = []
+    for row_index, transaction_kind, raw_data_entry in events:
+        try:
+            if transaction_kind is TransactionKind.BUY:
+                crypto_aquisition_data.add(raw_data_entry)
+            elif transaction_kind is TransactionKind.SELL:
+                removals.append((row_index, crypto_aquisition_data.remove_disposal(raw_data_entry)))
+            elif transaction_kind is TransactionKind.REWARD:
+                crypto_aquisition_data.add_reward(
+                    raw_data_entry, reward_treatments[raw_data_entry[Heading.IDENTIFIER.value]])
+            else:
+                # in a serial swap the acquisition only happens after a valid removal
+                date_time = get_date_time_object(raw_data_entry[Heading.TIMESTAMP.value])
+                float(raw_data_entry[Heading.SOURCE_AMOUNT.value])
+                crypto_aquisition_data.add_record(
+                    crypto_currency,
+                    get_crypto_acquisition_record_from_raw_data_entry(raw_data_entry, date_time))
+        except (ValueError, IndexError) as e:
+            skip_row(raw_data_entry, e, diagnostics)
+    return removals, crypto_aquisition_data.data_set, diagnostics
+
+
+class ParallelProfitCalculator(ProfitCalculator): # pylint: disable=too-few-public-methods
+    """
+    ProfitCalculator, which runs the FIFO matching of each crypto currency in a
+    concurrent.futures.ProcessPoolExecutor. The profits of the removals are
+    added up in the order of the rows, so the taxable profit is identical to
+    the one of the serial ProfitCalculator. Unlike the serial processing the
+    rows of the traded crypto currencies are kept in memory. The Diagnostics
+    of each worker process are added to the ones set with set_diagnostics.
+    """
+
+    def __init__(self, crypto_aquistion_data, max_workers=None):
+        super().__init__(crypto_aquistion_data)
+        self.max_workers = max_workers
+
+    def process_data(self, raw_crypto_aquisition_data):
+        """Process the data from a crypto.com csv file in parallel. The rows
+        have to be in chronological order. Returns the taxable profit
+        accumulated so far."""
+        start_time = time.perf_counter()
+        number_of_rows, partitions = partition_raw_data(
+            self.hooks.instrumentation.wrap_iterable("read_rows", raw_crypto_aquisition_data),
+            self.reward_treatments, self.hooks.diagnostics)
+        self.__book_removals(self.__process_partitions(partitions), partitions)
+        self._finish_run(number_of_rows, start_time,
+                         f" with {len(partitions)} crypto currencies in parallel")
+        return self.taxable_profit
+
+    def __process_partitions(self, partitions):
+        """Process the events of each crypto currency in a worker process and
+        merge the remaining acquisition records and the Diagnostics of the
+        workers. Returns the removals of all crypto currencies sorted by the
+        row index."""
+        crypto_aquistion_data = self.crypto_aquistion_data
+        data_set = crypto_aquistion_data.data_set
+        removals = []
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(
+                    process_partition, crypto_currency, events,
+                    data_set.pop(crypto_currency, None), crypto_aquistion_data.record_queue_type,
+                    crypto_aquistion_data.lot_policy, self.reward_treatments,
+                    None if self.hooks.diagnostics is None else Diagnostics())
+                for crypto_currency, events in partitions.items()]
+            for future in futures:
+                partition_removals, partition_data_set, diagnostics = future.result()
+                removals.extend(partition_removals)
+                data_set.update(partition_data_set)
+                if diagnostics is not None:
+                    self.hooks.diagnostics.update(diagnostics)
+        removals.sort(key=lambda removal: removal[0])
+        return removals
+
+    def __book_removals(self, removals, partitions):
+        """Book the Disposals of the removals, which are sorted by the row
+        index, with the rows of their sales or swaps."""
+        rows = {row_index: raw_data_entry
+                for events in partitions.values()
+                for row_index, transaction_kind, raw_data_entry in events
+                if transaction_kind is TransactionKind.SELL}
+        for row_index, disposal in removals:
+            raw_data_entry = rows[row_index]
+            try:
+                if classify_transaction(
+                        raw_data_entry[Heading.IDENTIFIER.value])[0] is TransactionKind.SWAP:
+                    # the serial swap fails after the removal for an invalid target amount
+                    float(raw_data_entry[Heading.TARGET_AMOUNT.value])
+                self._book_disposal(raw_data_entry, disposal)
+            except (ValueError, IndexError) as e:
+                skip_row(raw_data_entry, e, self.hooks.diagnostics)
@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+
+"""
+This file provides unit tests for the functionality within the module parallel_processing.
+"""
+
+# pylint: disable=C0115,C0116
+
+import random
+import unittest
+import crypto_tax_report
+import crypto_tax_report_test
+import parallel_processing
+from crypto_tax_report import datetime, logger
+
+
+def get_test_corpus(number_of_rows, seed):
+    """
+    Return deterministic random rows of buys, sales and swaps in chronological
+    order. Sales and swaps never give away more than half of the held amount.
+    """
+    random_generator = random.Random(seed)
+    crypto_currencies = ["CRO", "ADA", "ETH", "SOL", "DOT"]
+    holdings = dict.fromkeys(crypto_currencies, 0.0)
+    date_time = datetime.datetime(2021, 1, 1)
+    rows = []
+    for _ in range(number_of_rows):
+        date_time += datetime.timedelta(seconds=random_generator.randint(1, 20000))
+        timestamp = date_time.strftime(crypto_tax_report.DATE_TIME_FORMAT)
+        source_currency, target_currency = random_generator.sample(crypto_currencies, 2)
+        euro_amount = f"{random_generator.uniform(1.0, 500.0):.2f}"
+        transaction = random_generator.random()
+        if transaction < 0.5 or holdings[source_currency] <= 0.0:
+            amount = round(random_generator.uniform(0.1, 100.0), 6)
+            holdings[target_currency] += amount
+            rows.append([timestamp, f"EUR -> {target_currency}", "EUR", f"-{euro_amount}",
+                         target_currency, str(amount), "EUR", euro_amount, euro_amount,
+                         "viban_purchase"])
+            continue
+        amount = round(holdings[source_currency] * random_generator.uniform(0.05, 0.5), 6)
+        holdings[source_currency] -= amount
+        if transaction < 0.8:
+            rows.append([timestamp, f"{source_currency} -> EUR", source_currency, f"-{amount}",
+                         "EUR", euro_amount, "EUR", euro_amount, euro_amount,
+                         "crypto_viban_exchange"])
+        else:
+            target_amount = round(random_generator.uniform(0.1, 100.0), 6)
+            holdings[target_currency] += target_amount
+            rows.append([timestamp, f"{source_currency} -> {target_currency}", source_currency,
+                         f"-{amount}", target_currency, str(target_amount), "EUR", euro_amount,
+                         euro_amount, "crypto_exchange"])
+    return rows
+
+
+class ParallelProfitCalculatorTest(unittest.TestCase):
+
+    # Set up the test environment
+    def setUp(self):
+        logger.info("Entering the test case %s.", self._testMethodName)
+
+    def tearDown(self) -> None:
+        logger.info("Leaving the test case %s.", self._testMethodName)
+
+    def assert_same_result_as_serial_processing(self, raw_data):
+        serial_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        parallel_calculator = parallel_processing.ParallelProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData(), max_workers=2)
+        serial_profit = serial_calculator.process_data(raw_data)
+        parallel_profit = parallel_calculator.process_data(iter(raw_data))
+        # the profits have to be identical, not only approximately equal
+        self.assertEqual(parallel_profit.hex(), serial_profit.hex())
+        self.assertEqual(parallel_calculator.exempt_profit.hex(),
+                         serial_calculator.exempt_profit.hex())
+        self.assertEqual(parallel_calculator.ledger.profits_per_tax_year,
+                         serial_calculator.ledger.profits_per_tax_year)
+        self.assertEqual(parallel_calculator.processed_rows, len(raw_data))
+        self.assertEqual(parallel_calculator.crypto_aquistion_data.data_set.keys(),
+                         serial_calculator.crypto_aquistion_data.data_set.keys())
+        for crypto_currency, acquisition_records in \
+                serial_calculator.crypto_aquistion_data.data_set.items():
+            self.assertEqual(
+                parallel_calculator.crypto_aquistion_data.data_set[crypto_currency],
+                acquisition_records)
+        return serial_calculator
+
+    def test_same_result_as_serial_processing(self):
+        raw_data = get_test_corpus(2000, seed=7)
+        # a gap of more than a year makes the sales after it partially exempt
+        for raw_data_entry in raw_data[1000:]:
+            raw_data_entry[crypto_tax_report.Heading.TIMESTAMP.value] = (
+                crypto_tax_report.get_date_time_object(
+                    raw_data_entry[crypto_tax_report.Heading.TIMESTAMP.value])
+                + datetime.timedelta(days=400)).strftime(crypto_tax_report.DATE_TIME_FORMAT)
+        serial_calculator = self.assert_same_result_as_serial_processing(raw_data)
+        self.assertNotEqual(serial_calculator.exempt_profit, 0.0)
+
+    def test_same_result_as_serial_processing_with_invalid_rows(self):
+        raw_data = get_test_corpus(300, seed=11)
+        raw_data[50][crypto_tax_report.Heading.SOURCE_AMOUNT.value] = "invalid"
+        raw_data[120][crypto_tax_report.Heading.TARGET_AMOUNT.value] = "invalid"
+        raw_data[200][crypto_tax_report.Heading.TIMESTAMP.value] = "invalid"
+        raw_data.insert(0, ["Timestamp (UTC)", "Transaction Description"])
+        raw_data.append([])
+        self.assert_same_result_as_serial_processing(raw_data)
+
+    def test_aggregated_diagnostics_of_the_workers(self):
+        raw_data = crypto_tax_report_test.get_raw_data_with_diagnostics()
+        serial_diagnostics = crypto_tax_report.Diagnostics()
+        serial_calculator = crypto_tax_report.ProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData())
+        serial_calculator.set_diagnostics(serial_diagnostics)
+        serial_calculator.process_data(raw_data)
+        parallel_diagnostics = crypto_tax_report.Diagnostics()
+        parallel_calculator = parallel_processing.ParallelProfitCalculator(
+            crypto_tax_report.CryptoAquisitionData(), max_workers=2)
+        parallel_calculator.set_diagnostics(parallel_diagnostics)
+        with self.assertNoLogs(level="WARNING"):
+            parallel_calculator.process_data(raw_data)
+        self.assertEqual(parallel_diagnostics.events, serial_diagnostics.events)
+        self.assertEqual(parallel_diagnostics.levels, serial_diagnostics.levels)
+
+
+if __name__ == '__main__':
+    unittest.main()
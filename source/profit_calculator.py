@@ -0,0 +1,454 @@
+#!/usr/bin/python3
+
+"""
+The module provides the classification of the transactions of a crypto.com csv file and
+the ProfitCalculator, which books the profit of each sale or swap as taxable or exempt
+under German law while the rows are processed. The acquisitions, from which a sale
+removes its lots, are kept by the CryptoAquisitionData of the module acquisition_lots.
+The engines of the FIFO matching extend the ProfitCalculator, and the command line of
+the module crypto_tax_report runs it.
+"""
+
+import functools
+import logging
+import re
+import time
+from enum import Enum
+from dataclasses import dataclass, field
+
+from acquisition_lots import (
+    CURRENCY_REGISTRY, NULL_INSTRUMENTATION, REWARD_TREATMENTS, Currency, Diagnostics, Heading,
+    NullInstrumentation, TaxPolicy)
+from audit_trail import AuditTrailWriter
+
+logger = logging.getLogger(__name__)
+
+
+class TransactionKind(Enum):
+    """ Kinds of transactions, which are distinguished by the exchange of currencies
+    given in the transaction description of the crypto.com csv file. Rewards
+    are recognized by their transaction description in REWARD_TREATMENTS.
+    """
+    BUY = 0
+    SELL = 1
+    SWAP = 2
+    OTHER = 3
+    REWARD = 4
+
+
+EUR_CODE = Currency.EUR.value
+
+
+# Define the regex pattern with named groups
+CURRENCY_EXCHANGE_PATTERN = r'\s*(?P<FromCurrency>[\w]+)\s*->\s*(?P<ToCurrency>[\w]+)\s*'
+CURRENCY_EXCHANGE_REGEX = re.compile(CURRENCY_EXCHANGE_PATTERN)
+TRANSACTION_CLASSIFICATION_CACHE_SIZE = 1024
+
+
+def match_currency_exchange_pattern(string_to_match):
+    """
+    Check whether the given string matches the pattern
+    '<currency1> -> <currency2>', where <currency1> and <currency2>
+    are strings, which should represent an arbitrary currency (like
+    EUR for Euro) or crypto currency (like ADA). Currently it is not
+    checked whether the currency is matches an element of the
+    currency enum.
+    """
+    is_a_match = False
+    from_currency = ""
+    to_currency = ""
+    match_result = CURRENCY_EXCHANGE_REGEX.match(string_to_match)
+    if match_result:
+        is_a_match = True
+        from_currency = match_result.group('FromCurrency')
+        to_currency = match_result.group('ToCurrency')
+    return (is_a_match, from_currency, to_currency)
+
+
+@functools.lru_cache(maxsize=TRANSACTION_CLASSIFICATION_CACHE_SIZE)
+def classify_transaction(string_to_match):
+    """
+    Classify the given transaction description by matching it once against the
+    pattern '<currency1> -> <currency2>'. Returns a tuple of the TransactionKind
+    and the two currencies: BUY if <currency1> is EUR, SELL if <currency2> is
+    EUR, SWAP for any other pair of currencies and OTHER together with empty
+    currencies, if the pattern does not match. Both currencies are registered
+    in the CURRENCY_REGISTRY. The results are cached, since a csv file only
+    contains a few distinct descriptions.
+    """
+    is_a_match, from_currency, to_currency = match_currency_exchange_pattern(
+        string_to_match)
+    if not is_a_match:
+        return (TransactionKind.OTHER, from_currency, to_currency)
+    if CURRENCY_REGISTRY.get_code(from_currency) == EUR_CODE:
+        return (TransactionKind.BUY, from_currency, to_currency)
+    if CURRENCY_REGISTRY.get_code(to_currency) == EUR_CODE:
+        return (TransactionKind.SELL, from_currency, to_currency)
+    return (TransactionKind.SWAP, from_currency, to_currency)
+
+
+def match_buy_crypto_currency_with_euro(string_to_match):
+    """
+    Check whether the given string matches the pattern 'EUR -> <currency2>',
+    where <currency2 is an arbitrary crypto currency. It is not checked
+    whether this crypto currency is known in any way.
+    """
+    return classify_transaction(string_to_match)[0] is TransactionKind.BUY
+
+
+def match_sell_crypto_currency_get_euro(string_to_match):
+    """
+    Check whether the given string matches the pattern '<currency1> -> EUR',
+    where <currency1> is an arbitrary crypto currency. It is not checked
+    whether this crypto currency is known in any way.
+    """
+    return classify_transaction(string_to_match)[0] is TransactionKind.SELL
+
+
+def match_swap_of_crypto_currency(string_to_match):
+    """
+    Check whether the given string matches the pattern
+    '<currency1> -> <currency2>', where <currency1> and <currency2> are
+    arbitrary crypto currencies. It is not checked whether these crypto
+    currencies are known in any way, only that they are not equal to 'EUR'.
+    """
+    return classify_transaction(string_to_match)[0] is TransactionKind.SWAP
+
+
+@dataclass(slots=True)
+class TaxYearProfit:
+    """ The taxable and the exempt profit of the sales within a tax year."""
+    taxable_profit: float = 0.0
+    exempt_profit: float = 0.0
+
+
+@dataclass(slots=True)
+class TaxYearCurrencyRollup:
+    """
+    The taxable and the exempt profit, the proceeds and the cost basis of the
+    sales of a crypto currency within a tax year, together with the number of
+    these sales and their numbers in the order of processing, e.g. in the
+    audit trail. The numbers are kept as ascending ranges [first, last] of
+    consecutive numbers, since the sales of a crypto currency are often
+    processed one after another.
+    """
+    taxable_profit: float = 0.0
+    exempt_profit: float = 0.0
+    proceeds: float = 0.0
+    cost_basis: float = 0.0
+    number_of_sales: int = 0
+    sale_ranges: list = field(default_factory=list)
+
+    def add_sale(self, sale):
+        """Count the sale with the given number, which is larger than the
+        numbers of the previous sales of the rollup."""
+        self.number_of_sales += 1
+        if self.sale_ranges and self.sale_ranges[-1][1] == sale - 1:
+            self.sale_ranges[-1][1] = sale
+        else:
+            self.sale_ranges.append([sale, sale])
+
+    def get_sales(self):
+        """Generator yielding the numbers of the sales of the rollup."""
+        for first_sale, last_sale in self.sale_ranges:
+            yield from range(first_sale, last_sale + 1)
+
+
+@dataclass(slots=True)
+class ProfitLedger:
+    """
+    The profits of the booked sales per tax year and, together with the
+    proceeds and the cost basis, per tax year and crypto currency as
+    TaxYearCurrencyRollups. The sales are numbered in the order of booking,
+    number_of_sales being the number of the next sale.
+    """
+    profits_per_tax_year: dict = field(default_factory=dict)
+    rollups: dict = field(default_factory=dict)
+    number_of_sales: int = 0
+
+    def book_sale(self, disposal, proceeds, taxable_profit, exempt_profit):
+        """Add the profit of a sale or a swap to its tax year and to the rollup
+        of its tax year and crypto currency. Returns the number of the sale."""
+        year = disposal.date_time.year
+        tax_year_profit = self.profits_per_tax_year.get(year)
+        if tax_year_profit is None:
+            self.profits_per_tax_year[year] = TaxYearProfit(taxable_profit, exempt_profit)
+        else:
+            tax_year_profit.taxable_profit += taxable_profit
+            tax_year_profit.exempt_profit += exempt_profit
+        rollup_key = (year, disposal.crypto_currency)
+        rollup = self.rollups.get(rollup_key)
+        if rollup is None:
+            # the rollup takes the numeric type of the profits, e.g. cents as int
+            rollup = self.rollups[rollup_key] = TaxYearCurrencyRollup(
+                taxable_profit, exempt_profit, proceeds, disposal.bought_at)
+        else:
+            rollup.taxable_profit += taxable_profit
+            rollup.exempt_profit += exempt_profit
+            rollup.proceeds += proceeds
+            rollup.cost_basis += disposal.bought_at
+        sale_number = self.number_of_sales
+        rollup.add_sale(sale_number)
+        self.number_of_sales += 1
+        return sale_number
+
+
+@dataclass(slots=True)
+class RunHooks:
+    """
+    The hooks observing the runs of a ProfitCalculator: the instrumentation,
+    the Diagnostics counting the unusual events or None for logging each of
+    them, and the audit trail of the consumed lots or None.
+    """
+    instrumentation: NullInstrumentation = NULL_INSTRUMENTATION
+    diagnostics: Diagnostics = None
+    audit_trail: AuditTrailWriter = None
+
+
+def is_selected_tax_year(year, tax_year=None, last_tax_year=None):
+    """
+    Check whether a year is selected for a report of all tax years for None,
+    of the given tax year only or of the range from tax_year to last_tax_year.
+    """
+    if tax_year is None:
+        return True
+    if last_tax_year is None:
+        return year == tax_year
+    return tax_year <= year <= last_tax_year
+
+
+def get_proceeds_from_raw_data_entry(raw_data_entry):
+    """
+    Function returning the Euro amount, which has been received for the crypto
+    currency given away in a sale or a swap, from a data row in crypto.com's
+    csv file.
+    """
+    return abs(float(raw_data_entry[Heading.NATIVE_CURRENCY_AMOUNT.value]))
+
+
+def skip_row(raw_data_entry, error, diagnostics=None):
+    """
+    Log that the row could not be processed because of the error, or count
+    it as a skipped row of its source currency with the given Diagnostics.
+    """
+    if diagnostics is not None:
+        diagnostics.count(
+            "Skipped row", raw_data_entry[Heading.SOURCE_CURRENCY.value]
+            if len(raw_data_entry) > Heading.SOURCE_CURRENCY.value else "", logging.ERROR)
+    else:
+        logger.error("The data entry %s could not be processed: %s. "
+                     "Skip this line.", raw_data_entry, error)
+
+
+class ProfitCalculator: # pylint: disable=too-few-public-methods
+
+    """
+    Class calcuting those profits from crypto transactions, which are tax-relevant.
+    The profits of sales of acquisitions held for more than one year are exempt
+    and accumulated separately. Both are also accumulated by the ProfitLedger
+    ledger per tax year and, together with the proceeds and the cost basis,
+    per tax year and crypto currency in the same pass, so the report of any
+    tax year or range of tax years is taken from these rollups without
+    matching the acquisitions again. The sales are numbered in the order of
+    processing and the rollups keep the number of their sales and the ranges
+    of their numbers. The instrumentation, the Diagnostics and the audit
+    trail of a run are kept by its RunHooks hooks.
+    Rewards are looked up by their transaction description in the dispatch
+    table reward_treatments, REWARD_TREATMENTS by default, and added as
+    acquisitions.
+    """
+
+    def __init__(self, crypto_aquistion_data):
+        self.crypto_aquistion_data = crypto_aquistion_data
+        self.taxable_profit = 0.0
+        self.exempt_profit = 0.0
+        self.ledger = ProfitLedger()
+        self.processed_rows = 0
+        self.hooks = RunHooks()
+        self.reward_treatments = REWARD_TREATMENTS
+
+    def set_diagnostics(self, diagnostics):
+        """
+        Count the unusual events of the processing, e.g. skipped rows, with
+        the given Diagnostics instead of logging each of them, also for the
+        CryptoAquisitionData. The caller reports the Diagnostics at the end
+        of the run.
+        """
+        self.hooks.diagnostics = diagnostics
+        self.crypto_aquistion_data.set_diagnostics(diagnostics)
+
+    def set_instrumentation(self, instrumentation):
+        """
+        Set the hooks of the instrumentation, e.g. an Instrumentation of the
+        module instrumentation, also for the CryptoAquisitionData. The
+        reading of the rows and the classification of the transactions are
+        timed by the instrumentation.
+        """
+        self.hooks.instrumentation = instrumentation
+        self.crypto_aquistion_data.set_instrumentation(instrumentation)
+
+    def set_audit_trail(self, audit_trail):
+        """
+        Write the lots consumed by each sale or swap to the given audit trail,
+        e.g. an AuditTrailWriter of the module audit_trail, whose write_rows is
+        called with the rows of a sale, or stop writing them for None.
+        """
+        self.hooks.audit_trail = audit_trail
+        self.crypto_aquistion_data.lot_policy.keep_consumed_lots = audit_trail is not None
+
+    def set_lot_compaction(self, compact_lots=True):
+        """
+        Merge the acquisitions of the same calendar day into a single lot as
+        they arrive, or keep each of them as a lot of its own for False, see
+        LotPolicy. While an audit trail is written, the lots are
+        not merged, so it states the time stamp of each acquisition.
+        """
+        self.crypto_aquistion_data.lot_policy.compact_lots = compact_lots
+
+    def process_data(self, raw_crypto_aquisition_data):
+
+        """Process the data from a crypto.com csv file.
+
+        The rows are consumed one after another from the given iterable, e.g. a
+        csv.reader, so only the open acquisitions are kept in memory and not
+        the file itself. The rows have to be in chronological order. Returns
+        the taxable profit accumulated so far.
+        """
+        processed_rows = 0
+        start_time = time.perf_counter()
+        self.crypto_aquistion_data.update_log_level()
+        instrumentation = self.hooks.instrumentation
+        classify = instrumentation.wrap("classify_transaction", classify_transaction)
+        for raw_data_entry in instrumentation.wrap_iterable(
+                "read_rows", raw_crypto_aquisition_data):
+            processed_rows += 1
+            try:
+                self.__process_raw_entry(raw_data_entry, classify)
+            except (ValueError, IndexError) as e:
+                skip_row(raw_data_entry, e, self.hooks.diagnostics)
+        self._finish_run(processed_rows, start_time, "")
+        return self.taxable_profit
+
+    def _finish_run(self, processed_rows, start_time, processing):
+        """Count the processed rows of a run started at start_time, log its
+        throughput with the description of the processing, e.g. ' as a batch',
+        and pass it on to the instrumentation."""
+        elapsed_time = time.perf_counter() - start_time
+        self.processed_rows += processed_rows
+        rows_per_second = processed_rows / elapsed_time if elapsed_time > 0.0 else 0.0
+        logger.info("Processed %d rows in %.3f s (%.0f rows/s)%s.",
+                    processed_rows, elapsed_time, rows_per_second, processing)
+        self.hooks.instrumentation.record_run(self, processed_rows, elapsed_time)
+
+    def __process_raw_entry(self, raw_data_entry, classify):
+        identifier = raw_data_entry[Heading.IDENTIFIER.value]
+        # most rows of an export are rewards, which are found by a single lookup
+        reward_treatment = self.reward_treatments.get(identifier)
+        if reward_treatment is not None:
+            self.crypto_aquistion_data.add_reward(raw_data_entry, reward_treatment)
+            return
+        transaction_kind, _, _ = classify(identifier)
+        if transaction_kind is TransactionKind.BUY:
+            self.crypto_aquistion_data.add(raw_data_entry)
+        elif transaction_kind is TransactionKind.SELL:
+            self._book_disposal(
+                raw_data_entry, self.crypto_aquistion_data.remove_disposal(raw_data_entry))
+        elif transaction_kind is TransactionKind.SWAP:
+            self._book_disposal(
+                raw_data_entry, self.crypto_aquistion_data.swap_disposal(raw_data_entry))
+
+    def get_tax_year_rows(self, tax_year=None, last_tax_year=None):
+        """Return the tax years in ascending order with their formatted taxable
+        and exempt profit as tuples, either of all tax years, of the given one
+        only or of the range from tax_year to last_tax_year."""
+        return [(year, self._format_profit(tax_year_profit.taxable_profit),
+                 self._format_profit(tax_year_profit.exempt_profit))
+                for year, tax_year_profit in sorted(self.ledger.profits_per_tax_year.items())
+                if is_selected_tax_year(year, tax_year, last_tax_year)]
+
+    def get_tax_year_report(self, tax_year=None, last_tax_year=None):
+        """Return a table of the taxable and the exempt profit of each tax year,
+        of the given one only or of the range from tax_year to last_tax_year."""
+        lines = [f"{'Tax year':<10}{'Taxable profit':>20}{'Exempt profit':>20}"]
+        lines.extend(f"{year:<10}{taxable_profit:>20}{exempt_profit:>20}"
+                     for year, taxable_profit, exempt_profit
+                     in self.get_tax_year_rows(tax_year, last_tax_year))
+        return "\n".join(lines)
+
+    def get_rollup_rows(self, tax_year=None, last_tax_year=None):
+        """Return the rollups ordered by tax year and crypto currency as tuples
+        of the tax year, the crypto currency, the number of sales and the
+        formatted proceeds, cost basis, taxable and exempt profit, selected
+        like by get_tax_year_rows."""
+        return [(year, crypto_currency, rollup.number_of_sales,
+                 self._format_profit(rollup.proceeds), self._format_profit(rollup.cost_basis),
+                 self._format_profit(rollup.taxable_profit),
+                 self._format_profit(rollup.exempt_profit))
+                for (year, crypto_currency), rollup in sorted(self.ledger.rollups.items())
+                if is_selected_tax_year(year, tax_year, last_tax_year)]
+
+    def get_rollup_report(self, tax_year=None, last_tax_year=None):
+        """Return a table of the rollups of each tax year and crypto currency,
+        selected like by get_tax_year_report."""
+        lines = [f"{'Tax year':<10}{'Currency':<10}{'Sales':>8}{'Proceeds':>16}"
+                 f"{'Cost basis':>16}{'Taxable profit':>20}{'Exempt profit':>20}"]
+        lines.extend(f"{year:<10}{crypto_currency:<10}{sales:>8}{proceeds:>16}"
+                     f"{cost_basis:>16}{taxable_profit:>20}{exempt_profit:>20}"
+                     for year, crypto_currency, sales, proceeds, cost_basis, taxable_profit,
+                     exempt_profit in self.get_rollup_rows(tax_year, last_tax_year))
+        return "\n".join(lines)
+
+    def _format_profit(self, profit):
+        """Format a profit in Euro for the report."""
+        return f"{profit:.2f}"
+
+    def _format_amount(self, crypto_currency, amount):  # pylint: disable=unused-argument
+        """Format an amount of a crypto currency for the audit trail."""
+        return repr(amount)
+
+    def _format_cost(self, cost):
+        """Format the Euro amount at which a lot has been bought for the audit trail."""
+        return repr(cost)
+
+    def _book_disposal(self, raw_data_entry, disposal):
+        """Add the profit of a sale or a swap to the taxable and the exempt
+        profit."""
+        self._book_proceeds(get_proceeds_from_raw_data_entry(raw_data_entry), disposal)
+
+    def _book_proceeds(self, proceeds, disposal):
+        """Add the profit of a sale or a swap with the given proceeds in Euro
+        to the taxable and the exempt profit. The proceeds are split in
+        proportion to the exempt amount."""
+        exempt_proceeds = disposal.get_exempt_proceeds(proceeds)
+        self._book_profit(
+            disposal, proceeds,
+            (proceeds - exempt_proceeds) - (disposal.bought_at - disposal.exempt_bought_at),
+            exempt_proceeds - disposal.exempt_bought_at)
+
+    def _book_profit(self, disposal, proceeds, taxable_profit, exempt_profit):
+        """Add the profit of a sale or a swap to the taxable and the exempt
+        profit and book it in the ledger."""
+        self.taxable_profit += taxable_profit
+        self.exempt_profit += exempt_profit
+        sale_number = self.ledger.book_sale(disposal, proceeds, taxable_profit, exempt_profit)
+        if self.hooks.audit_trail is not None:
+            self._audit_sale(disposal, sale_number)
+
+    def _audit_sale(self, disposal, sale_number):
+        """Write a row per lot consumed by the sale with the given number to
+        the audit trail."""
+        sale_date_time = disposal.date_time
+        # str gives the DATE_TIME_FORMAT of whole seconds several times faster than strftime
+        sale_timestamp = str(sale_date_time)
+        crypto_currency = disposal.crypto_currency
+        format_amount = self._format_amount
+        format_cost = self._format_cost
+        exempt_tax_policy = TaxPolicy.EXEMPT
+        exempt_name = exempt_tax_policy.name
+        capital_gains_name = TaxPolicy.CAPITAL_GAINS.name
+        self.hooks.audit_trail.write_rows(
+            (sale_number, sale_timestamp, crypto_currency, str(date_time),
+             format_amount(crypto_currency, amount), format_cost(cost),
+             (sale_date_time - date_time).days,
+             exempt_name if tax_policy is exempt_tax_policy else capital_gains_name)
+            for date_time, amount, cost, tax_policy in disposal.consumed_lots or ())